@@ -0,0 +1,582 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from stub_server import StubWhisperServer
+from synthetic import SyntheticCapture, SyntheticInputStream, load_raw, speech_and_silence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _path(directory):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return path
+
+
+def _load(directory, name):
+    """Import ROOT/<directory>/<name>.py under a unique name (test0, test1 and test2 all have an audio.py)."""
+    path = _path(directory)
+    spec = importlib.util.spec_from_file_location(f"{directory}_{name}", os.path.join(path, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _wait(predicate, timeout, interval=0.05):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(interval)
+    return predicate()
+
+
+def audio_source(opts, fs):
+    """(samples, utterances) from --raw if given, otherwise synthetic speech and silence."""
+    if opts.raw:
+        from VoiceActivityDetector import VoiceActivityDetector
+        return load_raw(opts.raw, opts.raw_rate, fs, VoiceActivityDetector(fs, hangover=opts.silence))
+    return speech_and_silence(opts.duration, fs, gap=(opts.silence + 0.5, opts.silence + 2.5))
+
+
+def latency_summary(seconds):
+    if not seconds:
+        return None
+    ms = np.asarray(seconds) * 1000
+    return {
+        'count': int(ms.size),
+        'mean': round(float(ms.mean()), 1),
+        'p50': round(float(np.percentile(ms, 50)), 1),
+        'p95': round(float(np.percentile(ms, 95)), 1),
+        'max': round(float(ms.max()), 1),
+    }
+
+
+def speech_to_text(stream, utterances, results):
+    """Pair the k-th utterance with the k-th result: seconds from its last spoken sample to the text."""
+    return [done - stream.wall_time(stop) for (_, stop), done in zip(utterances, results)]
+
+
+def _timeout(opts, samples, fs, utterances):
+    return len(samples) / fs / opts.speed + 10.0 + len(utterances) * (opts.latency + opts.jitter)
+
+
+def bench_pipeline(opts):
+    """test1/audio.py: the capture callback feeding build_pipeline, against the stub API."""
+    audio = _load('test1', 'audio')
+    from AudioEncoder import AudioEncoder
+    from RingBuffer import RingBuffer
+    from SegmentQueue import SegmentQueue
+    from TranscriptionClient import TranscriptionClient
+
+    fs = 44100
+    samples, utterances = audio_source(opts, fs)
+    segments = SegmentQueue(fs, target_lag=opts.target_lag, max_seconds=opts.max_backlog)
+    results = []
+
+    def render(future, count):
+        future.result()
+        # One answer covers every segment merged into the request.
+        results.extend([time.monotonic()] * count)
+
+    with StubWhisperServer(opts.latency, opts.jitter) as stub, TranscriptionClient('bench', base_url=stub.url) as client:
+        ring = RingBuffer(int(600 * fs))
+        encoder = AudioEncoder(fs, format='wav', target_rate=16000)
+        speculator = None
+        if opts.speculate:
+            from Speculator import Speculator
+            speculator = Speculator(ring, fs, client, encoder, min_silence=opts.speculate, language='en', model='whisper-1', translate=False)
+        pipeline = audio.build_pipeline(ring, fs, 9.0, opts.silence, 45.0, client, encoder, 'en', 'whisper-1', False, render=render,
+                                        speculator=speculator, segments=segments).start()
+
+        def callback(indata, frames, time_info, status):
+            pipeline.offer(ring.write(indata))
+
+        with SyntheticInputStream(samples, callback, samplerate=fs, speed=opts.speed) as stream:
+            _wait(lambda: stream.finished.is_set() and len(results) + segments.dropped >= len(utterances), _timeout(opts, samples, fs, utterances))
+        pipeline.stop()
+        requests = len(stub.requests)
+
+    return {
+        'utterances': len(utterances),
+        'segments': len(results),
+        'requests': requests,
+        'dropped_blocks': pipeline.dropped,
+        'speech_to_text_ms': latency_summary(speech_to_text(stream, utterances, results)),
+        'speculation': speculator.stats() if speculator is not None else None,
+        'queue': segments.stats(),
+    }
+
+
+def bench_recorder(opts):
+    """test1 AudioRecorder's callback path, with each finished clip encoded and sent through Transcriber."""
+    _path('test1')
+    from AudioEncoder import AudioEncoder
+    from AudioRecorder import AudioRecorder
+    from Transcriber import Transcriber
+    from TranscriptionClient import TranscriptionClient
+
+    fs = 44100
+    samples, utterances = audio_source(opts, fs)
+    recorder = AudioRecorder(fs, silence_threshold=opts.silence)
+    encoder = AudioEncoder(fs, format='wav', target_rate=16000)
+    executor = ThreadPoolExecutor(max_workers=1)
+    detected, results = [], []
+
+    with StubWhisperServer(opts.latency, opts.jitter) as stub, TranscriptionClient('bench', base_url=stub.url) as client:
+        transcriber = Transcriber('bench', client=client)
+
+        def transcribe(audio_data):
+            encoded = encoder.encode(audio_data)
+            transcriber.transcribe(encoded.data, encoded.filename, encoded.content_type, encoded.pcm_digest)
+            results.append(time.monotonic())
+
+        def callback(indata, frames, time_info, status):
+            stop = recorder.segment_stop
+            recorder.audio_callback(indata, frames, time_info, status)
+            if not recorder.recording and recorder.segment_stop != stop:
+                detected.append(time.monotonic())
+                executor.submit(transcribe, recorder.audio_data)
+
+        with SyntheticInputStream(samples, callback, samplerate=fs, speed=opts.speed) as stream:
+            _wait(lambda: stream.finished.is_set() and len(results) >= len(utterances), _timeout(opts, samples, fs, utterances))
+        executor.shutdown(wait=True)
+        requests = len(stub.requests)
+
+    return {
+        'utterances': len(utterances),
+        'segments': len(detected),
+        'requests': requests,
+        'speech_to_segment_ms': latency_summary(speech_to_text(stream, utterances, detected)),
+        'speech_to_text_ms': latency_summary(speech_to_text(stream, utterances, results)),
+    }
+
+
+def bench_chunks(opts):
+    """test2/audio.py transcription_loop fed fixed `record_timeout` chunks through its VAD filter."""
+    audio = _load('test2', 'audio')
+    from SegmentQueue import SegmentQueue
+    from TranscriptionClient import TranscriptionClient
+    from VoiceActivityDetector import VoiceActivityDetector
+
+    fs = 16000
+    samples, utterances = audio_source(opts, fs)
+    chunk = int(opts.record_timeout * fs)
+    vad = VoiceActivityDetector(fs)
+    data_queue = SegmentQueue(fs, target_lag=0, max_seconds=opts.max_backlog)
+    pending = []
+    position = [0]
+    queued = []  # (last sample position, chunks queued so far)
+    renders = []  # (time, chunks taken so far)
+
+    def callback(indata, frames, time_info, status):
+        # What speech_recognition's listen_in_background would hand record_callback
+        pending.append(indata.reshape(-1).copy())
+        position[0] += frames
+        if sum(p.size for p in pending) >= chunk:
+            data = np.concatenate(pending)
+            pending.clear()
+            vad.process(data)
+            if vad.active_frames:
+                data_queue.put(data.tobytes())
+                queued.append((position[0], data_queue.taken + data_queue.qsize()))
+
+    def render(transcription):
+        renders.append((time.monotonic(), data_queue.taken))
+
+    with StubWhisperServer(opts.latency, opts.jitter) as stub, TranscriptionClient('bench', base_url=stub.url) as client:
+        loop = threading.Thread(target=audio.transcription_loop, args=(data_queue, client, 3.0, ['']), kwargs={'render': render}, daemon=True)
+        loop.start()
+        with SyntheticInputStream(samples, callback, samplerate=fs, speed=opts.speed) as stream:
+            _wait(stream.finished.is_set, _timeout(opts, samples, fs, utterances))
+            data_queue.put(None)
+            loop.join(10.0 + opts.latency + opts.jitter)
+        requests = len(stub.requests)
+
+    latencies = []
+    for _, stop in utterances:
+        # The chunk that carries the end of this utterance, then the first update that consumed it
+        carrying = next((count for position, count in queued if position >= stop), None)
+        shown = next((at for at, taken in renders if carrying is not None and taken >= carrying), None)
+        if shown is not None:
+            latencies.append(shown - stream.wall_time(stop))
+    return {
+        'utterances': len(utterances),
+        'chunks': len(queued),
+        'requests': requests,
+        'speech_to_text_ms': latency_summary(latencies),
+        'queue': data_queue.stats(),
+    }
+
+
+def bench_streaming(opts):
+    """test1 ChunkedTranscriber: long monologues streamed in overlapping fixed chunks, against the stub API."""
+    _path('test1')
+    from AudioEncoder import AudioEncoder
+    from ChunkedTranscriber import ChunkedTranscriber
+    from RingBuffer import RingBuffer
+    from TranscriptionClient import TranscriptionClient
+
+    fs = 16000
+    samples, utterances = speech_and_silence(opts.duration, fs, speech=(12.0, 20.0), gap=(opts.silence + 0.5, opts.silence + 2.5))
+    updates = []  # Monotonic time of every update that showed new words
+
+    def on_words(words, provisional):
+        if words or provisional:
+            updates.append(time.monotonic())
+
+    with StubWhisperServer(opts.latency, opts.jitter) as stub, TranscriptionClient('bench', base_url=stub.url) as client:
+        ring = RingBuffer(int(600 * fs))
+        chunker = ChunkedTranscriber(ring, fs, client, AudioEncoder(fs, format='wav'), on_words,
+                                     chunk_seconds=opts.chunk_seconds, overlap=opts.overlap)
+
+        def callback(indata, frames, time_info, status):
+            chunker.feed(ring.write(indata))
+
+        with SyntheticInputStream(samples, callback, samplerate=fs, speed=opts.speed) as stream:
+            _wait(stream.finished.is_set, _timeout(opts, samples, fs, utterances))
+        chunker.flush()
+        requests = len(stub.requests)
+
+    first_text = []
+    for start, _ in utterances:
+        shown = next((at for at in updates if at > stream.wall_time(start)), None)
+        if shown is not None:
+            first_text.append(shown - stream.wall_time(start))
+    return dict(chunker.stats(), utterances=len(utterances), requests=requests, first_text_ms=latency_summary(first_text))
+
+
+def _synthetic_cameras(opts):
+    import cv2
+    cv2.VideoCapture = lambda source, *args: SyntheticCapture(source, opts.width, opts.height, opts.fps)
+    return cv2
+
+
+def bench_stereo(opts):
+    """test0 StereoCapture pairing two synthetic cameras."""
+    _synthetic_cameras(opts)
+    stereo = _load('test0', 'stereo')
+    capture = stereo.StereoCapture(0, 1, width=opts.width, height=opts.height)
+    frames = 0
+    with capture:
+        started = time.monotonic()
+        while time.monotonic() - started < opts.video_seconds:
+            ok, _, _ = capture.read()
+            frames += ok
+        elapsed = time.monotonic() - started
+    return dict(capture.stats(), frames=frames, fps=round(frames / elapsed, 1))
+
+
+def bench_stream(opts):
+    """test0 LatestFrameReader over a synthetic stream, read by a consumer that takes ~`consumer_ms` per frame."""
+    _synthetic_cameras(opts)
+    stream_reader = _load('test0', 'stream_reader')
+    frames = 0
+    with stream_reader.LatestFrameReader('synthetic') as reader:
+        started = time.monotonic()
+        while time.monotonic() - started < opts.video_seconds:
+            ok, _ = reader.read(timeout=1.0)
+            frames += ok
+            time.sleep(opts.consumer_ms / 1000)
+        elapsed = time.monotonic() - started
+        stats = reader.stats()
+    return dict(stats, frames=frames, fps=round(frames / elapsed, 1))
+
+
+def _subscribe(name, seconds, results):
+    sys.path.insert(0, os.path.join(ROOT, 'test0'))
+    from frame_bus import FrameSubscriber
+
+    with FrameSubscriber(name) as bus:
+        frames = 0
+        started = time.monotonic()
+        while time.monotonic() - started < seconds:
+            if bus.next(timeout=1.0) is not None:
+                frames += 1
+        results.put({'frames': frames, 'skipped': bus.skipped, 'fps': round(frames / (time.monotonic() - started), 1)})
+
+
+def bench_frame_bus(opts):
+    """test0 frame_bus: one publisher at `fps`, `subscribers` processes reading every frame."""
+    from synthetic import synthetic_frames
+    frame_bus = _load('test0', 'frame_bus')
+
+    frames = synthetic_frames(opts.width, opts.height)
+    name = f"bench{os.getpid()}"
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    with frame_bus.FramePublisher(name, frames[0].shape) as bus:
+        readers = [context.Process(target=_subscribe, args=(name, opts.video_seconds, results)) for _ in range(opts.subscribers)]
+        for reader in readers:
+            reader.start()
+        period = 1.0 / opts.fps
+        deadline = time.monotonic()
+        while any(reader.is_alive() for reader in readers):
+            bus.publish(frames[bus.seq % len(frames)])
+            deadline += period
+            time.sleep(max(0.0, deadline - time.monotonic()))
+        subscribers = [results.get() for _ in readers]
+        for reader in readers:
+            reader.join()
+        published = bus.seq
+    return {'published': published, 'subscribers': subscribers, 'fps': min(s['fps'] for s in subscribers)}
+
+
+def _edges(frame):
+    """Stands in for per-frame analysis downstream of the gate: horizontal edge energy."""
+    return int(np.abs(np.diff(frame.astype(np.int16), axis=1)).sum())
+
+
+def bench_gate(opts):
+    """test0 ChangeDetector on a mostly static scene: downstream CPU with and without the gate.
+
+    `--video-seconds` of frames at `--fps` are fed as fast as possible; a
+    `--motion` fraction of them, in bursts of one second, show the moving bar.
+    """
+    from synthetic import idle_frames, synthetic_frames
+    motion = _load('test0', 'motion')
+
+    idle = idle_frames(opts.width, opts.height)
+    moving = synthetic_frames(opts.width, opts.height)
+    count = int(opts.video_seconds * opts.fps)
+    burst = max(1, int(opts.fps))
+    every = max(burst, int(burst / opts.motion)) if opts.motion > 0 else count + 1
+    sequence = [moving[i % len(moving)] if i % every < burst and opts.motion > 0 else idle[i % len(idle)] for i in range(count)]
+
+    started = time.process_time()
+    for frame in sequence:
+        _edges(frame)
+    ungated = time.process_time() - started
+
+    gate = motion.ChangeDetector(refresh=opts.video_seconds)
+    checked = downstream = 0.0
+    for frame in sequence:
+        started = time.process_time()
+        regions = gate.check(frame)
+        checked += time.process_time() - started
+        started = time.process_time()
+        for x, y, w, h in regions:
+            _edges(frame[y:y + h, x:x + w])
+        downstream += time.process_time() - started
+    return dict(gate.stats(), ungated_cpu_s=round(ungated, 3), gate_cpu_s=round(checked, 3), downstream_cpu_s=round(downstream, 3),
+                downstream_reduction=round(ungated / downstream, 1) if downstream else None)
+
+
+def bench_hls(opts):
+    """test0 HlsPublisher: synthetic frames at `fps`, encoded into HLS and served over HTTP while a client polls the playlist."""
+    import urllib.request
+    from synthetic import synthetic_frames
+    hls_publisher = _load('test0', 'hls_publisher')
+    import av
+
+    frames = synthetic_frames(opts.width, opts.height)
+    appeared = {}
+    with tempfile.TemporaryDirectory() as directory:
+        publisher = hls_publisher.HlsPublisher(directory, opts.width, opts.height, opts.fps, opts.segment, list_size=4,
+                                               preset=opts.preset, port=0)
+        done = threading.Event()
+
+        def poll():
+            while not done.is_set():
+                try:
+                    with urllib.request.urlopen(publisher.url) as response:
+                        for line in response.read().decode().splitlines():
+                            if line and not line.startswith('#'):
+                                appeared.setdefault(line, time.monotonic())
+                except OSError:
+                    pass  # 404 until the first segment is complete
+                time.sleep(0.02)
+
+        poller = threading.Thread(target=poll, daemon=True)
+        started = time.monotonic()
+        poller.start()
+        period = 1.0 / opts.fps
+        deadline = started
+        for i in range(int(opts.video_seconds * opts.fps)):
+            publisher.publish(frames[i % len(frames)], deadline)
+            deadline += period
+            time.sleep(max(0.0, deadline - time.monotonic()))
+        time.sleep(0.1)
+        done.set()
+        poller.join()
+        last = publisher.segments()[-1]
+        with urllib.request.urlopen(publisher.url.rsplit('/', 1)[0] + '/' + last) as response, \
+                av.open(io.BytesIO(response.read()), format='mpegts') as segment:
+            decoded = sum(1 for _ in segment.decode(video=0))
+        publisher.close()
+        stats = publisher.stats()
+
+    # A segment ends `segment` seconds after it starts; how long after that did the playlist list it?
+    delays = [at - (started + (int(name[len('stream'):-len('.ts')]) + 1) * opts.segment) for name, at in appeared.items()]
+    return dict(stats, segments_seen=len(appeared), last_segment_frames=decoded, playlist_delay_ms=latency_summary(delays))
+
+
+def bench_batch(opts):
+    """test1 BatchTranscriber: a directory of WAV and raw files, chunked at silences and uploaded in parallel."""
+    _path('test1')
+    from AudioEncoder import encode_wav
+    from BatchTranscriber import BatchTranscriber
+    from TranscriptionClient import TranscriptionClient
+
+    with tempfile.TemporaryDirectory() as directory:
+        if opts.raw:
+            os.symlink(os.path.abspath(opts.raw), os.path.join(directory, os.path.basename(opts.raw)))
+        else:
+            for i in range(opts.files):
+                samples, _ = speech_and_silence(opts.duration, 16000, gap=(opts.silence + 0.5, opts.silence + 2.5), seed=i)
+                if i % 2:
+                    samples.tofile(os.path.join(directory, f"{i:02d}.raw"))
+                else:
+                    with open(os.path.join(directory, f"{i:02d}.wav"), 'wb') as f:
+                        f.write(encode_wav(samples, 16000))
+        with StubWhisperServer(opts.latency, opts.jitter) as stub, TranscriptionClient('bench', base_url=stub.url, max_in_flight=8) as client:
+            batch = BatchTranscriber(client, raw_rate=opts.raw_rate, format='wav')
+            chunks = list(batch.transcribe([directory]))
+            requests = len(stub.requests)
+    ordered = all((a['file'], a['start']) < (b['file'], b['start']) for a, b in zip(chunks, chunks[1:]))
+    return dict(batch.stats(), requests=requests, ordered=ordered)
+
+
+SCENARIOS = {
+    'pipeline': bench_pipeline,
+    'recorder': bench_recorder,
+    'chunks': bench_chunks,
+    'stereo': bench_stereo,
+    'stream': bench_stream,
+    'frame_bus': bench_frame_bus,
+    'batch': bench_batch,
+    'streaming': bench_streaming,
+    'gate': bench_gate,
+    'hls': bench_hls,
+}
+
+
+def _usage():
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    cpu = sum(u.ru_utime + u.ru_stime for u in usage)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return cpu, max(u.ru_maxrss for u in usage) * scale
+
+
+def _child(name, opts, connection):
+    """Run one scenario in a fresh process so CPU time and peak RSS are its own."""
+    with contextlib.redirect_stdout(sys.stderr):  # Keep the scripts' chatter out of the report
+        started = time.monotonic()
+        cpu_before, _ = _usage()
+        if opts.stages:
+            _path('test1')
+            from Tracer import tracer
+            tracer.enable()
+        try:
+            result = SCENARIOS[name](opts)
+        except (ImportError, OSError) as e:
+            connection.send({'skipped': f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            connection.send({'error': f"{type(e).__name__}: {e}"})
+            return
+        elapsed = time.monotonic() - started
+        cpu_after, peak_rss = _usage()
+    result['seconds'] = round(elapsed, 2)
+    result['cpu_percent'] = round((cpu_after - cpu_before) / elapsed * 100, 1)
+    result['peak_rss_mb'] = round(peak_rss / 2 ** 20, 1)
+    if 'segments' in result:
+        result['segments_per_s'] = round(result['segments'] / elapsed, 3)
+    if opts.stages:
+        result['stages'] = tracer.summary()
+    connection.send(result)
+
+
+def run(name, opts):
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(name, opts, sender))
+    process.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        process.join()
+        return {'error': f"scenario process exited with code {process.exitcode}"}
+    finally:
+        process.join()
+
+
+def compare(report, baseline):
+    """Relative change (%) of every numeric metric against a previous report."""
+    def walk(current, previous):
+        delta = {}
+        for key, value in current.items():
+            old = previous.get(key) if isinstance(previous, dict) else None
+            if isinstance(value, dict):
+                nested = walk(value, old)
+                if nested:
+                    delta[key] = nested
+            elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                delta[key] = round((value - old) / abs(old) * 100, 1)
+        return delta
+    return walk(report['scenarios'], baseline.get('scenarios', {}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks on synthetic audio/video and a stub Whisper API (no hardware or network needed)")
+    parser.add_argument('scenarios', nargs='*', default=list(SCENARIOS), help=f"Any of: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('-d', '--duration', type=float, default=30.0, help="Seconds of synthetic speech and silence")
+    parser.add_argument('--raw', type=str, default=None, help="Use headerless int16 mono PCM instead, e.g. node/audio/output.raw")
+    parser.add_argument('--raw-rate', type=int, default=16000, help="Sample rate of --raw")
+    parser.add_argument('--files', type=int, default=4, help="Synthetic files of --duration seconds in the batch scenario")
+    parser.add_argument('--speed', type=float, default=1.0, help="Feed audio this many times faster than real time")
+    parser.add_argument('--silence', type=float, default=1.5, help="Silence threshold of the recorders in seconds")
+    parser.add_argument('--record-timeout', type=float, default=2.0, help="Chunk length of the test2 loop in seconds")
+    parser.add_argument('--target-lag', type=float, default=5.0, help="Queue lag after which the pipeline's pending segments are merged into one request")
+    parser.add_argument('--max-backlog', type=float, default=120.0, help="Seconds of audio the segment queues hold before dropping the oldest")
+    parser.add_argument('--speculate', type=float, default=0, help="Trailing silence after which the pipeline scenario uploads speculatively (0 disables)")
+    parser.add_argument('--chunk-seconds', type=float, default=5.0, help="Chunk length of the streaming scenario")
+    parser.add_argument('--overlap', type=float, default=1.0, help="Chunk overlap of the streaming scenario")
+    parser.add_argument('--latency', type=float, default=0.3, help="Stub API response time in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random stub API delay of up to this many seconds")
+    parser.add_argument('--video-seconds', type=float, default=10.0, help="Length of each video scenario")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=float, default=30.0, help="Frame rate of the synthetic cameras")
+    parser.add_argument('--consumer-ms', type=float, default=5.0, help="Per-frame work of the stream consumer")
+    parser.add_argument('--segment', type=float, default=1.0, help="HLS segment length of the hls scenario")
+    parser.add_argument('--preset', default='ultrafast', help="x264 preset of the hls scenario")
+    parser.add_argument('--motion', type=float, default=0.05, help="Fraction of the gate scenario's frames with motion")
+    parser.add_argument('--subscribers', type=int, default=2, help="Frame bus subscriber processes")
+    parser.add_argument('--stages', action='store_true', help="Enable the per-stage tracer and add its histograms to the report")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Also write the report to this file")
+    parser.add_argument('-b', '--baseline', type=str, default=None, help="Earlier report to compare against")
+    opts = parser.parse_args()
+
+    unknown = set(opts.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = {'config': vars(opts), 'scenarios': {}}
+    for name in opts.scenarios:
+        print(f"Running {name}...", file=sys.stderr)
+        report['scenarios'][name] = run(name, opts)
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            report['change_percent'] = compare(report, json.load(f))
+
+    text = json.dumps(report, indent=4)
+    print(text)
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            f.write(text + '\n')
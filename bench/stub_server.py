@@ -0,0 +1,118 @@
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _words(body, number, spacing=0.4):
+    """A word every `spacing` seconds of the WAV in a multipart body."""
+    riff = body.find(b'RIFF')
+    data = body.find(b'data', riff)
+    if riff < 0 or data < 0:
+        return []
+    rate = struct.unpack_from('<I', body, riff + 24)[0]
+    duration = struct.unpack_from('<I', body, data + 4)[0] / (2 * rate)
+    return [{'word': f" w{number}.{i}", 'start': round(i * spacing, 3), 'end': round(i * spacing + spacing * 0.8, 3)}
+            for i in range(int(duration / spacing))]
+
+
+class StubWhisperServer:
+    """Local stand-in for the Whisper transcription API.
+
+    Answers POST .../audio/transcriptions and .../audio/translations after
+    `latency` seconds (plus up to `jitter` more) with {"text": ...}, plus
+    evenly spaced 'words' over the uploaded WAV when verbose JSON is asked for. Every
+    request is recorded as (received, answered, bytes) monotonic times, so a
+    benchmark can tell network/server time apart from its own. Requests whose
+    1-based number is in `fail` get a plain-text 500 instead.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.0, host='127.0.0.1', port=0, seed=0, fail=()):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail = set(fail)
+        self.requests = []
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+            def do_POST(self):
+                received = time.monotonic()
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not self.path.rstrip('/').endswith(('/audio/transcriptions', '/audio/translations')):
+                    self.send_error(404)
+                    return
+                with stub._lock:
+                    number = len(stub.requests) + 1
+                    delay = stub.latency + stub._random.uniform(0, stub.jitter)
+                    stub.requests.append(None)
+                time.sleep(delay)
+                if number in stub.fail:
+                    payload = b'Internal Server Error'
+                    self.send_response(500)
+                    self.send_header('Content-Type', 'text/plain')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    with stub._lock:
+                        stub.requests[number - 1] = (received, time.monotonic(), len(body))
+                    return
+                result = {'text': f"segment {number}"}
+                if b'verbose_json' in body:
+                    result['words'] = _words(body, number)
+                payload = json.dumps(result).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with stub._lock:
+                    stub.requests[number - 1] = (received, time.monotonic(), len(body))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stub Whisper API for offline benchmarks (use its URL as the client's base_url)")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.3, help="Seconds before each response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random delay of up to this many seconds")
+    args = parser.parse_args()
+
+    with StubWhisperServer(args.latency, args.jitter, port=args.port) as stub:
+        print(f"Serving on {stub.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
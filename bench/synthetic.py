@@ -0,0 +1,237 @@
+import threading
+import time
+
+import numpy as np
+
+
+def _voiced(n, fs, rng):
+    """A crude vowel: a few harmonics of a wandering pitch under a syllable-rate envelope."""
+    t = np.arange(n) / fs
+    f0 = rng.uniform(100, 220) * (1.0 + 0.08 * np.sin(2 * np.pi * 0.7 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / fs
+    wave = sum(np.sin(k * phase) / k for k in range(1, 9))
+    envelope = 0.35 + 0.65 * 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3, 5) * t))
+    ramp = np.minimum(1.0, np.minimum(np.arange(n), np.arange(n)[::-1]) / (0.02 * fs))
+    return wave * envelope * ramp / 2.5
+
+
+def speech_and_silence(seconds, fs=16000, speech=(0.8, 3.0), gap=(2.0, 4.0), lead=1.0, noise_db=-55.0, level=0.3, seed=0):
+    """Alternating voiced bursts and background noise.
+
+    Returns (int16 samples, [(start, stop)]) with the exact sample range of
+    every burst. Gaps are longer than the recorders' default silence
+    threshold, so each burst should come out as exactly one segment. The
+    signal ends with a full gap so the last segment is closed too.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * fs)
+    out = rng.normal(0.0, 10 ** (noise_db / 20), total + int(gap[1] * fs))
+    utterances = []
+    pos = int(lead * fs)
+    while True:
+        length = int(rng.uniform(*speech) * fs)
+        if pos + length + int(gap[1] * fs) > total:
+            break
+        out[pos:pos + length] += level * _voiced(length, fs, rng)
+        utterances.append((pos, pos + length))
+        pos += length + int(rng.uniform(*gap) * fs)
+    out = out[:max(pos, utterances[-1][1] + int(gap[1] * fs)) if utterances else total]
+    return (np.clip(out, -1.0, 1.0) * 32767).astype(np.int16), utterances
+
+
+def load_raw(path, fs_file=16000, fs=None, vad=None):
+    """Headerless int16 mono PCM (e.g. node/audio/output.raw) plus reference speech ranges.
+
+    Without ground truth, the reference is the offline VoiceActivityDetector
+    run with its hangover taken off the end of every segment.
+    """
+    samples = np.fromfile(path, dtype=np.int16)
+    if fs and fs != fs_file:
+        from Resampler import resample
+        samples = resample(samples, fs_file, fs)
+    fs = fs or fs_file
+    if vad is None:
+        from VoiceActivityDetector import VoiceActivityDetector
+        vad = VoiceActivityDetector(fs, hangover=1.5)
+    hangover = vad.hangover_frames * vad.frame_length
+    utterances = [(start, max(start, stop - hangover)) for start, stop in vad.segments(samples)]
+    return samples, utterances
+
+
+class SyntheticInputStream:
+    """Stands in for sounddevice.InputStream: plays `samples` into `callback` in real time.
+
+    `speed` > 1 runs faster than real time. Once the samples run out, low
+    background noise keeps flowing so that silence timeouts still fire;
+    `finished` is set at that point. `wall_time(position)` is the monotonic
+    time at which a sample position was handed to the callback.
+    """
+
+    def __init__(self, samples, callback=None, samplerate=16000, blocksize=1024, channels=1, dtype='int16', speed=1.0, noise_db=-55.0, **kwargs):
+        self.samples = np.asarray(samples, dtype=np.int16).reshape(-1)
+        self.callback = callback
+        self.samplerate = samplerate
+        self.blocksize = blocksize or 1024
+        self.speed = speed
+        self.noise = (np.random.default_rng(1).normal(0.0, 10 ** (noise_db / 20), self.samplerate) * 32767).astype(np.int16)
+        self.finished = threading.Event()
+        self.started = None
+        self.position = 0
+        self._running = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _block(self, pos):
+        block = self.samples[pos:pos + self.blocksize]
+        if block.size < self.blocksize:
+            self.finished.set()
+            offset = pos % self.noise.size
+            filler = np.resize(np.roll(self.noise, -offset), self.blocksize - block.size)
+            block = np.concatenate((block, filler))
+        return block.reshape(-1, 1)
+
+    def _run(self):
+        period = self.blocksize / self.samplerate / self.speed
+        deadline = self.started
+        while self._running:
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.callback(self._block(self.position), self.blocksize, None, None)
+            except Exception as e:
+                if type(e).__name__ == 'CallbackStop':
+                    break
+                raise
+            self.position += self.blocksize
+
+    def wall_time(self, position):
+        return self.started + (position + self.blocksize) / self.samplerate / self.speed
+
+    def start(self):
+        self.started = time.monotonic()
+        self._running = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class SyntheticDevice:
+    """Factory with the `sounddevice.InputStream` call signature that remembers the streams it opened."""
+
+    def __init__(self, samples, speed=1.0):
+        self.samples = samples
+        self.speed = speed
+        self.streams = []
+
+    def InputStream(self, **kwargs):
+        kwargs.setdefault('speed', self.speed)
+        stream = SyntheticInputStream(self.samples, **kwargs)
+        self.streams.append(stream)
+        return stream
+
+
+def synthetic_frames(width, height, count=30):
+    """`count` distinct BGR frames: a gradient with a bright bar sweeping across it."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.empty((height, width, 3), dtype=np.uint8)
+    base[..., 0] = (x[None, :] * 0.5 + y * 0.5).astype(np.uint8)
+    base[..., 1] = x[None, :].astype(np.uint8)
+    base[..., 2] = np.broadcast_to(y, (height, width)).astype(np.uint8)
+    frames = np.repeat(base[None], count, axis=0)
+    bar = max(1, width // 16)
+    for i in range(count):
+        left = i * (width - bar) // max(1, count - 1)
+        frames[i, :, left:left + bar] = 255
+    return frames
+
+
+def idle_frames(width, height, count=10, noise=3, seed=0):
+    """`count` frames of the static `synthetic_frames` gradient, each with its own +-`noise` sensor noise."""
+    rng = np.random.default_rng(seed)
+    base = synthetic_frames(width, height, count=1)[0].astype(np.int16)
+    frames = np.empty((count, height, width, 3), dtype=np.uint8)
+    for i in range(count):
+        np.clip(base + rng.integers(-noise, noise + 1, base.shape, dtype=np.int16), 0, 255, out=frames[i], casting='unsafe')
+    return frames
+
+
+class SyntheticCapture:
+    """Stands in for cv2.VideoCapture: serves synthetic frames at `fps`.
+
+    Supports the subset the camera scripts use (read, grab/retrieve, get/set
+    of width, height, fps and position, isOpened, release). After
+    `max_frames` frames it reports end of stream.
+    """
+
+    # cv2.CAP_PROP_* values, so this works without OpenCV installed
+    POS_MSEC, WIDTH, HEIGHT, FPS, BUFFERSIZE = 0, 3, 4, 5, 38
+
+    def __init__(self, source=0, width=1280, height=720, fps=30.0, max_frames=None):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.max_frames = max_frames
+        self.count = 0
+        self._frames = None
+        self._opened = True
+        self._next = None
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        if prop == self.WIDTH:
+            self.width, self._frames = int(value), None
+        elif prop == self.HEIGHT:
+            self.height, self._frames = int(value), None
+        elif prop == self.FPS:
+            self.fps = float(value)
+        return True
+
+    def get(self, prop):
+        return {
+            self.POS_MSEC: self.count * 1000.0 / self.fps,
+            self.WIDTH: float(self.width),
+            self.HEIGHT: float(self.height),
+            self.FPS: float(self.fps),
+        }.get(prop, 0.0)
+
+    def grab(self):
+        if not self._opened or (self.max_frames is not None and self.count >= self.max_frames):
+            return False
+        if self._frames is None:
+            self._frames = synthetic_frames(self.width, self.height)
+        now = time.monotonic()
+        self._next = max(self._next or now, now - 1.0 / self.fps) + 1.0 / self.fps
+        if self._next > now:
+            time.sleep(self._next - now)
+        self.count += 1
+        return True
+
+    def retrieve(self, image=None):
+        frame = self._frames[self.count % len(self._frames)]
+        if image is None:
+            return True, frame.copy()
+        np.copyto(image, frame)
+        return True, image
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        self._opened = False
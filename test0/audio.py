@@ -1,14 +1,21 @@
 import argparse
-import datetime
 import json
 import os
 import sys
-import wave
+import threading
 
 import numpy as np
-import requests
 import sounddevice as sd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test1'))
+from AudioEncoder import AudioEncoder, DEFAULT_FORMAT
+from BatchTranscriber import AUDIO_EXTENSIONS, BatchTranscriber, format_chunk, join_chunks
+from RingBuffer import RingBuffer
+from TranscriptionCache import TranscriptionCache
+from TranscriptionClient import shared_client
+from Tracer import tracer
+from VoiceActivityDetector import VoiceActivityDetector
+
 
 def int_or_str(text):
     """Helper function for argument parsing."""
@@ -18,67 +25,74 @@ def int_or_str(text):
         return text
 
 
-def record_audio(duration, volume_threshold, silence_threshold, fs):
-    """Record audio from the microphone and return the data as numpy array."""
-    myrecording = None  # Initialize to None to handle early exits safely
+def record_audio(duration, threshold_db, silence_threshold, fs):
+    """Record one utterance from the microphone and return the data as numpy array."""
+    ring = RingBuffer(int(duration * fs))
+    vad = VoiceActivityDetector(fs, threshold_db=threshold_db, hangover=silence_threshold)
+    segments = []
+    done = threading.Event()
+
     def callback(indata, frames, time, status):
         """This function will be called for each audio block."""
         if status:
             print(status, file=sys.stderr)
-        volume_norm = np.linalg.norm(indata) * 10
-        if volume_norm < volume_threshold:
-            raise sd.CallbackAbort  # Stop recording if below volume threshold
-        sys.stdout.write('▒')
-        sys.stdout.flush()
+        # The ring holds exactly the maximum duration: the block that fills it is cut
+        # short, so nothing recorded is overwritten
+        indata = indata[:ring.capacity - ring.head]
+        with tracer.span('capture'):
+            ring.write(indata)
+            segments.extend(vad.process(indata))
+        if vad.active:
+            sys.stdout.write('▒')
+            sys.stdout.flush()
+        if segments:
+            raise sd.CallbackStop  # Speech followed by enough silence
+        if ring.head >= ring.capacity:
+            raise sd.CallbackStop  # Maximum duration reached
 
     try:
-        with sd.InputStream(callback=callback, channels=1, samplerate=fs, dtype='int16'):
+        with sd.InputStream(callback=callback, channels=1, samplerate=fs, dtype='int16', finished_callback=done.set):
             print("\nRecording... (press Ctrl+C to stop)")
-            myrecording = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='int16')
-            sd.wait()
+            done.wait()
+        if segments:
+            print("\nSilence detected, stopping recording")
     except KeyboardInterrupt:
         print("\nRecording stopped: KeyboardInterrupt")
-    except sd.CallbackAbort:
-        print("\nSilence detected, stopping recording")
     except Exception as e:
         print(f"\nAn error occurred: {e}")
-    finally:
-        if myrecording is not None:
-            myrecording = np.trim_zeros(myrecording.flatten(), 'f')
-        return myrecording if myrecording is not None and myrecording.size > 0 else None
 
-
-def save_wave_file(filename, data, fs):
-    """Save a numpy array to a WAV file."""
-    if data is not None:
-        wavfile = wave.open(filename, 'wb')
-        wavfile.setnchannels(1)
-        wavfile.setsampwidth(2)  # 2 bytes per sample
-        wavfile.setframerate(fs)
-        wavfile.writeframes(data.tobytes())
-        wavfile.close()
-        print(f"File saved: {filename}")
+    segments.extend(vad.flush())
+    if not segments:
+        return None
+    start, stop = segments[0]
+    return ring.samples(max(start, ring.tail), min(stop, ring.head))
 
 
 def transcribe_audio(file_path, token, language='en', model='whisper-1', translate=False):
     """Transcribe audio using OpenAI's Whisper API."""
-    headers = {
-        'Authorization': f'Bearer {token}'
-    }
-    params = {
-        'model': model,
-        'language': language
-    }
-    files = {
-        'file': open(file_path, 'rb')
-    }
-    if translate:
-        url = "https://api.openai.com/v1/audio/translations"
-    else:
-        url = "https://api.openai.com/v1/audio/transcriptions"
+    with open(file_path, 'rb') as audio_file:
+        transcription = shared_client(token).transcribe(audio_file, filename=os.path.basename(file_path), language=language, model=model, translate=translate)
+    print(json.dumps(transcription, indent=4))
+    return transcription
+
 
-    response = requests.post(url, headers=headers, files=files, data=params)
-    transcription = response.json()
+def transcribe_batch(paths, token, language='en', model='whisper-1', translate=False, audio_format=DEFAULT_FORMAT, upload_rate=16000,
+                     max_chunk=60.0, raw_rate=16000, jobs=8):
+    """Transcribe WAV/raw files or directories in silence-bounded chunks, uploaded in parallel and printed in order."""
+    batch = BatchTranscriber(shared_client(token), max_seconds=max_chunk, format=audio_format, upload_rate=upload_rate, raw_rate=raw_rate,
+                             window=2 * jobs, language=language, model=model, translate=translate)
+    chunks = []
+    for chunk in batch.transcribe(paths):
+        print(format_chunk(chunk))
+        chunks.append(chunk)
+    print(json.dumps(batch.stats(), indent=4))
+    print(f"\nTranscript:\n{join_chunks(chunks)}")
+    return chunks
+
+
+def transcribe_encoded(encoded, token, language='en', model='whisper-1', translate=False):
+    """Transcribe an in-memory EncodedAudio using OpenAI's Whisper API."""
+    transcription = shared_client(token).transcribe(encoded.data, filename=encoded.filename, content_type=encoded.content_type, language=language, model=model, translate=translate, pcm_digest=encoded.pcm_digest)
     print(json.dumps(transcription, indent=4))
     return transcription
 
@@ -86,30 +100,53 @@ def transcribe_audio(file_path, token, language='en', model='whisper-1', transla
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Whisper API Audio Recorder and Transcriber")
     parser.add_argument('-d', '--duration', type=float, default=30.0, help="Duration of the recording in seconds (for microphone input)")
-    parser.add_argument('-v', '--volume', type=float, default=1.0, help="Volume threshold percentage (for microphone input)")
+    parser.add_argument('-td', '--threshold-db', type=float, default=9.0, help="Speech threshold in dB above the adaptive noise floor (for microphone input)")
+    # The old linear threshold has no dB equivalent: refuse it rather than reinterpret it
+    parser.add_argument('-v', '--volume', type=float, default=None, help=argparse.SUPPRESS)
     parser.add_argument('-s', '--silence', type=float, default=1.5, help="Silence length to trigger recording stop (for microphone input)")
     parser.add_argument('-t', '--token', type=str, required=True, help="OpenAI API token")
-    parser.add_argument('-f', '--file', type=str, help="Path to an audio file for transcription")
+    parser.add_argument('-f', '--file', type=str, help="Path to an audio file, or a directory of WAV/raw files, for transcription")
+    parser.add_argument('-j', '--jobs', type=int, default=8, help="Concurrent uploads when transcribing WAV/raw files")
+    parser.add_argument('-x', '--max-chunk', type=float, default=60.0, help="Longest chunk a WAV/raw file is uploaded in, in seconds")
+    parser.add_argument('-r', '--raw-rate', type=int, default=16000, help="Sample rate of headerless int16 mono files")
     parser.add_argument('-l', '--language', type=str, default='en', help="Language for transcription")
     parser.add_argument('-m', '--model', type=str, default='whisper-1', help="Model type for Whisper API")
     parser.add_argument('-tr', '--translate', action='store_true', help="Translate transcription to English")
+    parser.add_argument('-fmt', '--format', type=str, default=DEFAULT_FORMAT, choices=sorted(AudioEncoder.FORMATS), help="Container used for uploads")
+    parser.add_argument('-ur', '--upload-rate', type=int, default=16000, help="Sample rate segments are resampled to before upload")
+    parser.add_argument('-a', '--archive', type=str, default=None, help="Directory to keep a copy of the recording in")
+    parser.add_argument('-c', '--cache', type=str, default='cache', help="Directory for cached transcriptions (empty to disable)")
+    parser.add_argument('-tf', '--trace', type=str, default=None, help="Append one JSON line per timed stage to this file")
+    parser.add_argument('-mf', '--metrics', type=str, default=None, help="Keep per-stage latency histograms in this file (Prometheus text format)")
     args = parser.parse_args()
+    if args.volume is not None:
+        parser.error("--volume (a linear volume threshold) has been replaced by --threshold-db, the speech threshold in dB above the adaptive noise floor")
 
     fs = 44100  # Sample rate
+    if args.trace or args.metrics:
+        tracer.enable(args.trace, args.metrics)
+    shared_client(args.token, cache=TranscriptionCache(args.cache) if args.cache else None, max_in_flight=args.jobs)
 
     if args.file:
-        if os.path.exists(args.file):
+        if not os.path.exists(args.file):
+            print("File not found!")
+        elif os.path.isdir(args.file) or args.file.lower().endswith(AUDIO_EXTENSIONS):
+            # Long recordings are cut at silences and uploaded in parallel instead of in one request.
+            print("Transcribing in chunks...")
+            transcribe_batch([args.file], args.token, args.language, args.model, args.translate, args.format, args.upload_rate,
+                             args.max_chunk, args.raw_rate, args.jobs)
+        else:
             print("Transcribing file...")
             transcribe_audio(args.file, args.token, args.language, args.model, args.translate)
-        else:
-            print("File not found!")
     else:
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"output_{timestamp}.wav"
-        recorded_data = record_audio(args.duration, args.volume, args.silence, fs)
+        recorded_data = record_audio(args.duration, args.threshold_db, args.silence, fs)
         if recorded_data is not None:
-            save_wave_file(filename, recorded_data, fs)
+            encoded = AudioEncoder(fs, format=args.format, archive_dir=args.archive, target_rate=args.upload_rate).encode(recorded_data)
             print("Transcribing recorded audio...")
-            transcribe_audio(filename, args.token, args.language, args.model, args.translate)
+            transcribe_encoded(encoded, args.token, args.language, args.model, args.translate)
         else:
             print("No audio recorded or file is empty.")
+
+    if tracer.enabled:
+        print(json.dumps(tracer.summary(), indent=4))
+        tracer.close()
@@ -1,45 +1,37 @@
 import cv2
-import numpy as np
 
-def display_cameras_side_by_side():
-    # Initialize two camera capture objects
-    cap1 = cv2.VideoCapture(0)  # First camera
-    cap2 = cv2.VideoCapture(1)  # Second camera
+from motion import ChangeDetector
+from stereo import StereoCapture
 
-    # Check if cameras are opened successfully
-    if not (cap1.isOpened() and cap2.isOpened()):
-        print("Error: Could not open one or both cameras")
+def display_cameras_side_by_side():
+    # Each camera is read on its own thread; frames are paired by capture timestamp
+    try:
+        stereo = StereoCapture(0, 1, width=1280, height=720)
+    except RuntimeError as e:
+        print(f"Error: Could not open one or both cameras ({e})")
         return
 
-    # Set resolution for both cameras (if needed, ensure your camera supports these resolutions)
-    cap1.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap1.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    cap2.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap2.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
+    # Both eyes are checked at once; a pair in which neither changed is not redrawn
+    gate = ChangeDetector()
     try:
-        while True:
-            # Capture frame-by-frame from both cameras
-            ret1, frame1 = cap1.read()
-            ret2, frame2 = cap2.read()
-
-            if not ret1 or not ret2:
-                print("Error: Can't receive frame from one of the cameras. Exiting ...")
-                break
-
-            # Concatenate images horizontally
-            combined_frame = np.hstack((frame1, frame2))
-
-            # Display the resulting frame
-            cv2.imshow('Binocular View', combined_frame)
-
-            # Press 'q' on the keyboard to exit
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        with stereo:
+            while True:
+                # The composite buffer is reused: both eyes are copied into its two halves
+                ok, combined_frame, skew = stereo.read()
+                if not ok:
+                    print("Error: Can't receive frame from one of the cameras. Exiting ...")
+                    break
+
+                # Display the resulting frame
+                if gate.check(combined_frame):
+                    cv2.imshow('Binocular View', combined_frame)
+
+                # Press 'q' on the keyboard to exit
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
     finally:
-        # When everything done, release the capture
-        cap1.release()
-        cap2.release()
+        print(stereo.stats())
+        print(gate.stats())
         cv2.destroyAllWindows()
 
 if __name__ == '__main__':
@@ -1,5 +1,10 @@
+import sys
+
 import cv2
 
+from frame_bus import FrameSubscriber
+from motion import ChangeDetector
+
 def display_camera():
     cap = cv2.VideoCapture(0)
 
@@ -11,6 +16,8 @@ def display_camera():
         print("Error: Could not open camera")
         return
 
+    # Unchanged frames are not redrawn; the window keeps showing the last one
+    gate = ChangeDetector()
     try:
         while True:
             ret, frame = cap.read()
@@ -18,14 +25,47 @@ def display_camera():
                 print("Error: Can't receive frame (stream end?). Exiting ...")
                 break
 
-            cv2.imshow('Camera Output', frame)
+            if gate.check(frame):
+                cv2.imshow('Camera Output', frame)
 
             # The '1' in waitKey is a millisecond delay time. Lowering this can increase perceived frame rate.
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
     finally:
+        print(gate.stats())
         cap.release()
         cv2.destroyAllWindows()
 
+def display_bus(name):
+    # Another process (frame_bus.py) owns the camera; we only map its frames
+    try:
+        bus = FrameSubscriber(name)
+    except FileNotFoundError:
+        print(f"Error: No frame bus named '{name}' (start frame_bus.py first)")
+        return
+
+    gate = ChangeDetector()
+    try:
+        while True:
+            frame = bus.next(timeout=1.0)
+            if frame is None:
+                print("Error: No frame from the publisher for 1 second. Exiting ...")
+                break
+
+            if gate.check(frame[2]):
+                cv2.imshow('Camera Output', frame[2])
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        print(f"Frames skipped: {bus.skipped}")
+        print(gate.stats())
+        bus.close()
+        cv2.destroyAllWindows()
+
 if __name__ == '__main__':
-    display_camera()
+    # python camera.py [bus name] - without a name the camera is opened directly
+    if len(sys.argv) > 1:
+        display_bus(sys.argv[1])
+    else:
+        display_camera()
@@ -1,8 +1,15 @@
+import time
+
 import av
+import numpy as np
+from av.video.reformatter import VideoReformatter
 import pygame
 import sys
 from pygame.locals import QUIT
 
+# Frames later than this are dropped instead of drawn, so we catch up with the camera
+MAX_LATENESS = 0.1
+
 def main():
     # Pygame setup
     pygame.init()
@@ -12,36 +19,56 @@ def main():
 
     # Open the USB camera (usually /dev/video0)
     camera = av.open('/dev/video0')
+    stream = camera.streams.video[0]
+    stream.thread_type = 'AUTO'
+
+    # One RGB buffer for the whole session, wrapped once as a surface: every frame is
+    # copied into it and blitted, so the loop allocates no frame-sized arrays
+    width, height = window_size
+    rgb = np.empty((height, width, 3), np.uint8)
+    surface = pygame.image.frombuffer(rgb, window_size, 'RGB')
+    # Keeps its swscale context between frames instead of building one per frame
+    reformatter = VideoReformatter()
+
+    # Wall-clock time that corresponds to the first frame's timestamp
+    clock_start = None
+    pts_start = None
+    shown = dropped = 0
 
     # Main loop to display each frame
     try:
-        for frame in camera.decode(video=0):
+        for frame in camera.decode(stream):
             for event in pygame.event.get():
                 if event.type == QUIT:
                     pygame.quit()
                     sys.exit()
-            
-            # Convert the frame to a pygame-compatible surface
-            img = frame.to_image()  # Get PIL image from PyAV frame
-            mode = img.mode
-            size = img.size
-            data = img.tobytes()
-
-            # Create a pygame Surface from raw pixel data
-            py_image = pygame.image.fromstring(data, size, mode)
 
-            # Resize to fit the window
-            py_image = pygame.transform.scale(py_image, window_size)
+            # Pace by the frame's own timestamp instead of a fixed wait
+            if frame.time is not None:
+                if clock_start is None:
+                    clock_start, pts_start = time.monotonic(), frame.time
+                delay = clock_start + (frame.time - pts_start) - time.monotonic()
+                if delay > 0:
+                    pygame.time.wait(int(delay * 1000))
+                elif delay < -MAX_LATENESS:
+                    dropped += 1
+                    continue
 
-            # Display the image
-            window.blit(py_image, (0, 0))
+            # libswscale scales to the window size and converts to RGB in one pass
+            scaled = reformatter.reformat(frame, width=width, height=height, format='rgb24')
+            plane = scaled.planes[0]
+            # View the plane in place (rows may be padded to line_size) and copy it into the surface's buffer
+            pixels = np.frombuffer(plane, np.uint8).reshape(height, plane.line_size)[:, :width * 3]
+            np.copyto(rgb, pixels.reshape(height, width, 3))
+            window.blit(surface, (0, 0))
             pygame.display.flip()
-            pygame.time.wait(50)  # control playback speed / frame rate
+            shown += 1
 
     except KeyboardInterrupt:
         pass
 
     finally:
+        print(f"Frames shown: {shown}, dropped late: {dropped}")
         camera.close()
         pygame.quit()
 
@@ -0,0 +1,228 @@
+import argparse
+import struct
+import sys
+import time
+from multiprocessing import parent_process, resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = b'FBUS'
+# magic, slots, height, width, channels, dtype
+HEADER = struct.Struct('<4sIIII8s')
+ALIGN = 64
+
+# Segments created by publishers in this process
+_published = set()
+
+
+def _layout(slots, shape, dtype):
+    """Byte offsets of (latest, seqs, stamps, frames) and the total size."""
+    latest = ALIGN
+    seqs = latest + ALIGN
+    stamps = seqs + 8 * slots
+    frames = -(-(stamps + 8 * slots) // ALIGN) * ALIGN
+    frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return latest, seqs, stamps, frames, frames + slots * frame_bytes
+
+
+class _FrameRing:
+    """Numpy views over the shared segment: a latest counter, per-slot seq/timestamp and the frames."""
+
+    def __init__(self, shm, slots, shape, dtype):
+        self.shm = shm
+        self.slots = slots
+        self.shape = shape
+        latest, seqs, stamps, frames, _ = _layout(slots, shape, dtype)
+        self.latest = np.ndarray((1,), np.int64, shm.buf, latest)
+        self.seqs = np.ndarray((slots,), np.int64, shm.buf, seqs)
+        self.stamps = np.ndarray((slots,), np.float64, shm.buf, stamps)
+        self.frames = np.ndarray((slots,) + shape, dtype, shm.buf, frames)
+
+    def release(self):
+        # Views must go before the mapping can be closed
+        del self.latest, self.seqs, self.stamps, self.frames
+        self.shm.close()
+
+
+class FramePublisher:
+    """Owns a named shared-memory ring of `slots` fixed-shape frames.
+
+    Sequence numbers start at 1. Writing a slot first sets its seq to 0, then
+    fills the frame, then stores the new seq in the slot and in `latest`, so a
+    subscriber that sees `seqs[slot] == seq` before and after reading knows
+    the frame was not torn or overwritten.
+    """
+
+    def __init__(self, name, shape, slots=8, dtype=np.uint8):
+        shape = tuple(int(n) for n in shape)
+        if len(shape) == 2:
+            shape += (1,)
+        dtype = np.dtype(dtype)
+        size = _layout(slots, shape, dtype)[-1]
+        self.name = name
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _published.add(self.shm._name)
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, slots, *shape, dtype.str.encode())
+        self.ring = _FrameRing(self.shm, slots, shape, dtype)
+        self.ring.latest[0] = 0
+        self.ring.seqs[:] = 0
+        self.seq = 0
+
+    def slot(self):
+        """Writable view of the slot the next frame goes into; call `commit` once it is filled."""
+        index = (self.seq + 1) % self.ring.slots
+        self.ring.seqs[index] = 0
+        return self.ring.frames[index]
+
+    def commit(self, timestamp=None):
+        self.seq += 1
+        index = self.seq % self.ring.slots
+        self.ring.stamps[index] = time.monotonic() if timestamp is None else timestamp
+        self.ring.seqs[index] = self.seq
+        self.ring.latest[0] = self.seq
+        return self.seq
+
+    def publish(self, frame, timestamp=None):
+        """Copy `frame` into the next slot and publish it; returns its sequence number."""
+        np.copyto(self.slot(), frame.reshape(self.ring.shape))
+        return self.commit(timestamp)
+
+    def close(self):
+        self.ring.release()
+        self.shm.unlink()
+        _published.discard(self.shm._name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameSubscriber:
+    """Attaches to a FramePublisher's ring by name and reads frames without copying.
+
+    Returned frames are read-only views into shared memory. They stay intact
+    until the publisher laps the ring (slots - 1 frames later); use `valid(seq)`
+    after processing, or copy, if that matters to the caller.
+    """
+
+    def __init__(self, name, poll_interval=0.001):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Only the publisher may unlink the segment when this process exits. Processes
+        # started through multiprocessing share their parent's tracker, so leave theirs alone.
+        if self.shm._name not in _published and parent_process() is None:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        magic, slots, height, width, channels, dtype = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC:
+            self.shm.close()
+            raise ValueError(f"{name} is not a frame bus")
+        self.ring = _FrameRing(self.shm, slots, (height, width, channels), np.dtype(dtype.rstrip(b'\0').decode()))
+        self.ring.frames.flags.writeable = False
+        self.poll_interval = poll_interval
+        self.last_seq = 0
+        self.skipped = 0
+
+    @property
+    def shape(self):
+        return self.ring.shape
+
+    def valid(self, seq):
+        """True while the frame published as `seq` is still in its slot."""
+        return self.ring.seqs[seq % self.ring.slots] == seq
+
+    def _read(self, seq):
+        index = seq % self.ring.slots
+        timestamp = self.ring.stamps[index]
+        if not self.valid(seq):
+            return None
+        if self.last_seq:
+            self.skipped += max(0, seq - self.last_seq - 1)
+        self.last_seq = seq
+        return seq, timestamp, self.ring.frames[index]
+
+    def latest(self):
+        """Return (seq, timestamp, frame) for the newest frame, or None if nothing is published yet."""
+        while True:
+            seq = int(self.ring.latest[0])
+            if seq == 0:
+                return None
+            frame = self._read(seq)
+            if frame is not None:
+                return frame
+
+    def next(self, timeout=1.0):
+        """Wait for a frame newer than the last one read; jumps to the newest if we fell behind."""
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = int(self.ring.latest[0])
+            if seq > self.last_seq:
+                oldest = max(self.last_seq + 1, seq - self.ring.slots + 2)
+                frame = self._read(oldest if self.valid(oldest) else seq)
+                if frame is not None:
+                    return frame
+                continue
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def close(self):
+        self.ring.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def publish_camera(source, name, width=None, height=None, slots=8):
+    """Capture `source` with OpenCV straight into the shared ring until interrupted."""
+    import cv2
+
+    cap = cv2.VideoCapture(source)
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    ok, first = cap.read() if cap.isOpened() else (False, None)
+    if not ok:
+        cap.release()
+        raise RuntimeError(f"Could not open camera {source}")
+
+    with FramePublisher(name, first.shape, slots=slots, dtype=first.dtype) as bus:
+        print(f"Publishing {source} as '{name}' ({first.shape[1]}x{first.shape[0]}, {slots} slots)")
+        try:
+            while cap.grab():
+                timestamp = time.monotonic()
+                # Decode directly into shared memory, no intermediate frame
+                ok, _ = cap.retrieve(bus.slot())
+                if not ok:
+                    break
+                bus.commit(timestamp)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cap.release()
+            print(f"Published {bus.seq} frames")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture a camera once and share its frames with other processes.")
+    parser.add_argument('--source', default='0', help="Camera index or stream URL")
+    parser.add_argument('--name', default='camera0', help="Shared memory name subscribers attach to")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--slots', type=int, default=8)
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    try:
+        publish_camera(source, args.name, args.width, args.height, args.slots)
+    except (RuntimeError, FileExistsError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
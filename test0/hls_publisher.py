@@ -0,0 +1,251 @@
+import argparse
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from fractions import Fraction
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import av
+import numpy as np
+
+import timecode
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    """Serves the segment directory; playlists must never be cached, segments never change."""
+
+    def end_headers(self):
+        if self.path.split('?')[0].endswith('.m3u8'):
+            self.send_header('Cache-Control', 'no-cache, no-store')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HlsPublisher:
+    """Encodes frames in-process and writes short HLS segments plus a rolling playlist.
+
+    Frames (BGR arrays, e.g. straight from cv2 or a FrameSubscriber) go
+    through `publish`, are encoded with `codec` at `preset`/`tune` and muxed
+    by FFmpeg's HLS muxer into `directory`. Every GOP of `gop` frames (one
+    segment's worth by default) starts with a keyframe and there are no
+    B-frames or scene-cut keyframes, so each segment is `segment_seconds`
+    long and a player can start at any of them. The playlist keeps the last
+    `list_size` segments and older ones are deleted. With `port` the
+    directory is also served over HTTP, e.g. for stream.py.
+
+    Timestamps come from `publish(frame, timestamp)` (time.monotonic() by
+    default), so the stream keeps the capture's real timing; `stats` reports
+    the time `publish` spends per frame. With `timecode` every frame also
+    carries its capture time as epoch seconds, burnt into a strip along its
+    top edge (see timecode.py), so a reader can measure glass-to-glass
+    latency from the decoded pictures.
+    """
+
+    def __init__(self, directory='hls', width=1280, height=720, fps=30.0, segment_seconds=1.0, gop=None, list_size=6,
+                 codec='libx264', preset='ultrafast', tune='zerolatency', bitrate=None, playlist='stream.m3u8', port=None,
+                 timecode=False, window=300):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.playlist_path = os.path.join(directory, playlist)
+        self.fps = fps
+        self.gop = gop or max(1, round(fps * segment_seconds))
+        options = {'preset': preset, 'tune': tune} if codec == 'libx264' else {}
+        self.container = av.open(self.playlist_path, 'w', format='hls', options={
+            'hls_time': str(segment_seconds),
+            'hls_list_size': str(list_size),
+            'hls_flags': 'delete_segments+independent_segments+temp_file',
+            'hls_segment_filename': os.path.join(directory, 'stream%03d.ts'),
+        })
+        self.stream = self.container.add_stream(codec, rate=Fraction(fps).limit_denominator(1001), options=dict(options, sc_threshold='0'))
+        self.stream.width = width
+        self.stream.height = height
+        self.stream.pix_fmt = 'yuv420p'
+        self.stream.codec_context.time_base = Fraction(1, 1000)
+        self.stream.codec_context.gop_size = self.gop
+        self.stream.codec_context.max_b_frames = 0
+        if bitrate:
+            self.stream.bit_rate = bitrate
+        self.server = None
+        if port is not None:
+            self.server = ThreadingHTTPServer(('', port), functools.partial(_Handler, directory=directory))
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.timecode = timecode
+        self._stamped = None  # Frames are stamped in a copy: the caller's may be read-only shared memory
+        self._origin = None
+        self._last_pts = -1
+        self.frames = 0
+        self.packets = 0
+        self.keyframes = 0
+        self.bytes = 0
+        self._encode_times = deque(maxlen=window)
+
+    @property
+    def url(self):
+        """Playlist URL when serving over HTTP."""
+        if self.server is None:
+            return None
+        return f"http://localhost:{self.server.server_address[1]}/{os.path.basename(self.playlist_path)}"
+
+    def publish(self, frame, timestamp=None):
+        """Encode one BGR frame captured at `timestamp` (time.monotonic() seconds) and mux what the encoder returns."""
+        started = time.perf_counter()
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self._origin is None:
+            self._origin = timestamp
+        # Milliseconds since the first frame; the muxer needs them strictly increasing
+        pts = max(round((timestamp - self._origin) * 1000), self._last_pts + 1)
+        self._last_pts = pts
+        if self.timecode:
+            if self._stamped is None or self._stamped.shape != frame.shape:
+                self._stamped = np.empty_like(frame)
+            np.copyto(self._stamped, frame)
+            # The capture's monotonic timestamp, on the wall clock readers compare against
+            frame = timecode.stamp(self._stamped, time.time() - (time.monotonic() - timestamp))
+        video = av.VideoFrame.from_ndarray(frame, format='bgr24')
+        video.pts = pts
+        self._mux(self.stream.encode(video))
+        self.frames += 1
+        self._encode_times.append(time.perf_counter() - started)
+
+    def _mux(self, packets):
+        for packet in packets:
+            self.packets += 1
+            self.keyframes += packet.is_keyframe
+            self.bytes += packet.size
+            self.container.mux(packet)
+
+    def segments(self):
+        """Segment names currently in the playlist, oldest first."""
+        try:
+            with open(self.playlist_path) as f:
+                return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        except FileNotFoundError:
+            return []
+
+    def close(self):
+        """Flush the encoder, finish the playlist and stop serving."""
+        self._mux(self.stream.encode(None))
+        self.container.close()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        times = sorted(self._encode_times)
+        seconds = self._last_pts / 1000 if self._last_pts > 0 else 0.0
+        return {
+            'frames': self.frames,
+            'packets': self.packets,
+            'keyframes': self.keyframes,
+            'in_playlist': len(self.segments()),
+            'bitrate_kbps': round(self.bytes * 8 / seconds / 1000, 1) if seconds else None,
+            'encode_ms': round(sum(times) / len(times) * 1000, 2) if times else None,
+            'encode_ms_p95': round(times[int(len(times) * 0.95)] * 1000, 2) if times else None,
+            'encode_ms_max': round(times[-1] * 1000, 2) if times else None,
+        }
+
+
+def publish_camera(publish, source, width=None, height=None):
+    """Capture `source` with OpenCV and hand every frame to `publish(frame, timestamp)` until it ends."""
+    import cv2
+
+    cap = cv2.VideoCapture(source)
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open camera {source}")
+    try:
+        while cap.grab():
+            timestamp = time.monotonic()
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            publish(frame, timestamp)
+    finally:
+        cap.release()
+
+
+def publish_bus(publish, name):
+    """Hand the frames another process shares on the frame bus `name` to `publish`, with their capture timestamps."""
+    from frame_bus import FrameSubscriber
+
+    with FrameSubscriber(name) as bus:
+        while True:
+            frame = bus.next(timeout=1.0)
+            if frame is None:
+                raise RuntimeError(f"No frame on bus '{name}' for 1 second")
+            _, timestamp, image = frame
+            publish(image[..., :3] if image.shape[2] > 3 else image, timestamp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode a camera (or frame bus) into a rolling low-latency HLS playlist.")
+    parser.add_argument('--source', default='0', help="Camera index or stream URL")
+    parser.add_argument('--bus', default=None, help="Publish the frames of this frame_bus.py name instead of opening a camera")
+    parser.add_argument('--directory', default='hls', help="Where the playlist and segments are written")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--segment', type=float, default=1.0, help="Segment length in seconds")
+    parser.add_argument('--gop', type=int, default=None, help="Frames per GOP (default: one segment)")
+    parser.add_argument('--list-size', type=int, default=6, help="Segments kept in the playlist")
+    parser.add_argument('--preset', default='ultrafast', help="x264 preset")
+    parser.add_argument('--tune', default='zerolatency', help="x264 tune")
+    parser.add_argument('--bitrate', type=int, default=None, help="Target bitrate in bits/s (default: the encoder's)")
+    parser.add_argument('--timecode', action='store_true', help="Burn each frame's capture time into it, for glass-to-glass latency in stream.py")
+    parser.add_argument('--serve', type=int, default=None, metavar='PORT', help="Also serve the playlist over HTTP on this port")
+    args = parser.parse_args()
+
+    if args.bus:
+        from frame_bus import FrameSubscriber
+        try:
+            with FrameSubscriber(args.bus) as bus:
+                args.height, args.width = bus.shape[:2]
+        except FileNotFoundError:
+            print(f"Error: No frame bus named '{args.bus}' (start frame_bus.py first)")
+            sys.exit(1)
+
+    publisher = HlsPublisher(args.directory, args.width, args.height, args.fps, args.segment, args.gop, args.list_size,
+                             preset=args.preset, tune=args.tune, bitrate=args.bitrate, port=args.serve, timecode=args.timecode)
+    print(f"Publishing to {publisher.url or publisher.playlist_path}")
+    last_report = time.monotonic()
+
+    def publish(frame, timestamp=None):
+        nonlocal last_report
+        publisher.publish(frame, timestamp)
+        if time.monotonic() - last_report > 5.0:
+            print(publisher.stats())
+            last_report = time.monotonic()
+
+    try:
+        if args.bus:
+            publish_bus(publish, args.bus)
+        else:
+            source = int(args.source) if args.source.isdigit() else args.source
+            publish_camera(publish, source, args.width, args.height)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+        print(publisher.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import time
+from collections import deque
+
+import numpy as np
+
+# Integer BT.601 luma weights for B, G, R (sum 256)
+LUMA = (29, 150, 77)
+
+
+class ChangeDetector:
+    """Decides per frame whether anything changed, so static scenes cost almost nothing downstream.
+
+    Only every `scale`-th pixel in each direction is looked at. Its luminance
+    goes into a preallocated buffer and is compared with a reference image of
+    what was last passed on. The absolute differences are averaged over
+    blocks of `block` x `block` samples. A block counts as changed when its
+    score exceeds its own noise floor, `sensitivity` standard deviations above
+    that block's running mean score, and at least `min_delta` grey levels.
+    The floor only learns from blocks that did not change, so sensor noise
+    and flicker raise it while motion does not. Changed blocks are copied
+    into the reference. A slow drift therefore adds up until it is reported,
+    and a block that changed once stops counting as changed.
+
+    `check` returns the changed regions as (x, y, w, h) rectangles in frame
+    pixels, one per group of touching blocks, or [] when the frame can be
+    skipped. The first frame, and one frame every `refresh` seconds, comes
+    back as the whole frame. Frames too small for `scale` x `block` pixels
+    per block are sampled more densely, down to every pixel and blocks as
+    small as the frame, so any frame size has at least one block.
+    """
+
+    def __init__(self, scale=8, block=8, sensitivity=4.0, min_delta=3.0, adapt=0.05, min_blocks=1, refresh=5.0, window=100):
+        self.scale = scale
+        self.block = block
+        self.sensitivity = sensitivity
+        self.min_delta = min_delta
+        self.adapt = adapt
+        self.min_blocks = min_blocks
+        self.refresh = refresh
+        self.shape = None
+        self.frames = 0
+        self.passed = 0
+        self.refreshes = 0
+        self.regions = 0
+        self._changed_fraction = 0.0
+        self._last_pass = None
+        self._costs = deque(maxlen=window)
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        # The sampled grid must fit inside the frame: shrink the step, then the blocks, for small frames
+        self._block = max(1, min(self.block, height, width))
+        self._step = max(1, min(self.scale, height // self._block, width // self._block))
+        rows = height // (self._step * self._block)
+        cols = width // (self._step * self._block)
+        self.shape = shape
+        self.grid = (rows, cols)
+        sampled = (rows * self._block, cols * self._block)
+        self._extent = (sampled[0] * self._step, sampled[1] * self._step)
+        self._luma = np.empty(sampled, np.int32)
+        self._channel = np.empty(sampled, np.int32)
+        self._reference = np.empty(sampled, np.int32)
+        self._diff = np.empty(sampled, np.int32)
+        self._sums = np.empty(self.grid, np.int64)
+        self._scores = np.empty(self.grid, np.float32)
+        self._mean = np.zeros(self.grid, np.float32)
+        self._var = np.zeros(self.grid, np.float32)
+        self._threshold = np.empty(self.grid, np.float32)
+        self._changed = np.empty(self.grid, bool)
+        self._last_pass = None
+
+    def _sample(self, frame):
+        view = frame[:self._extent[0]:self._step, :self._extent[1]:self._step]
+        if view.ndim == 2 or view.shape[2] == 1:
+            np.copyto(self._luma, view.reshape(self._luma.shape))
+            return
+        np.multiply(view[..., 0], LUMA[0], out=self._luma, dtype=np.int32)
+        for channel, weight in ((1, LUMA[1]), (2, LUMA[2])):
+            np.multiply(view[..., channel], weight, out=self._channel, dtype=np.int32)
+            np.add(self._luma, self._channel, out=self._luma)
+        np.right_shift(self._luma, 8, out=self._luma)
+
+    def _blocks(self, array):
+        rows, cols = self.grid
+        return array.reshape(rows, self._block, cols, self._block)
+
+    def check(self, frame):
+        """Changed regions of `frame` as [(x, y, w, h)], or [] if it can be skipped."""
+        started = time.perf_counter()
+        if frame.shape != self.shape:
+            self._allocate(frame.shape)
+        self._sample(frame)
+        self.frames += 1
+        now = time.monotonic()
+        if self._last_pass is None or (self.refresh and now - self._last_pass >= self.refresh):
+            np.copyto(self._reference, self._luma)
+            self._last_pass = now
+            self.passed += 1
+            self.refreshes += 1
+            self.regions += 1
+            self._costs.append(time.perf_counter() - started)
+            return [(0, 0, frame.shape[1], frame.shape[0])]
+
+        np.subtract(self._luma, self._reference, out=self._diff)
+        np.abs(self._diff, out=self._diff)
+        np.sum(self._blocks(self._diff), axis=(1, 3), out=self._sums)
+        np.divide(self._sums, self._block * self._block, out=self._scores)
+        np.sqrt(self._var, out=self._threshold)
+        self._threshold *= self.sensitivity
+        self._threshold += self._mean
+        np.maximum(self._threshold, self.min_delta, out=self._threshold)
+        np.greater(self._scores, self._threshold, out=self._changed)
+
+        # Exponentially weighted mean and variance of the noise, in the blocks that stayed put
+        still = ~self._changed
+        delta = self._scores[still] - self._mean[still]
+        self._mean[still] += self.adapt * delta
+        self._var[still] = (1 - self.adapt) * (self._var[still] + self.adapt * delta * delta)
+
+        changed = int(np.count_nonzero(self._changed))
+        self._changed_fraction += changed / self._changed.size
+        regions = []
+        if changed >= self.min_blocks:
+            np.copyto(self._blocks(self._reference), self._blocks(self._luma), where=self._changed[:, None, :, None])
+            regions = self._regions(frame.shape)
+            self._last_pass = now
+            self.passed += 1
+            self.regions += len(regions)
+        self._costs.append(time.perf_counter() - started)
+        return regions
+
+    def _regions(self, shape):
+        """Bounding rectangles of 4-connected groups of changed blocks, in frame pixels."""
+        rows, cols = self.grid
+        size = self._step * self._block
+        pending = set(zip(*np.nonzero(self._changed)))
+        regions = []
+        while pending:
+            stack = [pending.pop()]
+            top, left = bottom, right = stack[0]
+            while stack:
+                row, col = stack.pop()
+                top, bottom = min(top, row), max(bottom, row)
+                left, right = min(left, col), max(right, col)
+                for neighbour in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                    if neighbour in pending:
+                        pending.remove(neighbour)
+                        stack.append(neighbour)
+            # Blocks on the last row/column also cover the pixels past the sampled grid
+            y, x = top * size, left * size
+            y_end = shape[0] if bottom == rows - 1 else (bottom + 1) * size
+            x_end = shape[1] if right == cols - 1 else (right + 1) * size
+            regions.append((int(x), int(y), int(x_end - x), int(y_end - y)))
+        return sorted(regions, key=lambda r: (r[1], r[0]))
+
+    def stats(self):
+        costs = self._costs
+        return {
+            'frames': self.frames,
+            'passed': self.passed,
+            'skipped': self.frames - self.passed,
+            'skip_ratio': round(1 - self.passed / self.frames, 3) if self.frames else 0.0,
+            'refreshes': self.refreshes,
+            'regions': self.regions,
+            'changed_blocks': round(self._changed_fraction / self.frames, 4) if self.frames else 0.0,
+            'noise_floor': round(float(self._mean.mean()), 2) if self.shape else None,
+            'check_ms': round(sum(costs) / len(costs) * 1000, 3) if costs else None,
+        }
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FrameGrabber(threading.Thread):
+    """Reads one camera on its own thread into a small pool of reusable buffers.
+
+    Every frame is stamped with time.monotonic() right after `grab()`, i.e. as
+    close to the exposure as OpenCV lets us get, and published as
+    (timestamp, seq, slot). Buffers pinned by a reader are never written.
+    """
+
+    def __init__(self, source, width=None, height=None, condition=None, slots=4):
+        super().__init__(daemon=True)
+        self.cap = cv2.VideoCapture(source)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        ok, first = self.cap.read() if self.cap.isOpened() else (False, None)
+        if not ok:
+            self.cap.release()
+            raise RuntimeError(f"Could not open camera {source}")
+        self.shape = first.shape
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.buffers = [np.empty_like(first) for _ in range(slots)]
+        self.frames = deque()
+        self.condition = condition or threading.Condition()
+        self.pinned = set()
+        self.seq = 0
+        self.failed = False
+        self._next_slot = 0
+        self._running = True
+
+    def _take_slot(self):
+        # Round-robin over the pool, skipping whatever a reader is copying from.
+        with self.condition:
+            while True:
+                slot = self._next_slot
+                self._next_slot = (self._next_slot + 1) % len(self.buffers)
+                if slot not in self.pinned:
+                    break
+            # The old frame in this slot is about to be overwritten.
+            self.frames = deque(f for f in self.frames if f[2] != slot)
+            return slot
+
+    def run(self):
+        while self._running:
+            slot = self._take_slot()
+            if not self.cap.grab():
+                break
+            timestamp = time.monotonic()
+            ok, _ = self.cap.retrieve(self.buffers[slot])
+            if not ok:
+                break
+            with self.condition:
+                self.seq += 1
+                self.frames.append((timestamp, self.seq, slot))
+                self.condition.notify_all()
+        with self.condition:
+            self.failed = self._running
+            self.condition.notify_all()
+
+    def stop(self):
+        self._running = False
+        self.join(timeout=1.0)
+        self.cap.release()
+
+
+class StereoCapture:
+    """Two FrameGrabbers paired by timestamp and composited side by side.
+
+    `read` returns the freshest left/right pair whose timestamps are within
+    `tolerance` seconds, copied straight into the two halves of one
+    preallocated buffer (the same array is returned every time). Frames that
+    were superseded before they could be paired count as dropped.
+    """
+
+    def __init__(self, left=0, right=1, width=1280, height=720, tolerance=None):
+        self.condition = threading.Condition()
+        self.left = FrameGrabber(left, width, height, self.condition)
+        try:
+            self.right = FrameGrabber(right, width, height, self.condition)
+        except RuntimeError:
+            self.left.cap.release()
+            raise
+        fps = self.left.fps or self.right.fps or 30.0
+        self.tolerance = tolerance if tolerance is not None else 0.5 / fps
+        (lh, lw, channels), (rh, rw, _) = self.left.shape, self.right.shape
+        self.composite = np.zeros((max(lh, rh), lw + rw, channels), dtype=np.uint8)
+        self.left_view = self.composite[:lh, :lw]
+        self.right_view = self.composite[:rh, lw:]
+        self.pairs = 0
+        self.dropped_left = 0
+        self.dropped_right = 0
+        self.skew = 0.0
+        self.max_skew = 0.0
+        self._skew_total = 0.0
+        self._last_left = 0
+        self._last_right = 0
+
+    def start(self):
+        self.left.start()
+        self.right.start()
+        return self
+
+    def stop(self):
+        self.left.stop()
+        self.right.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _match(self):
+        best = None
+        for left in self.left.frames:
+            if left[1] <= self._last_left:
+                continue
+            for right in self.right.frames:
+                if right[1] <= self._last_right or abs(left[0] - right[0]) > self.tolerance:
+                    continue
+                freshness = min(left[0], right[0])
+                if best is None or freshness > best[0]:
+                    best = (freshness, left, right)
+        return best
+
+    def read(self, timeout=1.0):
+        """Return (ok, composite, skew_seconds) for the next synchronized pair."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                match = self._match()
+                if match:
+                    break
+                if self.left.failed or self.right.failed:
+                    return False, None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.condition.wait(remaining):
+                    return False, None, None
+            _, left, right = match
+            self.dropped_left += left[1] - self._last_left - 1
+            self.dropped_right += right[1] - self._last_right - 1
+            self._last_left, self._last_right = left[1], right[1]
+            self.left.pinned.add(left[2])
+            self.right.pinned.add(right[2])
+        try:
+            np.copyto(self.left_view, self.left.buffers[left[2]])
+            np.copyto(self.right_view, self.right.buffers[right[2]])
+        finally:
+            with self.condition:
+                self.left.pinned.discard(left[2])
+                self.right.pinned.discard(right[2])
+
+        skew = right[0] - left[0]
+        self.pairs += 1
+        self.skew = skew
+        self.max_skew = max(self.max_skew, abs(skew))
+        self._skew_total += abs(skew)
+        return True, self.composite, skew
+
+    def stats(self):
+        return {
+            'pairs': self.pairs,
+            'dropped_left': self.dropped_left,
+            'dropped_right': self.dropped_right,
+            'skew_ms': round(self.skew * 1000, 2),
+            'mean_skew_ms': round(self._skew_total / self.pairs * 1000, 2) if self.pairs else None,
+            'max_skew_ms': round(self.max_skew * 1000, 2),
+        }
@@ -1,15 +1,38 @@
+import argparse
+import time
+
 import cv2
 
-cap = cv2.VideoCapture('http://localhost:8089/stream.m3u8')
+import timecode
+from motion import ChangeDetector
+from stream_reader import LatestFrameReader
+
+parser = argparse.ArgumentParser(description="Show the newest frame of a stream, redrawing only when it changes.")
+parser.add_argument('url', nargs='?', default='http://localhost:8089/stream.m3u8')
+parser.add_argument('--timecode', action='store_true', help="The stream is from `hls_publisher.py --timecode`: report glass-to-glass latency")
+args = parser.parse_args()
+
+# Decoding happens in the background; we only ever look at the newest frame,
+# and only redraw it when it differs from what is on screen
+gate = ChangeDetector()
+# Frames from `hls_publisher.py --timecode` carry their capture time, which gives glass-to-glass latency;
+# other streams are never searched for one
+capture_time = (lambda frame, pos_ms: timecode.read(frame)) if args.timecode else None
+with LatestFrameReader(args.url, capture_time=capture_time) as reader:
+    last_report = time.monotonic()
+    while True:
+        ok, frame = reader.read(timeout=5.0)
+        if not ok:
+            print("No frame for 5 seconds, still reconnecting...")
+            continue
+        if gate.check(frame):
+            cv2.imshow('Stream', frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+        if time.monotonic() - last_report > 5.0:
+            print(reader.stats(), gate.stats())
+            last_report = time.monotonic()
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Failed to grab frame")
-        break
-    cv2.imshow('Stream', frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    print(reader.stats(), gate.stats())
 
-cap.release()
 cv2.destroyAllWindows()
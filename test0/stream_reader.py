@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Ask OpenCV's FFmpeg backend not to buffer ahead; must be set before cv2 opens anything.
+os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS', 'rtsp_transport;tcp|fflags;nobuffer|flags;low_delay')
+
+import cv2
+
+
+class LatestFrameReader(threading.Thread):
+    """Decodes an HLS/RTSP/HTTP stream on a background thread and keeps only the newest frames.
+
+    The decoder runs as fast as the stream delivers, so the demuxer never
+    backs up. Up to `keep` decoded frames are held; `read` returns the newest
+    one and any older, never-read frames are counted as dropped. When the
+    stream ends or errors the reader reopens it with exponential backoff.
+
+    Latency is reported three ways:
+    - age: time from decode to `read`, i.e. what the consumer adds;
+    - lag: how far the stream clock (CAP_PROP_POS_MSEC) has fallen behind the
+      wall clock since the first frame, i.e. what buffering upstream adds;
+    - glass-to-glass: wall clock at `read` minus the frame's capture time.
+      `capture_time(frame, pos_ms)` recovers that epoch time from the frame,
+      e.g. `timecode.read` for an HlsPublisher(timecode=True) stream, or
+      returns None. Without it, or for frames it cannot read, glass-to-glass
+      stays None: the stream clock alone only says how far apart frames were
+      captured, not when.
+    """
+
+    def __init__(self, url, keep=1, reconnect_delay=0.5, max_reconnect_delay=8.0, capture_time=None, window=100):
+        super().__init__(daemon=True)
+        self.url = url
+        self.keep = keep
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.capture_time = capture_time
+        self.frames = deque()
+        self.condition = threading.Condition()
+        self.decoded = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self._ages = deque(maxlen=window)
+        self._lags = deque(maxlen=window)
+        self._glass = deque(maxlen=window)
+        self._clock_origin = None
+        self._running = True
+
+    def run(self):
+        delay = self.reconnect_delay
+        while self._running:
+            cap = cv2.VideoCapture(self.url)
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            if not cap.isOpened():
+                cap.release()
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+            delay = self.reconnect_delay
+            self._clock_origin = None
+            while self._running:
+                ok, frame = cap.read()
+                now = time.monotonic()
+                if not ok:
+                    break
+                pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                self._track_lag(now, pos_ms)
+                captured = self.capture_time(frame, pos_ms) if self.capture_time else None
+                with self.condition:
+                    if len(self.frames) >= self.keep:
+                        self.frames.popleft()
+                        self.dropped += 1
+                    self.frames.append((frame, now, captured))
+                    self.decoded += 1
+                    self.condition.notify_all()
+            cap.release()
+            if self._running:
+                self.reconnects += 1
+                time.sleep(delay)
+
+    def _track_lag(self, now, pos_ms):
+        if pos_ms <= 0:
+            return
+        if self._clock_origin is None:
+            self._clock_origin = (now, pos_ms)
+            return
+        wall = now - self._clock_origin[0]
+        stream = (pos_ms - self._clock_origin[1]) / 1000.0
+        self._lags.append(wall - stream)
+
+    def read(self, timeout=1.0):
+        """Return (ok, frame) for the newest frame not yet read, waiting up to `timeout`."""
+        with self.condition:
+            if not self.frames and not self.condition.wait_for(lambda: self.frames or not self._running, timeout):
+                return False, None
+            if not self.frames:
+                return False, None
+            frame, decoded_at, captured = self.frames.pop()
+            self.dropped += len(self.frames)  # Stale frames we skip over
+            self.frames.clear()
+            self.delivered += 1
+        self._ages.append(time.monotonic() - decoded_at)
+        if captured is not None:
+            self._glass.append(time.time() - captured)
+        return True, frame
+
+    def stop(self):
+        self._running = False
+        with self.condition:
+            self.condition.notify_all()
+        self.join(timeout=2.0)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        def mean_ms(values):
+            return round(sum(values) / len(values) * 1000, 1) if values else None
+        return {
+            'decoded': self.decoded,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'drop_rate': round(self.dropped / self.decoded, 3) if self.decoded else 0.0,
+            'reconnects': self.reconnects,
+            'age_ms': mean_ms(self._ages),
+            'lag_ms': mean_ms(self._lags),
+            'glass_to_glass_ms': mean_ms(self._glass),
+        }
@@ -1,20 +1,31 @@
 import threading
 
+from AudioEncoder import AudioEncoder, DEFAULT_FORMAT
+
 class Application:
-    def __init__(self, recorder, transcriber):
+    def __init__(self, recorder, transcriber, encoder=None):
         self.recorder = recorder
         self.transcriber = transcriber
+        # Segments are resampled to 16 kHz and encoded in memory; pass an encoder with archive_dir set to keep copies on disk.
+        self.encoder = encoder or AudioEncoder(recorder.sample_rate, format=DEFAULT_FORMAT, prefix='recording', target_rate=16000)
 
     def start(self):
         recording_thread = threading.Thread(target=self.recorder.record)
         recording_thread.start()
-        recording_thread.join()
 
-        audio_filename = self.recorder.save_recording()
-        if audio_filename:
-            print("Transcribing audio...")
-            with open(audio_filename, 'rb') as audio_file:
-                transcription = self.transcriber.transcribe(audio_file)
+        # Each segment is transcribed as soon as it is finished, while recording goes on.
+        transcribed = 0
+        while True:
+            audio_data = self.recorder.recordings.get()
+            if audio_data is None:
+                break
+            if audio_data.size > 0:
+                encoded = self.encoder.encode(audio_data)
+                print("Transcribing audio...")
+                transcription = self.transcriber.transcribe(encoded.data, encoded.filename, encoded.content_type, encoded.pcm_digest)
                 print(transcription)
-        else:
+                transcribed += 1
+        recording_thread.join()
+
+        if not transcribed:
             print("No audio data to transcribe.")
@@ -0,0 +1,113 @@
+import datetime
+import hashlib
+import io
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from Resampler import resample
+from Tracer import tracer
+
+try:
+    import soundfile
+except ImportError:  # FLAC and Opus output need libsndfile; WAV works without it
+    soundfile = None
+
+# Lossless but compressed when possible, plain WAV otherwise.
+DEFAULT_FORMAT = 'flac' if soundfile is not None else 'wav'
+
+EncodedAudio = namedtuple('EncodedAudio', ['filename', 'data', 'content_type', 'pcm_digest'], defaults=(None,))
+
+
+def pcm_digest(samples, sample_rate, channels=1):
+    """SHA-256 of int16 samples and their format: the same audio gets the same digest in any container."""
+    digest = hashlib.sha256(memoryview(np.ascontiguousarray(samples, dtype='<i2')).cast('B'))
+    digest.update(f"{sample_rate}/{channels}".encode())
+    return digest.digest()
+
+
+def encode_wav(samples, sample_rate, channels=1):
+    """Build a 16-bit PCM WAV file in memory with a single copy of the samples."""
+    pcm = np.ascontiguousarray(samples, dtype='<i2')
+    size = pcm.nbytes
+    buffer = bytearray(44 + size)
+    struct.pack_into('<4sI4s4sIHHIIHH4sI', buffer, 0,
+                     b'RIFF', 36 + size, b'WAVE',
+                     b'fmt ', 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+                     b'data', size)
+    buffer[44:] = memoryview(pcm).cast('B')
+    return bytes(buffer)
+
+
+def encode_flac(samples, sample_rate, channels=1):
+    """Build a FLAC file in memory (requires the soundfile package)."""
+    if soundfile is None:
+        raise RuntimeError("FLAC encoding needs the soundfile package (pip install soundfile)")
+    pcm = np.asarray(samples, dtype=np.int16).reshape(-1, channels)
+    output = io.BytesIO()
+    soundfile.write(output, pcm, sample_rate, format='FLAC', subtype='PCM_16')
+    return output.getvalue()
+
+
+def encode_opus(samples, sample_rate, channels=1):
+    """Build an Ogg/Opus file in memory (requires soundfile with libsndfile >= 1.0.29)."""
+    if soundfile is None:
+        raise RuntimeError("Opus encoding needs the soundfile package (pip install soundfile)")
+    pcm = np.asarray(samples, dtype=np.int16).reshape(-1, channels)
+    output = io.BytesIO()
+    soundfile.write(output, pcm, sample_rate, format='OGG', subtype='OPUS')
+    return output.getvalue()
+
+
+class AudioEncoder:
+    """Turns int16 segments into upload-ready containers without touching the disk.
+
+    With `target_rate` set, segments are first resampled to that rate (the
+    speech model works at 16 kHz, so anything above it is wasted upload).
+    A segment handed over at a rate of its own (e.g. one a SegmentQueue
+    downsampled under pressure) is labelled with that rate, and is never
+    resampled up to `target_rate`. When
+    `archive_dir` is set every encoded segment is also written there, under a
+    microsecond timestamp so segments from the same second never collide.
+    Every EncodedAudio carries the `pcm_digest` of what was encoded, for
+    cache keys that do not depend on the container.
+    """
+
+    FORMATS = {
+        'wav': ('audio/wav', encode_wav),
+        'flac': ('audio/flac', encode_flac),
+        'ogg': ('audio/ogg', encode_opus),
+    }
+
+    def __init__(self, sample_rate, format='wav', channels=1, archive_dir=None, prefix='output', target_rate=None):
+        if format not in self.FORMATS:
+            raise ValueError(f"unsupported format {format!r}, expected one of {sorted(self.FORMATS)}")
+        self.sample_rate = sample_rate
+        self.format = format
+        self.channels = channels
+        self.archive_dir = archive_dir
+        self.prefix = prefix
+        self.target_rate = target_rate or sample_rate
+
+    def encode(self, samples, sample_rate=None):
+        """Return an EncodedAudio for `samples` (at `sample_rate`, by default the encoder's), archiving it if enabled."""
+        content_type, encode = self.FORMATS[self.format]
+        filename = f"{self.prefix}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.{self.format}"
+        rate = sample_rate or self.sample_rate
+        target_rate = self.target_rate if sample_rate is None else min(self.target_rate, sample_rate)
+        if target_rate != rate:
+            with tracer.span('resample'):
+                samples = resample(samples, rate, target_rate)
+        with tracer.span('encode', format=self.format):
+            data = encode(samples, target_rate, self.channels)
+        # Hashed now: `samples` may be a view of a ring that is overwritten before the upload
+        digest = pcm_digest(samples, target_rate, self.channels)
+        if self.archive_dir:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = os.path.join(self.archive_dir, filename)
+            with tracer.span('archive'), open(path, 'wb') as f:
+                f.write(data)
+            print(f"File saved: {path}")
+        return EncodedAudio(filename, data, content_type, digest)
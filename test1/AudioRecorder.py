@@ -1,53 +1,92 @@
 import numpy as np
 import sounddevice as sd
 import datetime
-import wave
+import sys
+import threading
+import os
+import queue
+
+from AudioEncoder import AudioEncoder
+from PcmArchive import ArchiveWriter
+from RingBuffer import RingBuffer
+from VoiceActivityDetector import VoiceActivityDetector
 
 class AudioRecorder:
-    def __init__(self, sample_rate=44100, volume_threshold=1.0, silence_threshold=1.5, max_duration=20):
+    def __init__(self, sample_rate=44100, threshold_db=9.0, silence_threshold=1.5, max_duration=20, preroll=0.3, vad=None, archive=None):
         self.sample_rate = sample_rate
-        self.volume_threshold = volume_threshold
         self.silence_threshold = silence_threshold
         self.max_duration = max_duration
-        self.audio_data = np.array([], dtype='int16')
+        self.max_samples = int((max_duration + preroll) * sample_rate)
+        # Twice the longest segment, so a finished segment survives while the stream winds down.
+        self.buffer = RingBuffer(2 * self.max_samples)
+        # The detector sees exactly the blocks the buffer sees, so its sample positions index the buffer.
+        self.vad = vad or VoiceActivityDetector(sample_rate, threshold_db=threshold_db, hangover=silence_threshold, preroll=preroll)
+        # An optional PcmArchive that keeps everything heard, with each recording logged in its index.
+        # It is written from a thread of its own, so the callback only copies blocks for it.
+        self.archive = ArchiveWriter(archive) if archive is not None else None
+        self.archive_offset = archive.head - self.buffer.head if archive is not None else 0
+        self.segment_start = None
+        self.segment_stop = None
+        # Every finished segment, copied out of the buffer; `record` ends the queue with None.
+        self.recordings = queue.Queue()
         self.recording = False
+        self.last_clip_time = datetime.datetime.now()
+        self.done = threading.Event()
+
+    @property
+    def audio_data(self):
+        if self.segment_start is None:
+            return np.array([], dtype='int16')
+        return self.buffer.samples(self.segment_start, self.segment_stop)
 
     def audio_callback(self, indata, frames, time, status):
         if status:
             print(f"Status: {status}", file=sys.stderr)
-        current_volume = np.linalg.norm(indata) * 10
-        if current_volume > self.volume_threshold:
-            if not self.recording:
-                self.recording = True
-                print(f"Recording started at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            self.audio_data = np.append(self.audio_data, indata.copy().flatten())
-        elif self.recording and (datetime.datetime.now() - self.last_clip_time).total_seconds() > self.silence_threshold:
+        self.buffer.write(indata)
+        if self.archive is not None:
+            self.archive.write(indata)
+        finished = self.vad.process(indata)
+        if self.vad.active:
+            self.last_clip_time = datetime.datetime.now()
+        if not self.recording and self.vad.segment_start is not None:
+            self.recording = True
+            self.segment_start = max(self.vad.segment_start, self.segment_stop or 0, self.buffer.tail)
+            self.segment_stop = None
+            print(f"Recording started at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        if self.recording and finished:
             print(f"Silence detected at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}; stopping recording.")
+            self.stop_recording(finished[-1][1])
+        elif self.recording and self.buffer.head - self.segment_start >= self.max_samples:
+            print(f"Maximum duration reached at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}; stopping recording.")
             self.stop_recording()
+        if not self.recording and (datetime.datetime.now() - self.last_clip_time).total_seconds() >= self.silence_threshold:
+            self.done.set()
 
     def record(self):
+        self.last_clip_time = datetime.datetime.now()
+        self.done.clear()
         with sd.InputStream(callback=self.audio_callback, channels=1, samplerate=self.sample_rate, dtype='int16'):
             print("Listening...")
-            self.last_clip_time = datetime.datetime.now()
-            while self.recording or (datetime.datetime.now() - self.last_clip_time).total_seconds() < self.silence_threshold:
-                sd.sleep(100)
+            # The callback sets this once nothing is being recorded and the line has been quiet long enough.
+            self.done.wait()
+        if self.archive is not None:
+            self.archive.flush()
+        self.recordings.put(None)
 
-    def stop_recording(self):
+    def stop_recording(self, stop=None):
         self.recording = False
+        self.segment_stop = self.buffer.head if stop is None else stop
+        if self.archive is not None:
+            self.archive.mark(self.segment_start + self.archive_offset, self.segment_stop + self.archive_offset)
+        # A split at max_duration starts the next segment right away, so the consumer gets a copy.
+        self.recordings.put(self.audio_data.copy())
         print(f"Recording stopped at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        self.save_recording()
 
-    def save_recording(self):
-        if self.audio_data.size > 0:
-            filename = f"recording_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-            wavfile = wave.open(filename, 'wb')
-            wavfile.setnchannels(1)
-            wavfile.setsampwidth(2)  # 16 bits per sample
-            wavfile.setframerate(self.sample_rate)
-            wavfile.writeframes(self.audio_data.tobytes())
-            wavfile.close()
-            print(f"Recording saved as {filename}")
-            return filename
+    def save_recording(self, directory='.'):
+        audio_data = self.audio_data
+        if audio_data.size > 0:
+            encoded = AudioEncoder(self.sample_rate, archive_dir=directory, prefix='recording').encode(audio_data)
+            return os.path.join(directory, encoded.filename)
         else:
             print("No audio data to save.")
             return None
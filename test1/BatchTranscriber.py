@@ -0,0 +1,234 @@
+import argparse
+import datetime
+import json
+import mmap
+import os
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from AudioEncoder import AudioEncoder, DEFAULT_FORMAT
+from Tracer import tracer
+from VoiceActivityDetector import VoiceActivityDetector
+
+AUDIO_EXTENSIONS = ('.wav', '.raw', '.pcm')
+
+
+def open_audio(path, raw_rate=16000, raw_channels=1):
+    """Memory-map a 16-bit WAV or headerless int16 file as a (frames, channels) array.
+
+    Nothing is read up front: pages are faulted in as the array is sliced, so
+    a file of any length costs no more memory than the part being worked on.
+    Returns (samples, sample_rate).
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros((0, raw_channels), dtype='<i2'), raw_rate
+    if not path.lower().endswith('.wav'):
+        frames = os.path.getsize(path) // (2 * raw_channels)
+        return np.memmap(path, dtype='<i2', mode='r', shape=(frames, raw_channels)), raw_rate
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as header:
+        riff, _, wave = struct.unpack_from('<4sI4s', header)
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError(f"{path} is not a WAV file")
+        offset, fmt = 12, None
+        while offset + 8 <= len(header):
+            chunk, size = struct.unpack_from('<4sI', header, offset)
+            if chunk == b'fmt ':
+                fmt = struct.unpack_from('<HHIIHH', header, offset + 8)
+            elif chunk == b'data':
+                if fmt is None:
+                    break
+                audio_format, channels, sample_rate, _, _, bits = fmt
+                if audio_format not in (1, 0xFFFE) or bits != 16:
+                    raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+                frames = min(size, len(header) - offset - 8) // (2 * channels)
+                return np.memmap(path, dtype='<i2', mode='r', offset=offset + 8, shape=(frames, channels)), sample_rate
+            offset += 8 + size + (size & 1)
+    raise ValueError(f"{path}: no fmt/data chunk")
+
+
+def audio_files(paths):
+    """The WAV/raw files among `paths`, with directories expanded recursively, in name order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in names if name.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def mono(block):
+    """int16 mono samples of a (frames, channels) block."""
+    if block.shape[1] == 1:
+        return block[:, 0]
+    return block.mean(axis=1).astype(np.int16)
+
+
+def plan_chunks(samples, vad, max_samples, block_samples):
+    """Run `samples` through the detector and group its utterances into chunks of at most `max_samples`.
+
+    Chunks always end in a silence the detector found, except when a single
+    utterance is longer than `max_samples`, which is split. Silence between
+    chunks is never uploaded.
+    """
+    vad.reset()
+    utterances = []
+    for start in range(0, len(samples), block_samples):
+        utterances.extend(vad.process(mono(samples[start:start + block_samples])))
+    utterances.extend(vad.flush())
+
+    chunks = []
+    for start, stop in utterances:
+        stop = min(stop, len(samples))
+        if chunks and stop - chunks[-1][0] <= max_samples:
+            chunks[-1][1] = stop
+            continue
+        while stop - start > max_samples:
+            chunks.append([start, start + max_samples])
+            start += max_samples
+        if stop > start:
+            chunks.append([start, stop])
+    return [tuple(chunk) for chunk in chunks]
+
+
+class BatchTranscriber:
+    """Transcribes recorded files faster than real time.
+
+    Every file is memory-mapped, run through the detector once and cut at
+    silences into chunks of at most `max_seconds`. The chunks are encoded
+    lazily and submitted to the shared client, with at most `window` of them
+    encoded and outstanding at once, so memory stays bounded whatever the
+    size of the archive. Results come back in order, with each chunk's offset
+    in its file and its absolute (epoch) time. A file is taken to have been
+    written as it was recorded, so it started `duration` before its mtime.
+    A chunk whose upload failed comes back with an 'error' message and no
+    text, and the chunks after it still follow.
+    """
+
+    def __init__(self, client, max_seconds=60.0, threshold_db=9.0, silence_threshold=0.8, format=DEFAULT_FORMAT,
+                 upload_rate=16000, raw_rate=16000, window=16, block_seconds=30.0, **transcribe_options):
+        self.client = client
+        self.max_seconds = max_seconds
+        self.threshold_db = threshold_db
+        self.silence_threshold = silence_threshold
+        self.format = format
+        self.upload_rate = upload_rate
+        self.raw_rate = raw_rate
+        self.window = window
+        self.block_seconds = block_seconds
+        self.options = transcribe_options
+        self.files = 0
+        self.chunks = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+        self.speech_seconds = 0.0
+        self.elapsed = 0.0
+
+    def _chunks(self, paths):
+        for path in audio_files(paths):
+            samples, fs = open_audio(path, self.raw_rate)
+            duration = len(samples) / fs
+            epoch = os.path.getmtime(path) - duration
+            vad = VoiceActivityDetector(fs, threshold_db=self.threshold_db, hangover=self.silence_threshold)
+            with tracer.span('vad', file=os.path.basename(path)):
+                chunks = plan_chunks(samples, vad, int(self.max_seconds * fs), int(self.block_seconds * fs))
+            self.files += 1
+            self.audio_seconds += duration
+            encoder = AudioEncoder(fs, format=self.format, target_rate=self.upload_rate)
+            for index, (start, stop) in enumerate(chunks):
+                self.speech_seconds += (stop - start) / fs
+                yield path, index, start / fs, stop / fs, epoch, encoder, samples[start:stop]
+
+    def transcribe(self, paths):
+        """Yield one dict per chunk, in file and time order, as soon as it and every chunk before it are done."""
+        began = time.monotonic()
+        pending = deque()
+        chunks = self._chunks(paths)
+        try:
+            while True:
+                for path, index, start, end, epoch, encoder, block in chunks:
+                    encoded = encoder.encode(mono(block))
+                    future = self.client.submit(encoded.data, filename=encoded.filename, content_type=encoded.content_type,
+                                                pcm_digest=encoded.pcm_digest, **self.options)
+                    pending.append((path, index, start, end, epoch, future))
+                    self.chunks += 1
+                    if len(pending) >= self.window:
+                        break
+                if not pending:
+                    return
+                path, index, start, end, epoch, future = pending.popleft()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'error': {'message': str(e) or type(e).__name__}}
+                chunk = {
+                    'file': path,
+                    'chunk': index,
+                    'start': round(start, 3),
+                    'end': round(end, 3),
+                    'epoch_start': epoch + start,
+                    'epoch_end': epoch + end,
+                    'text': result.get('text', '').strip(),
+                    'words': [dict(w, start=w['start'] + start, end=w['end'] + start) for w in result.get('words', [])],
+                }
+                error = result.get('error')
+                if error is not None:
+                    chunk['error'] = error.get('message', str(error)) if isinstance(error, dict) else str(error)
+                    self.failed += 1
+                yield chunk
+        finally:
+            for *_, future in pending:
+                future.cancel()
+            self.elapsed += time.monotonic() - began
+
+    def stats(self):
+        """Throughput so far; a real-time factor below 1 is faster than real time."""
+        return {
+            'files': self.files,
+            'chunks': self.chunks,
+            'failed': self.failed,
+            'audio_seconds': round(self.audio_seconds, 1),
+            'speech_seconds': round(self.speech_seconds, 1),
+            'elapsed_seconds': round(self.elapsed, 2),
+            'real_time_factor': round(self.elapsed / self.audio_seconds, 4) if self.audio_seconds else None,
+            'speedup': round(self.audio_seconds / self.elapsed, 1) if self.elapsed else None,
+        }
+
+
+def format_chunk(chunk):
+    stamp = datetime.datetime.fromtimestamp(chunk['epoch_start']).strftime('%Y-%m-%d %H:%M:%S')
+    text = f"(failed: {chunk['error']})" if 'error' in chunk else chunk['text']
+    return f"[{os.path.basename(chunk['file'])} {chunk['start']:8.1f}s | {stamp}] {text}"
+
+
+def join_chunks(chunks):
+    """The text of transcribed chunks as one transcript, leaving out the ones that failed."""
+    return ' '.join(chunk['text'] for chunk in chunks if 'error' not in chunk and chunk['text'])
+
+
+if __name__ == '__main__':
+    from TranscriptionClient import shared_client
+
+    parser = argparse.ArgumentParser(description="Transcribe directories of WAV/raw recordings in parallel")
+    parser.add_argument('paths', nargs='+', help="Files or directories")
+    parser.add_argument('-t', '--token', type=str, default=os.getenv('OPENAI_API_KEY'), help="OpenAI API token")
+    parser.add_argument('-u', '--url', type=str, default=None, help="Base URL of the transcription API")
+    parser.add_argument('-j', '--jobs', type=int, default=8, help="Concurrent uploads")
+    parser.add_argument('-x', '--max-chunk', type=float, default=60.0, help="Longest chunk uploaded, in seconds")
+    parser.add_argument('-r', '--raw-rate', type=int, default=16000, help="Sample rate of headerless files")
+    parser.add_argument('-l', '--language', type=str, default='en', help="Language for transcription")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Write the stitched chunks to this JSON-lines file")
+    args = parser.parse_args()
+
+    options = {'base_url': args.url} if args.url else {}
+    client = shared_client(args.token, max_in_flight=args.jobs, **options)
+    batch = BatchTranscriber(client, max_seconds=args.max_chunk, raw_rate=args.raw_rate, window=2 * args.jobs, language=args.language)
+    with open(args.output, 'w') if args.output else open(os.devnull, 'w') as output:
+        for chunk in batch.transcribe(args.paths):
+            print(format_chunk(chunk))
+            output.write(json.dumps(chunk) + '\n')
+    print(json.dumps(batch.stats(), indent=4))
@@ -0,0 +1,154 @@
+import string
+import threading
+import time
+
+from Tracer import tracer
+from VoiceActivityDetector import VoiceActivityDetector
+
+
+def _normalize(word):
+    return word.strip().lower().strip(string.punctuation)
+
+
+def _middle(word):
+    return (word['start'] + word['end']) / 2
+
+
+class ChunkedTranscriber:
+    """Streams fixed-length, overlapping chunks of a RingBuffer to the API while capture goes on.
+
+    Every `chunk_seconds` of new audio is encoded together with the last
+    `overlap` seconds of the previous chunk and submitted with word
+    timestamps; the upload runs on the client's threads, so the next chunk is
+    being captured while this one is in flight. Results are released strictly
+    in chunk order. Words are de-duplicated at each boundary by time: the
+    middle of the overlap belongs to the later chunk, so words of the earlier
+    chunk whose midpoint falls after it are held back as provisional until
+    the later chunk arrives and replaces them, and a word repeated across the
+    cut is dropped. Chunks in which the detector heard nothing are not
+    uploaded.
+
+    `on_words(words, provisional)` is called in order with the newly
+    committed words and the current provisional tail, as {word, start, end}
+    dicts in epoch seconds.
+    """
+
+    def __init__(self, ring, fs, client, encoder, on_words, chunk_seconds=5.0, overlap=1.0, threshold_db=9.0,
+                 prompt_words=40, **transcribe_options):
+        self.ring = ring
+        self.fs = fs
+        self.client = client
+        self.encoder = encoder
+        self.on_words = on_words
+        self.chunk_samples = int(chunk_seconds * fs)
+        self.overlap_samples = min(int(overlap * fs), self.chunk_samples // 2)
+        self.prompt_words = prompt_words
+        self.options = transcribe_options
+        self.vad = VoiceActivityDetector(fs, threshold_db=threshold_db, hangover=overlap)
+        self._origin = ring.head
+        self._origin_time = None
+        self._start = ring.head  # First sample of the next chunk that no chunk has covered yet
+        self._fed = ring.head
+        self._heard = False  # Speech since self._start
+        self._submitted = 0
+        self._released = 0
+        self._results = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.committed = []
+        self.tail = []
+        self.uploaded = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.latencies = []  # Seconds from the end of a chunk's audio to its release
+
+    def time_of(self, position):
+        """Epoch time of a ring position."""
+        return self._origin_time + (position - self._origin) / self.fs
+
+    def feed(self, head):
+        """Take the samples up to ring position `head` and submit every chunk they complete."""
+        if self._origin_time is None:
+            self._origin_time = time.time() - (head - self._origin) / self.fs
+        with tracer.span('vad'):
+            self.vad.process(self.ring.samples(max(self._fed, self.ring.tail), head))
+        self._fed = head
+        self._heard = self._heard or self.vad.active or self.vad.segment_start is not None
+        while head - self._start >= self.chunk_samples:
+            self._submit(self._start, self._start + self.chunk_samples)
+            self._heard = self.vad.active
+
+    def flush(self):
+        """Submit what is left after the last full chunk, wait for every result and commit the tail."""
+        if self._origin_time is not None and self._fed > self._start:
+            self._submit(self._start, self._fed)
+        with self._idle:
+            self._idle.wait_for(lambda: self._released == self._submitted)
+            if self.tail:
+                tail, self.tail = self.tail, []
+                self.committed.extend(tail)
+                self.on_words(tail, [])
+
+    def _submit(self, start, stop):
+        index = self._submitted
+        self._submitted += 1
+        low = max(start - self.overlap_samples, self.ring.tail, self._origin)
+        self._start = stop
+        if not self._heard:
+            self.skipped += 1
+            self._complete(index, low, start, stop, None)
+            return
+        encoded = self.encoder.encode(self.ring.samples(low, stop))
+        with self._lock:
+            prompt = ''.join(word['word'] for word in self.committed[-self.prompt_words:]).strip()
+        future = self.client.submit(encoded.data, filename=encoded.filename, content_type=encoded.content_type,
+                                    prompt=prompt or None, word_timestamps=True, pcm_digest=encoded.pcm_digest, **self.options)
+        self.uploaded += 1
+        future.add_done_callback(lambda f: self._complete(index, low, start, stop, f))
+
+    def _complete(self, index, low, start, stop, future):
+        words = None
+        if future is not None:
+            try:
+                result = future.result()
+                offset = self.time_of(low)
+                words = [{'word': w['word'], 'start': offset + w['start'], 'end': offset + w['end']} for w in result.get('words', [])]
+            except Exception as e:
+                print(f"\nTranscription failed: {e}")
+        with self._idle:
+            self._results[index] = (start, stop, words)
+            while self._released in self._results:
+                self._release(*self._results.pop(self._released))
+                self._released += 1
+            self._idle.notify_all()
+
+    def _release(self, start, stop, words):
+        if words is None:
+            # Nothing will replace the provisional words: keep them as they are.
+            committed, self.tail = self.tail, []
+        else:
+            boundary = self.time_of(start - self.overlap_samples / 2)
+            committed = [word for word in self.tail if _middle(word) < boundary]
+            words = [word for word in words if _middle(word) >= boundary]
+            last = committed[-1] if committed else (self.committed[-1] if self.committed else None)
+            if words and last and _normalize(words[0]['word']) == _normalize(last['word']) and words[0]['start'] < last['end']:
+                words = words[1:]  # The same word, heard on both sides of the cut
+                self.duplicates += 1
+            horizon = self.time_of(stop - self.overlap_samples / 2)
+            committed += [word for word in words if _middle(word) < horizon]
+            self.tail = [word for word in words if _middle(word) >= horizon]
+        self.committed.extend(committed)
+        self.latencies.append(time.time() - self.time_of(stop))
+        self.on_words(committed, self.tail)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            'chunks': self._submitted,
+            'uploaded': self.uploaded,
+            'skipped': self.skipped,
+            'duplicates': self.duplicates,
+            'words': len(self.committed),
+            'latency_p50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+            'latency_max': round(latencies[-1], 3) if latencies else None,
+        }
@@ -0,0 +1,190 @@
+import sys
+import threading
+import time
+from collections import deque
+
+from RingBuffer import RingBuffer
+from Segmenter import Segmenter
+from VoiceActivityDetector import VoiceActivityDetector
+
+
+class AudioStream:
+    """One input device: its ring buffer, detector and the segments waiting to be uploaded.
+
+    The capture callback only writes the ring and publishes the new head
+    position. Positions are cumulative, so however far the scheduler falls
+    behind nothing is lost until the ring wraps. Pending segments are kept as
+    ring positions too; one the ring has overwritten by the time it is
+    dispatched is dropped and counted as stale.
+    """
+
+    def __init__(self, name, fs, threshold_db=9.0, silence_threshold=1.5, max_duration=45.0, preroll=0.3,
+                 buffer_seconds=120, max_pending=4, device=None):
+        self.name = name
+        self.device = device
+        self.fs = fs
+        self.ring = RingBuffer(int(buffer_seconds * fs))
+        vad = VoiceActivityDetector(fs, threshold_db=threshold_db, hangover=silence_threshold, preroll=preroll)
+        self.segmenter = Segmenter(self.ring, vad, min(int(max_duration * fs), self.ring.capacity // 2))
+        self.max_pending = max_pending
+        self.head = self.ring.head  # Written by the capture callback
+        self.fed = self.ring.head   # How far the segmenter has got
+        self.pending = deque()  # (start, stop, epoch time it was cut)
+        self.in_flight = 0
+        self.segments = 0
+        self.uploaded = 0
+        self.stalls = 0
+        self.dropped = 0
+        self.stale = 0
+        self.stalled = False
+
+    def stats(self):
+        return {
+            'segments': self.segments,
+            'uploaded': self.uploaded,
+            'pending': len(self.pending),
+            'in_flight': self.in_flight,
+            'behind_seconds': round((self.head - self.fed) / self.fs, 3),
+            'stalls': self.stalls,
+            'dropped': self.dropped,
+            'stale': self.stale,
+        }
+
+
+class MultiStreamTranscriber:
+    """Runs N AudioStreams through one detector thread and one shared upload client.
+
+    Whatever the number of devices there is a single scheduler thread: it runs
+    every stream's detector and segmenter, encodes finished segments and hands
+    them to the client, plus the client's own upload workers. Uploads are
+    dispatched round-robin over the streams that have segments waiting, so a
+    talkative room cannot starve a quiet one, and at most `max_in_flight`
+    are outstanding in total.
+
+    Backpressure is per stream: while a stream has `max_pending` segments
+    queued its audio is left in its ring (a stall) instead of being cut. Once
+    the backlog would outgrow half the ring, its oldest queued segment is
+    dropped to make room. `on_result(stream, result, start, end)` runs on an
+    upload thread as each transcription arrives, with the approximate epoch
+    span of its audio.
+    """
+
+    def __init__(self, streams, client, encoder, on_result, max_in_flight=4, **transcribe_options):
+        self.streams = list(streams)
+        self.client = client
+        self.encoder = encoder
+        self.on_result = on_result
+        self.max_in_flight = max_in_flight
+        self.options = transcribe_options
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._next = 0  # Stream served first in the next dispatch round
+        self._thread = threading.Thread(target=self._run, name='multistream', daemon=True)
+
+    def callback(self, stream):
+        """A sounddevice-style callback that captures into `stream`."""
+        def callback(indata, frames, time, status):
+            if status:
+                print(f"[{stream.name}] {status}", file=sys.stderr)
+            stream.head = stream.ring.write(indata)
+            self._wake.set()
+        return callback
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Close open segments, then wait until everything queued has been transcribed."""
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+
+    def _detect(self, stream):
+        head = stream.head
+        if head == stream.fed:
+            return False
+        if len(stream.pending) >= stream.max_pending:
+            if not stream.stalled:
+                stream.stalls += 1
+                stream.stalled = True
+            if head - stream.fed < stream.ring.capacity // 2:
+                return False  # Leave the audio in the ring until the queue drains
+            stream.pending.popleft()
+            stream.dropped += 1
+        stream.stalled = False
+        self._queue(stream, stream.segmenter.cut_ranges(stream.segmenter.detect(head)))
+        stream.fed = head
+        return True
+
+    def _queue(self, stream, segments):
+        now = time.time()
+        stream.segments += len(segments)
+        stream.pending.extend((start, stop, now) for start, stop in segments)
+
+    def _dispatch(self):
+        """Start uploads round-robin over the streams with pending segments."""
+        started = False
+        while True:
+            with self._lock:
+                if self.in_flight >= self.max_in_flight:
+                    return started
+            for offset in range(len(self.streams)):
+                stream = self.streams[(self._next + offset) % len(self.streams)]
+                if stream.pending:
+                    self._next = (self._next + offset + 1) % len(self.streams)
+                    break
+            else:
+                return started
+            start, stop, cut = stream.pending.popleft()
+            if start < stream.ring.tail:
+                stream.stale += 1  # Overwritten while it waited
+                continue
+            if stop <= start:
+                continue
+            encoded = self.encoder.encode(stream.ring.samples(start, stop))
+            with self._lock:
+                self.in_flight += 1
+                stream.in_flight += 1
+            future = self.client.submit(encoded.data, filename=f"{stream.name}_{encoded.filename}",
+                                        content_type=encoded.content_type, pcm_digest=encoded.pcm_digest, **self.options)
+            span = (cut - (stop - start) / stream.fs, cut)
+            future.add_done_callback(lambda f, stream=stream, span=span: self._done(stream, f, span))
+            started = True
+
+    def _done(self, stream, future, span):
+        with self._lock:
+            self.in_flight -= 1
+            stream.in_flight -= 1
+            stream.uploaded += 1
+        self._wake.set()
+        try:
+            self.on_result(stream, future.result(), *span)
+        except Exception as e:
+            print(f"\n[{stream.name}] Transcription failed: {e}")
+
+    def _run(self):
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            # Keep going until a full pass finds nothing to do.
+            while any([self._detect(stream) for stream in self.streams]) | self._dispatch():
+                pass
+        for stream in self.streams:
+            # No more backpressure: cut whatever is left, however much is queued.
+            segmenter = stream.segmenter
+            self._queue(stream, segmenter.cut_ranges(segmenter.detect(stream.head)) + segmenter.flush_ranges())
+            stream.fed = stream.head
+        while True:
+            self._dispatch()
+            with self._lock:
+                if not self.in_flight and not any(stream.pending for stream in self.streams):
+                    return
+            self._wake.wait()
+            self._wake.clear()
+
+    def stats(self):
+        return {'in_flight': self.in_flight, 'streams': {stream.name: stream.stats() for stream in self.streams}}
@@ -0,0 +1,323 @@
+import argparse
+import bisect
+import datetime
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+
+import numpy as np
+
+# magic, sample rate, samples per file, number of files, head (total samples ever written)
+STATE = struct.Struct('<4sIIIQ')
+HEAD = struct.Struct('<Q')
+HEAD_OFFSET = STATE.size - HEAD.size
+MAGIC = b'PCMA'
+# Time anchor: epoch seconds of the sample at an absolute position.
+ANCHOR = struct.Struct('<dQ')
+# Utterance: absolute start and stop positions.
+UTTERANCE = struct.Struct('<QQ')
+
+
+def _compact(path, record, keep):
+    """Load fixed-size records from `path`, rewriting it without the ones `keep` rejects."""
+    entries = []
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        entries = [record.unpack_from(data, offset) for offset in range(0, len(data) - record.size + 1, record.size)]
+    kept = [entry for entry in entries if keep(entry)]
+    if len(kept) != len(entries) or (os.path.exists(path) and os.path.getsize(path) % record.size):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(record.pack(*entry) for entry in kept))
+        os.replace(tmp, path)
+    return kept
+
+
+class PcmArchive:
+    """Always-on int16 mono archive in preallocated, memory-mapped, rotating files.
+
+    `files` files of `file_seconds` each form one ring: absolute sample
+    position p lives in file (p // file_samples) % files at byte offset
+    (p % file_samples) * 2, so nothing is ever appended or reallocated and
+    the oldest audio is overwritten once the ring is full. A time anchor
+    (epoch, position) is logged every `anchor_seconds` and whenever the
+    clock and the sample count disagree by more than `tolerance` (a gap or
+    restart), and detected utterances are logged as position ranges, so
+    wall-clock windows and utterances map to byte offsets with a bisect.
+    The head position survives restarts, and an existing archive keeps its
+    own layout; opening it at a different `sample_rate` is a ValueError
+    (None takes whatever rate it was created with, 16 kHz for a new one).
+    """
+
+    def __init__(self, directory='pcm_archive', sample_rate=None, file_seconds=900, files=4, anchor_seconds=1.0, tolerance=0.1):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        state_path = os.path.join(directory, 'state.bin')
+        if os.path.exists(state_path):
+            with open(state_path, 'rb') as f:
+                magic, stored_rate, file_samples, files, _ = STATE.unpack(f.read(STATE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{directory} is not a PCM archive")
+            if sample_rate is not None and sample_rate != stored_rate:
+                raise ValueError(f"{directory} holds {stored_rate} Hz audio, not {sample_rate} Hz")
+            sample_rate = stored_rate
+        else:
+            sample_rate = sample_rate or 16000
+            file_samples = int(file_seconds * sample_rate)
+            with open(state_path, 'wb') as f:
+                f.write(STATE.pack(MAGIC, sample_rate, file_samples, files, 0))
+        self.sample_rate = sample_rate
+        self.file_samples = file_samples
+        self.files = files
+        self.capacity = file_samples * files
+        self._state_file = open(state_path, 'r+b')
+        self._state = mmap.mmap(self._state_file.fileno(), STATE.size)
+        self.anchor_samples = int(anchor_seconds * sample_rate)
+        self.tolerance = tolerance
+
+        self._maps = []
+        for i in range(files):
+            path = os.path.join(directory, f"pcm_{i:02d}.raw")
+            with open(path, 'a+b') as f:
+                if os.fstat(f.fileno()).st_size != file_samples * 2:
+                    f.truncate(file_samples * 2)
+                    if hasattr(os, 'posix_fallocate'):
+                        os.posix_fallocate(f.fileno(), 0, file_samples * 2)
+                self._maps.append(mmap.mmap(f.fileno(), file_samples * 2))
+        self._pcm = [np.frombuffer(m, dtype=np.int16) for m in self._maps]
+
+        tail = self.tail
+        anchors = _compact(os.path.join(directory, 'anchors.idx'), ANCHOR, lambda a: a[1] < self.head)
+        # Keep the last anchor before the tail so the oldest retained audio still has a time.
+        first = max(0, bisect.bisect_right([a[1] for a in anchors], tail) - 1)
+        anchors = anchors[first:]
+        self._anchor_times = array('d', (a[0] for a in anchors))
+        self._anchor_positions = array('Q', (a[1] for a in anchors))
+        self._anchors = open(os.path.join(directory, 'anchors.idx'), 'ab')
+        utterances = _compact(os.path.join(directory, 'utterances.idx'), UTTERANCE, lambda u: u[1] > tail and u[1] <= self.head)
+        self._utterance_starts = array('Q', (u[0] for u in utterances))
+        self._utterance_stops = array('Q', (u[1] for u in utterances))
+        self._utterances = open(os.path.join(directory, 'utterances.idx'), 'ab')
+
+    @property
+    def head(self):
+        """Absolute position one past the newest sample."""
+        return HEAD.unpack_from(self._state, HEAD_OFFSET)[0]
+
+    @property
+    def tail(self):
+        """Oldest absolute position still in the archive."""
+        return max(0, self.head - self.capacity)
+
+    def _anchor(self, timestamp, position):
+        self._anchor_times.append(timestamp)
+        self._anchor_positions.append(position)
+        self._anchors.write(ANCHOR.pack(timestamp, position))
+        self._anchors.flush()
+
+    def write(self, block, timestamp=None):
+        """Append a block of int16 samples; `timestamp` is the epoch time of its first sample."""
+        block = np.asarray(block, dtype=np.int16).reshape(-1)
+        head = self.head
+        if timestamp is None:
+            timestamp = time.time() - block.size / self.sample_rate
+        if not self._anchor_positions or head - self._anchor_positions[-1] >= self.anchor_samples:
+            self._anchor(timestamp, head)
+        elif abs(self.time_of(head) - timestamp) > self.tolerance:
+            self._anchor(timestamp, head)  # The stream was interrupted: start a new timeline here
+        done = 0
+        while done < block.size:
+            position = head + done
+            index, offset = divmod(position % self.capacity, self.file_samples)
+            n = min(block.size - done, self.file_samples - offset)
+            self._pcm[index][offset:offset + n] = block[done:done + n]
+            done += n
+        HEAD.pack_into(self._state, HEAD_OFFSET, head + block.size)
+        return head + block.size
+
+    def mark(self, start, stop):
+        """Record a detected utterance as an absolute position range."""
+        self._utterance_starts.append(start)
+        self._utterance_stops.append(stop)
+        self._utterances.write(UTTERANCE.pack(start, stop))
+        self._utterances.flush()
+
+    def time_of(self, position):
+        """Epoch time of an absolute sample position, or None while nothing has been written."""
+        if not self._anchor_positions:
+            return None
+        i = max(0, bisect.bisect_right(self._anchor_positions, position) - 1)
+        return self._anchor_times[i] + (position - self._anchor_positions[i]) / self.sample_rate
+
+    def position_of(self, timestamp):
+        """Absolute sample position recorded at epoch `timestamp`, clamped to the archive."""
+        if not self._anchor_times:
+            return self.head
+        i = max(0, bisect.bisect_right(self._anchor_times, timestamp) - 1)
+        position = self._anchor_positions[i] + round((timestamp - self._anchor_times[i]) * self.sample_rate)
+        if i + 1 < len(self._anchor_positions):
+            position = min(position, self._anchor_positions[i + 1])  # Times inside a gap map to its end
+        return min(max(position, self.tail, self._anchor_positions[i]), self.head)
+
+    def samples(self, start, stop):
+        """int16 samples between two absolute positions: a view if they sit in one file, else a copy."""
+        if start < self.tail or stop > self.head or start > stop:
+            raise ValueError(f"[{start}, {stop}) is not in the archive [{self.tail}, {self.head})")
+        parts = []
+        while start < stop:
+            index, offset = divmod(start % self.capacity, self.file_samples)
+            n = min(stop - start, self.file_samples - offset)
+            parts.append(self._pcm[index][offset:offset + n])
+            start += n
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+
+    def window(self, start_time, end_time):
+        """Samples recorded between two epoch times."""
+        return self.samples(self.position_of(start_time), self.position_of(end_time))
+
+    def utterances(self, start_time=None, end_time=None):
+        """[(start_time, end_time, start, stop)] of the logged utterances overlapping a time window."""
+        tail = self.tail
+        first = bisect.bisect_right(self._utterance_stops, self.position_of(start_time) if start_time else tail)
+        last = bisect.bisect_left(self._utterance_starts, self.position_of(end_time) if end_time else self.head)
+        return [(self.time_of(start), self.time_of(stop), start, stop)
+                for start, stop in zip(self._utterance_starts[first:last], self._utterance_stops[first:last])
+                if start >= tail]
+
+    def replay(self, start_time, end_time, callback, blocksize=1024, speed=None):
+        """Feed a recorded window to a sounddevice-style `callback(indata, frames, time, status)`.
+
+        With `speed` (1.0 = real time) the blocks are paced, otherwise they
+        are delivered as fast as the callback takes them.
+        """
+        start, stop = self.position_of(start_time), self.position_of(end_time)
+        began = time.monotonic()
+        for position in range(start, stop, blocksize):
+            block = self.samples(position, min(position + blocksize, stop))
+            if speed:
+                delay = began + (position - start) / self.sample_rate / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            callback(block.reshape(-1, 1), block.size, None, None)
+
+    def flush(self):
+        for m in self._maps:
+            m.flush()
+        self._state.flush()
+        self._anchors.flush()
+        self._utterances.flush()
+
+    def close(self):
+        self.flush()
+        self._pcm = []
+        for m in self._maps:
+            m.close()
+        self._state.close()
+        for f in (self._state_file, self._anchors, self._utterances):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveWriter:
+    """Feeds a PcmArchive from its own thread, so an audio callback never touches its files.
+
+    `write` copies the block and queues it, and `mark` queues the range.
+    The writer thread applies both to the archive in order. This thread
+    takes the page faults of the memory-mapped ring and the flushes of the
+    index files. `head` already counts the queued blocks. `flush` waits
+    until everything queued so far is in the archive.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.sample_rate = archive.sample_rate
+        self._head = archive.head
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='pcm-archive', daemon=True)
+        self._thread.start()
+
+    @property
+    def head(self):
+        """Archive position one past the newest queued sample."""
+        return self._head
+
+    def write(self, block, timestamp=None):
+        """Queue a copy of a block of int16 samples; `timestamp` is the epoch time of its first sample."""
+        block = np.array(block, dtype=np.int16).reshape(-1)
+        if timestamp is None:
+            timestamp = time.time() - block.size / self.sample_rate
+        self._queue.put((self.archive.write, (block, timestamp)))
+        self._head += block.size
+        return self._head
+
+    def mark(self, start, stop):
+        """Queue a detected utterance, as an absolute position range."""
+        self._queue.put((self.archive.mark, (start, stop)))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            func, args = item
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"PCM archive write failed: {e}", file=sys.stderr)
+
+    def flush(self):
+        done = threading.Event()
+        self._queue.put((done.set, ()))
+        done.wait()
+
+    def close(self):
+        """Finish the queued writes and stop the thread; the archive itself stays open."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+def parse_time(text):
+    """Epoch seconds from an ISO date/time, or from a negative number of seconds before now."""
+    try:
+        seconds = float(text)
+        return time.time() + seconds if seconds <= 0 else seconds
+    except ValueError:
+        return datetime.datetime.fromisoformat(text).timestamp()
+
+
+if __name__ == '__main__':
+    from AudioEncoder import encode_wav
+
+    parser = argparse.ArgumentParser(description="Inspect a PCM archive or export a window of it as WAV")
+    parser.add_argument('directory', nargs='?', default='pcm_archive')
+    parser.add_argument('-f', '--start', type=parse_time, default=None, help="Window start (ISO time, or -N for N seconds ago)")
+    parser.add_argument('-e', '--end', type=parse_time, default=None, help="Window end (ISO time, or -N for N seconds ago)")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Write the window to this WAV file")
+    args = parser.parse_args()
+
+    with PcmArchive(args.directory) as archive:
+        if archive.head == archive.tail:
+            parser.exit(message=f"{args.directory} is empty\n")
+        start = args.start or archive.time_of(archive.tail)
+        end = args.end or archive.time_of(archive.head)
+        if args.output:
+            with open(args.output, 'wb') as f:
+                f.write(encode_wav(archive.window(start, end), archive.sample_rate))
+            print(f"Wrote {end - start:.1f} s to {args.output}")
+        else:
+            for t0, t1, _, _ in archive.utterances(start, end):
+                stamp = datetime.datetime.fromtimestamp(t0).strftime('%Y-%m-%d %H:%M:%S')
+                print(f"{stamp}  {t1 - t0:6.1f} s")
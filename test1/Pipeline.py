@@ -0,0 +1,99 @@
+import queue
+import threading
+
+# Sentinel pushed through the stages on shutdown.
+STOP = object()
+
+
+class Stage:
+    """One step of a Pipeline: a thread that blocks on its inbound queue.
+
+    `func(item)` returns the item for the next stage, or None to pass nothing
+    on; with `flatten=True` it returns an iterable of items instead. `on_stop()`
+    runs when the STOP sentinel arrives and may return final items (flushed
+    the same way) before STOP is forwarded. `inbox` replaces the bounded
+    queue.Queue of `capacity` items with anything that has `put`, `get` and
+    `qsize` and hands STOP back out, e.g. a SegmentInbox.
+    """
+
+    def __init__(self, name, func, capacity=8, flatten=False, on_stop=None, inbox=None):
+        self.name = name
+        self.func = func
+        self.flatten = flatten
+        self.on_stop = on_stop
+        self.inbox = inbox if inbox is not None else queue.Queue(maxsize=capacity)
+        self.processed = 0
+        self.errors = 0
+        self.next = None
+        self._thread = threading.Thread(target=self._run, name=f"stage-{name}", daemon=True)
+
+    def _emit(self, result):
+        if result is None or self.next is None:
+            return
+        for item in (result if self.flatten else (result,)):
+            self.next.inbox.put(item)  # Blocks when the next stage is full: that is the backpressure.
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is STOP:
+                if self.on_stop:
+                    self._emit(self.on_stop())
+                if self.next is not None:
+                    self.next.inbox.put(STOP)
+                return
+            try:
+                self._emit(self.func(item))
+            except Exception as e:
+                self.errors += 1
+                print(f"\n[{self.name}] {e}")
+            self.processed += 1
+
+
+class Pipeline:
+    """Chain of Stages connected by bounded queues.
+
+    Nothing polls: every stage sleeps in `Queue.get` until there is work, so an
+    idle pipeline costs no CPU and a new item is picked up as soon as it is
+    queued. Audio callbacks should use `offer`, which never blocks and counts
+    what it had to drop; everything else can use `put`.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        for stage, following in zip(stages, stages[1:]):
+            stage.next = following
+        self.dropped = 0
+
+    def start(self):
+        for stage in self.stages:
+            stage._thread.start()
+        return self
+
+    def put(self, item, timeout=None):
+        self.stages[0].inbox.put(item, timeout=timeout)
+
+    def offer(self, item):
+        """Non-blocking put for real-time producers; returns False if the item was dropped."""
+        try:
+            self.stages[0].inbox.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout=None):
+        """Send STOP through every stage and wait for them to drain."""
+        self.stages[0].inbox.put(STOP)
+        self.join(timeout)
+
+    def join(self, timeout=None):
+        for stage in self.stages:
+            stage._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'dropped': self.dropped,
+            'stages': {stage.name: {'processed': stage.processed, 'errors': stage.errors, 'depth': stage.inbox.qsize()}
+                       for stage in self.stages},
+        }
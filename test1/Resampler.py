@@ -0,0 +1,68 @@
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class Resampler:
+    """Rational-ratio polyphase resampler (e.g. 44100 -> 16000 is up 160, down 441).
+
+    The windowed-sinc low-pass is split into `up` phases of `taps` coefficients.
+    Every output sample picks one phase and one input window, so a block of
+    outputs is a single gather plus a row-wise dot product; nothing is ever
+    computed at the upsampled rate.
+    """
+
+    def __init__(self, rate_in, rate_out, taps=32, beta=8.0, block=65536):
+        g = gcd(rate_in, rate_out)
+        self.rate_in = rate_in
+        self.rate_out = rate_out
+        self.up = rate_out // g
+        self.down = rate_in // g
+        self.taps = taps
+        self.block = block
+
+        # Prototype filter at the upsampled rate, cut off below the lower Nyquist.
+        length = self.up * taps
+        cutoff = 0.95 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        prototype = cutoff * np.sinc(cutoff * n) * np.kaiser(length, beta) * self.up
+        # phases[p, k] multiplies x[i - k] for outputs landing on phase p; reversed so it lines up with a forward window.
+        self.phases = prototype.reshape(taps, self.up).T[:, ::-1].astype(np.float32).copy()
+        self.delay = (length - 1) / 2 / self.up  # group delay in input samples
+
+    def __call__(self, samples):
+        """Resample a whole 1-D array; int16 in gives int16 out."""
+        samples = np.asarray(samples).reshape(-1)
+        if self.up == self.down:
+            return samples.copy()
+        dtype = samples.dtype
+        x = samples.astype(np.float32)
+        n_out = int(np.ceil(x.size * self.up / self.down))
+        # Pad so every window is in range and the filter delay is compensated.
+        lead = self.taps
+        x = np.concatenate((np.zeros(lead, np.float32), x, np.zeros(self.taps + 1, np.float32)))
+        windows = sliding_window_view(x, self.taps)
+
+        out = np.empty(n_out, dtype=np.float32)
+        shift = int(round(self.delay * self.up))
+        for start in range(0, n_out, self.block):
+            index = np.arange(start, min(start + self.block, n_out)) * self.down + shift
+            base = index // self.up
+            phase = index % self.up
+            out[start:start + base.size] = np.einsum('ij,ij->i', windows[base + lead - self.taps + 1], self.phases[phase])
+
+        if dtype == np.int16:
+            return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+        return out.astype(dtype, copy=False)
+
+
+_resamplers = {}
+
+
+def resample(samples, rate_in, rate_out):
+    """Resample with a cached Resampler for the (rate_in, rate_out) pair."""
+    key = (rate_in, rate_out)
+    if key not in _resamplers:
+        _resamplers[key] = Resampler(rate_in, rate_out)
+    return _resamplers[key](samples)
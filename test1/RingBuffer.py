@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity sample buffer for a single producer (the audio callback).
+
+    Positions are absolute sample counts since the buffer was created, so a
+    segment is just a (start, stop) pair. The producer only ever advances
+    `head` after the samples are in place, which is what lets a reader on
+    another thread use any range below `head` without taking a lock.
+    """
+
+    __slots__ = ('capacity', 'dtype', '_buffer', '_head')
+
+    def __init__(self, capacity, dtype='int16'):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._buffer = np.zeros(self.capacity, dtype=self.dtype)
+        self._head = 0
+
+    @property
+    def head(self):
+        """Total number of samples written so far."""
+        return self._head
+
+    @property
+    def tail(self):
+        """Oldest position that has not been overwritten yet."""
+        return max(0, self._head - self.capacity)
+
+    def write(self, block):
+        """Copy a block of samples in. Cost depends only on the block size."""
+        block = np.asarray(block, dtype=self.dtype).reshape(-1)
+        n = block.size
+        if n == 0:
+            return self._head
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            self._head += n - self.capacity
+            n = self.capacity
+        start = self._head % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start:start + first] = block[:first]
+        if first < n:
+            self._buffer[:n - first] = block[first:]
+        self._head += n
+        return self._head
+
+    def mark(self, preroll=0):
+        """Return a segment start position that keeps `preroll` samples of history."""
+        return max(self.tail, self._head - int(preroll))
+
+    def segment(self, start, stop=None):
+        """Return the samples in [start, stop) as a memoryview.
+
+        The view aliases the ring storage unless the range wraps around the end
+        of the buffer, in which case the two halves are joined once. Either way
+        the data is only valid until the producer writes over it again.
+        """
+        stop = self._head if stop is None else stop
+        if start < self.tail or stop > self._head or start > stop:
+            raise ValueError(f"range [{start}, {stop}) is not available (have [{self.tail}, {self._head}))")
+        begin = start % self.capacity
+        end = begin + (stop - start)
+        if end <= self.capacity:
+            return memoryview(self._buffer[begin:end])
+        return memoryview(np.concatenate((self._buffer[begin:], self._buffer[:end - self.capacity])))
+
+    def samples(self, start, stop=None):
+        """Same as `segment` but as a numpy array."""
+        return np.frombuffer(self.segment(start, stop), dtype=self.dtype)
+
+    def __len__(self):
+        return self._head - self.tail
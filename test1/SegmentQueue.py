@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from Pipeline import STOP
+from Resampler import resample
+from Tracer import tracer
+
+# `data` is the (possibly merged) audio in the type it was queued as, `segments`
+# how many queued items it holds (0 after `wake`), `lag` how long the oldest
+# of them waited and `spans` what each was queued with as `span`, in order.
+Batch = namedtuple('Batch', ['data', 'sample_rate', 'segments', 'lag', 'spans'])
+
+
+def _seconds(data, sample_rate):
+    """Length of int16 mono audio given as bytes or as an array."""
+    samples = len(data) // 2 if isinstance(data, (bytes, bytearray)) else len(data)
+    return samples / sample_rate
+
+
+def _join(parts):
+    if isinstance(parts[0], (bytes, bytearray)):
+        return b''.join(parts)
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+class SegmentQueue:
+    """Bounded queue of int16 mono segments (arrays or raw bytes) between a recorder and a transcriber.
+
+    The policy runs inside `put` and `get`, so neither side has to know about it:
+    - merge: once the oldest segment has waited `target_lag` seconds, `get`
+      joins it with the segments queued right after it (up to `merge_seconds`
+      of audio) into one request, so a slow backend costs one round trip per
+      batch instead of one per segment;
+    - downsample: with `pressure_rate`, segments queued while more than
+      `pressure_seconds` of audio is waiting are resampled to that rate;
+    - drop: past `max_segments` or `max_seconds` of waiting audio the oldest
+      segment is dropped, and so is any segment older than `max_lag` when it
+      comes up, so the transcript catches up with real time instead of
+      falling further behind.
+    Depth, waiting audio, lag and the policy counters are in `stats`; each
+    batch's lag is also recorded by the tracer as 'queue_lag'.
+    `put(None)` closes the queue: `get` returns None once it is drained.
+    `on_drop(span)`, if set, is called outside the lock for every dropped
+    segment, with the `span` it was queued with.
+    """
+
+    def __init__(self, sample_rate, max_segments=32, max_seconds=120.0, target_lag=5.0, merge_seconds=30.0,
+                 pressure_rate=None, pressure_seconds=60.0, max_lag=None, on_drop=None):
+        self.sample_rate = sample_rate
+        self.max_segments = max_segments
+        self.max_seconds = max_seconds
+        self.target_lag = target_lag
+        self.merge_seconds = merge_seconds
+        self.pressure_rate = pressure_rate
+        self.pressure_seconds = pressure_seconds
+        self.max_lag = max_lag
+        self.on_drop = on_drop
+        self._items = deque()  # (data, sample rate, seconds, time queued, span)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._woken = False
+        self.seconds = 0.0  # Audio waiting
+        self.taken = 0
+        self.merged = 0
+        self.downsampled = 0
+        self.dropped = 0
+        self.dropped_seconds = 0.0
+        self.worst_lag = 0.0
+
+    def put(self, data, span=None):
+        """Queue a segment, applying the pressure policy; never blocks.
+
+        `span` is any tag for the segment, e.g. its ring positions; it comes
+        back in `Batch.spans` or in `on_drop`.
+        """
+        if data is None:
+            self.close()
+            return
+        rate = self.sample_rate
+        with self._cond:
+            pressured = self.pressure_rate and self.seconds > self.pressure_seconds
+        if pressured:
+            samples = np.frombuffer(data, dtype=np.int16) if isinstance(data, (bytes, bytearray)) else data
+            resampled = resample(samples, rate, self.pressure_rate)
+            data = resampled.tobytes() if isinstance(data, (bytes, bytearray)) else resampled
+            rate = self.pressure_rate
+        seconds = _seconds(data, rate)
+        dropped = []
+        with self._cond:
+            self.downsampled += bool(pressured)
+            self._items.append((data, rate, seconds, time.monotonic(), span))
+            self.seconds += seconds
+            while len(self._items) > 1 and (len(self._items) > self.max_segments or self.seconds > self.max_seconds):
+                dropped.append(self._drop())
+            self._cond.notify()
+        self._dropped(dropped)
+
+    def _drop(self):
+        _, _, seconds, _, span = self._items.popleft()
+        self.seconds -= seconds
+        self.dropped += 1
+        self.dropped_seconds += seconds
+        return span
+
+    def _dropped(self, spans):
+        if self.on_drop is not None:
+            for span in spans:
+                self.on_drop(span)
+
+    def get(self, timeout=None):
+        """Next Batch, or None once the queue is closed and drained.
+
+        Returns an empty Batch after `wake` or when `timeout` passes first.
+        """
+        dropped = []
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed or self._woken, timeout)
+            self._woken = False
+            if self.max_lag is not None:
+                while self._items and time.monotonic() - self._items[0][3] > self.max_lag:
+                    dropped.append(self._drop())
+            if not self._items:
+                batch = None if self._closed else Batch(b'', self.sample_rate, 0, 0.0, [])
+            else:
+                data, rate, seconds, queued, span = self._items.popleft()
+                lag = time.monotonic() - queued
+                parts, spans = [data], [span]
+                if lag >= self.target_lag:
+                    while (self._items and self._items[0][1] == rate and type(self._items[0][0]) is type(data)
+                           and seconds + self._items[0][2] <= self.merge_seconds):
+                        following, _, more, _, span = self._items.popleft()
+                        parts.append(following)
+                        spans.append(span)
+                        seconds += more
+                    self.merged += len(parts) - 1
+                self.seconds -= seconds
+                self.taken += len(parts)
+                self.worst_lag = max(self.worst_lag, lag)
+                batch = Batch(_join(parts), rate, len(parts), lag, spans)
+        self._dropped(dropped)
+        if batch is not None and batch.segments:
+            tracer.record('queue_lag', batch.lag)
+        return batch
+
+    def wake(self):
+        """Make a waiting `get` return an empty Batch."""
+        with self._cond:
+            self._woken = True
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self):
+        return len(self._items)
+
+    def lag(self):
+        """Seconds the oldest waiting segment has been queued."""
+        with self._cond:
+            return time.monotonic() - self._items[0][3] if self._items else 0.0
+
+    def stats(self):
+        return {
+            'depth': self.qsize(),
+            'queued_seconds': round(self.seconds, 2),
+            'lag': round(self.lag(), 3),
+            'worst_lag': round(self.worst_lag, 3),
+            'taken': self.taken,
+            'merged': self.merged,
+            'downsampled': self.downsampled,
+            'dropped': self.dropped,
+            'dropped_seconds': round(self.dropped_seconds, 2),
+        }
+
+
+class SegmentInbox:
+    """A SegmentQueue as the inbox of a Pipeline Stage: (start, stop) ring ranges go in, Batches come out.
+
+    The samples are copied as they are queued, so a batch stays valid however
+    long it waits while the ring moves on; the range is kept as its span.
+    STOP closes the queue and comes out again once everything before it has.
+    """
+
+    def __init__(self, segments, ring):
+        self.segments = segments
+        self.ring = ring
+
+    def put(self, item, timeout=None):
+        if item is STOP:
+            self.segments.close()
+        else:
+            self.segments.put(np.array(self.ring.samples(*item)), span=item)
+
+    def get(self):
+        batch = self.segments.get()
+        return STOP if batch is None else batch
+
+    def qsize(self):
+        return self.segments.qsize()
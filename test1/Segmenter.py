@@ -0,0 +1,103 @@
+from Tracer import tracer
+
+
+class Segmenter:
+    """Cuts speech segments out of a RingBuffer with a VoiceActivityDetector.
+
+    Both steps work on ring positions: `detect` runs the samples up to a new
+    head position through the detector, `cut` turns the detector's output into
+    views of the ring. Segments longer than `max_samples` are split so their
+    samples are handed out before the ring wraps over them. They are kept as
+    two calls so a pipeline can run them as separate stages. If `detect` falls
+    so far behind that the ring has overwritten samples it has not seen, it
+    restarts the detector at the oldest sample left; `skipped` counts the
+    samples it never saw.
+    """
+
+    def __init__(self, ring, vad, max_samples=None):
+        self.ring = ring
+        self.vad = vad
+        self.max_samples = max_samples or ring.capacity // 2
+        # The detector counts samples from its own reset; this maps them onto the ring.
+        self._offset = ring.head
+        self._block_start = ring.head
+        self._emitted = ring.head  # Everything before this position has been handed out
+        self.recording = False
+        self.skipped = 0
+        vad.reset()
+
+    def detect(self, block_stop):
+        """Feed the samples up to `block_stop` to the detector."""
+        tail = self.ring.tail
+        if self._block_start < tail:
+            # Whatever the detector was in the middle of has been overwritten: start over after the gap.
+            self.skipped += tail - self._block_start
+            print(f"\nDetector fell behind the ring: skipped {(tail - self._block_start) / self.vad.sample_rate:.1f}s of audio")
+            self.vad.reset()
+            self._offset = self._block_start = tail
+            self._emitted = max(self._emitted, tail)
+            self.recording = False
+            block_stop = max(block_stop, tail)
+        with tracer.span('vad'):
+            finished = self.vad.process(self.ring.samples(self._block_start, block_stop))
+        self._block_start = block_stop
+        open_start = self.vad.segment_start
+        if finished and tracer.enabled:
+            # How long the last word waited for the hangover to confirm the silence
+            hangover = self.vad.hangover_frames * self.vad.frame_length
+            for start, stop in finished:
+                tracer.record('silence_wait', (block_stop - stop - self._offset + hangover) / self.vad.sample_rate)
+        return (block_stop,
+                [(start + self._offset, stop + self._offset) for start, stop in finished],
+                None if open_start is None else open_start + self._offset)
+
+    @property
+    def speech_end(self):
+        """Ring position just after the last frame the detector heard speech in."""
+        return self.vad.speech_end + self._offset
+
+    def cut(self, event):
+        """Turn one `detect` result into a list of finished segments (int16 views)."""
+        return [self.ring.samples(start, stop) for start, stop in self.cut_ranges(event)]
+
+    def cut_ranges(self, event):
+        """`cut`, returning the (start, stop) ring positions of the segments instead of views."""
+        with tracer.span('segment'):
+            return self._cut(*event)
+
+    def _cut(self, block_stop, finished, open_start):
+        segments = []
+        for start, stop in finished:
+            start = max(start, self._emitted, self.ring.tail)
+            if stop > start:
+                segments.append((start, stop))
+            self._emitted = stop
+            self.recording = False
+        if open_start is not None:
+            if not self.recording:
+                self.recording = True
+                self._emitted = max(open_start, self._emitted, self.ring.tail)
+            if block_stop - self._emitted >= self.max_samples:
+                segments.append((self._emitted, block_stop))
+                self._emitted = block_stop
+        return segments
+
+    def feed(self, block_stop):
+        """`detect` and `cut` in one call."""
+        return self.cut(self.detect(block_stop))
+
+    def flush(self):
+        """Close a segment that is still open when the input ends."""
+        return [self.ring.samples(start, stop) for start, stop in self.flush_ranges()]
+
+    def flush_ranges(self):
+        """`flush`, returning (start, stop) ring positions."""
+        segments = []
+        for start, stop in self.vad.flush():
+            start = max(start + self._offset, self._emitted, self.ring.tail)
+            stop = min(stop + self._offset, self.ring.head)
+            if stop > start:
+                segments.append((start, stop))
+            self._emitted = stop
+        self.recording = False
+        return segments
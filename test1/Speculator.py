@@ -0,0 +1,172 @@
+import threading
+from concurrent.futures import Future
+
+
+class _Guess:
+    """One speculative upload: the audio [start, stop) sent when speech seemed to end at `speech_end`."""
+
+    __slots__ = ('start', 'stop', 'speech_end', 'future')
+
+    def __init__(self, start, stop, speech_end, future):
+        self.start = start
+        self.stop = stop
+        self.speech_end = speech_end
+        self.future = future
+
+
+def combine(pieces, fs):
+    """A Future of one result stitched from [(offset in samples, future)] pieces of a segment."""
+    combined = Future()
+    remaining = [len(pieces)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            results = [(offset, future.result()) for offset, future in pieces]
+        except Exception as e:
+            combined.set_exception(e)
+            return
+        text = ' '.join(filter(None, (result.get('text', '').strip() for _, result in results)))
+        words = [dict(word, start=word['start'] + offset / fs, end=word['end'] + offset / fs)
+                 for offset, result in results for word in result.get('words', [])]
+        combined.set_result(dict(text=text, words=words) if words else {'text': text})
+
+    for _, future in pieces:
+        future.add_done_callback(done)
+    return combined
+
+
+class Speculator:
+    """Starts transcribing a segment as soon as its trailing silence begins.
+
+    The segmenter only closes a segment once the detector's hangover
+    (`silence_threshold`) has passed without speech. `observe` is called after
+    every detector step: once `min_silence` of that hangover has gone by, the
+    audio up to the end of the last speech is uploaded right away. When the
+    segment then closes with no speech after that point the guess is a hit
+    and `take` hands out its (usually already finished) future, so the
+    hangover no longer sits between the last word and the text. If speech
+    resumes the guess is a miss: with `merge` its result is kept as the
+    first part of the segment and only the rest is uploaded later, otherwise
+    it is cancelled, or ignored if it was already on the wire.
+
+    `observe` runs on the segmenter's thread and `take`/`discard` on the
+    upload side, so the guesses are only touched under a lock; uploads are
+    started outside it.
+    """
+
+    def __init__(self, ring, fs, client, encoder, min_silence=0.3, merge=False, **transcribe_options):
+        self.ring = ring
+        self.fs = fs
+        self.client = client
+        self.encoder = encoder
+        self.min_silence = int(min_silence * fs)
+        self.merge = merge
+        self.options = transcribe_options
+        self._lock = threading.Lock()
+        self._guess = None
+        self._prefix = []  # Merged guesses of the open segment, as (start, stop, future)
+        self._ready = {}  # Segment stop -> ([(start, stop, future)], whether they cover all its speech), for `take`
+        self.speculations = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.wasted = 0
+        self.merged = 0
+
+    def _submit(self, start, stop):
+        encoded = self.encoder.encode(self.ring.samples(start, stop))
+        return self.client.submit(encoded.data, filename=encoded.filename, content_type=encoded.content_type,
+                                  pcm_digest=encoded.pcm_digest, **self.options)
+
+    def _discard(self, future):
+        # Called with the lock held
+        if future.cancel():
+            self.cancelled += 1
+        else:
+            self.wasted += 1
+
+    def observe(self, block_stop, finished, open_start, speech_end, hangover):
+        """Update the guesses after a detector step.
+
+        `block_stop`, `finished` and `open_start` are a Segmenter `detect`
+        result, `speech_end` is the segmenter's `speech_end` right after it and
+        `hangover` the detector's hangover in samples.
+        """
+        with self._lock:
+            for start, stop in finished:
+                guess, pieces, self._guess, self._prefix = self._guess, self._prefix, None, []
+                complete = guess is not None and guess.speech_end == stop - hangover
+                if complete:
+                    self.hits += 1
+                    pieces.append((guess.start, guess.stop, guess.future))
+                elif guess is not None:
+                    self.misses += 1
+                    self._discard(guess.future)
+                if pieces:
+                    self._ready[stop] = (pieces, complete)
+            if open_start is None:
+                return
+            guess = self._guess
+            if guess is not None and guess.speech_end != speech_end:
+                # Speech resumed after the guess was sent.
+                self.misses += 1
+                self._guess = None
+                if self.merge:
+                    self._prefix.append((guess.start, guess.stop, guess.future))
+                    self.merged += 1
+                else:
+                    self._discard(guess.future)
+            if self._guess is not None or block_stop - speech_end < self.min_silence:
+                return
+            start = self._prefix[-1][1] if self._prefix else max(open_start, self.ring.tail)
+            stop = speech_end + self.min_silence
+            if stop <= start:
+                return
+            self.speculations += 1
+        # Only this thread sets a guess, so the slot is still free once the upload has started
+        future = self._submit(start, stop)
+        with self._lock:
+            self._guess = _Guess(start, stop, speech_end, future)
+
+    def take(self, start, stop):
+        """Future of the segment [start, stop): the confirmed guess, merged pieces plus the rest, or a new upload."""
+        with self._lock:
+            pieces, complete = self._ready.pop(stop, ([], False))
+            if pieces and pieces[0][0] != start:
+                # The segmenter cut it differently (a split or an overwritten start): the guesses do not fit.
+                for _, _, future in pieces:
+                    self._discard(future)
+                pieces, complete = [], False
+        if not pieces:
+            return self._submit(start, stop)
+        if complete and len(pieces) == 1:
+            return pieces[0][2]
+        if not complete:
+            covered = pieces[-1][1]
+            pieces.append((covered, stop, self._submit(covered, stop)))
+        return combine([(piece_start - start, future) for piece_start, _, future in pieces], self.fs)
+
+    def discard(self, start, stop):
+        """Give up on the segment [start, stop) without taking it, e.g. when a full queue dropped it."""
+        with self._lock:
+            pieces, _ = self._ready.pop(stop, ([], False))
+            for _, _, future in pieces:
+                self._discard(future)
+
+    def stats(self):
+        with self._lock:
+            decided = self.hits + self.misses
+            return {
+                'speculations': self.speculations,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / decided, 3) if decided else None,
+                'cancelled': self.cancelled,
+                'wasted': self.wasted,
+                'merged': self.merged,
+            }
@@ -0,0 +1,48 @@
+import shutil
+import sys
+
+
+class TerminalView:
+    """Keeps a list of lines on screen, redrawing only from the first line that changed.
+
+    The cursor is moved up over the stale lines with ANSI escapes and
+    everything below it is cleared and rewritten, so appending to or editing
+    the last line of a long transcript costs one line of output instead of a
+    full screen clear. When the output is not a terminal, changed lines are
+    simply printed.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        self.lines = []
+        self._rows = []  # Terminal rows each drawn line occupies
+
+    def update(self, lines):
+        first = 0
+        for old, new in zip(self.lines, lines):
+            if old != new:
+                break
+            first += 1
+        if first == len(self.lines) == len(lines):
+            return
+
+        out = []
+        if self.tty:
+            columns, height = shutil.get_terminal_size()
+            up = sum(self._rows[first:])
+            if up >= height:
+                # The first changed line has scrolled off; start over on a clean screen.
+                first, up = 0, 0
+                out.append('\x1b[2J\x1b[H')
+                self._rows = []
+            elif up:
+                out.append(f'\x1b[{up}F')
+            out.append('\x1b[J')
+            del self._rows[first:]
+            self._rows.extend(max(1, -(-len(line) // columns)) for line in lines[first:])
+        for line in lines[first:]:
+            out.append(line + '\n')
+        self.stream.write(''.join(out))
+        self.stream.flush()
+        self.lines = list(lines)
@@ -0,0 +1,193 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond callbacks to long uploads.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (seconds), cheap enough to update for every span."""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (the max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _Span:
+    __slots__ = ('tracer', 'stage', 'fields', 'start')
+
+    def __init__(self, tracer, stage, fields):
+        self.tracer = tracer
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.stage, time.monotonic() - self.start, self.start, **self.fields)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Per-stage latency spans on the monotonic clock, kept as histograms.
+
+    `with tracer.span('upload'):` times a block; `record(stage, seconds)` adds
+    a duration measured elsewhere. Spans can be written as JSON lines (one
+    object per span, with its monotonic start) and the histograms as
+    Prometheus text, rewritten every `metrics_interval` seconds so a textfile
+    collector can scrape them. Until `enable` is called, `span` returns a
+    shared no-op object and `record` returns at once, so instrumented code
+    pays about one attribute lookup.
+
+    Once enabled, `record` only appends to a deque, which takes no lock, so
+    it is safe on an audio callback thread. A background thread folds the
+    queued spans into the histograms and writes the trace every
+    `flush_interval` seconds. `summary` and `prometheus` first fold in
+    whatever is still queued.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._trace = None
+        self._metrics_path = None
+        self._worker = None
+
+    def enable(self, trace_path=None, metrics_path=None, metrics_interval=10.0, flush_interval=0.25):
+        self._trace = open(trace_path, 'a', buffering=1 << 16) if trace_path else None
+        self._metrics_path = metrics_path
+        self.enabled = True
+        self._worker = threading.Thread(target=self._run, args=(flush_interval, metrics_path and metrics_interval), daemon=True)
+        self._worker.start()
+        return self
+
+    def span(self, stage, **fields):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, fields)
+
+    def record(self, stage, seconds, start=None, **fields):
+        if not self.enabled:
+            return
+        self._pending.append((stage, seconds, start, fields))
+
+    def _drain(self):
+        """Fold the queued spans into the histograms and the trace file."""
+        with self._lock:
+            while self._pending:
+                stage, seconds, start, fields = self._pending.popleft()
+                histogram = self.histograms.get(stage)
+                if histogram is None:
+                    histogram = self.histograms[stage] = Histogram()
+                histogram.observe(seconds)
+                if self._trace:
+                    line = {'stage': stage, 'start': start, 'seconds': seconds}
+                    line.update(fields)
+                    self._trace.write(json.dumps(line) + '\n')
+
+    def prometheus(self, name='voice_stage_seconds'):
+        """The histograms in the Prometheus text exposition format."""
+        lines = [f"# HELP {name} Time spent in each stage of the voice pipeline.", f"# TYPE {name} histogram"]
+        self._drain()
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Count, mean, approximate p50/p95 and max per stage, in milliseconds."""
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+        self._drain()
+        with self._lock:
+            return {stage: {
+                'count': h.count,
+                'mean_ms': ms(h.total / h.count),
+                'p50_ms': ms(h.quantile(0.5)),
+                'p95_ms': ms(h.quantile(0.95)),
+                'max_ms': ms(h.max),
+            } for stage, h in sorted(self.histograms.items())}
+
+    def export(self):
+        """Atomically rewrite the Prometheus file, if one was configured."""
+        if not self._metrics_path:
+            return
+        tmp = f"{self._metrics_path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(tmp, self._metrics_path)
+
+    def _run(self, flush_interval, metrics_interval):
+        next_export = time.monotonic() + metrics_interval if metrics_interval else None
+        while self.enabled:
+            time.sleep(flush_interval)
+            self._drain()
+            if next_export is not None and time.monotonic() >= next_export:
+                self.export()
+                next_export += metrics_interval
+
+    def close(self):
+        self.enabled = False
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self.export()
+        self._drain()
+        if self._trace:
+            with self._lock:
+                self._trace.close()
+                self._trace = None
+
+
+# Shared by every module; disabled until a script calls tracer.enable().
+tracer = Tracer()
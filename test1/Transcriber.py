@@ -1,17 +1,18 @@
-import requests
+from TranscriptionClient import TranscriptionClient
 
 class Transcriber:
-    def __init__(self, token, language='en', model='whisper-1', translate=False):
+    def __init__(self, token, language='en', model='whisper-1', translate=False, client=None, cache=None):
         self.token = token
         self.language = language
         self.model = model
         self.translate = translate
+        self.client = client or TranscriptionClient(token, cache=cache)
 
-    def transcribe(self, audio_data):
-        url = "https://api.openai.com/v1/audio/translations" if self.translate else "https://api.openai.com/v1/audio/transcriptions"
-        headers = {'Authorization': f'Bearer {self.token}'}
-        files = {'file': ('audio.wav', audio_data, 'audio/wav')}
-        params = {'model': self.model, 'language': self.language}
+    def transcribe(self, audio_data, filename='audio.wav', content_type='audio/wav', pcm_digest=None):
+        return self.client.transcribe(audio_data, filename=filename, content_type=content_type, language=self.language, model=self.model, translate=self.translate, pcm_digest=pcm_digest)
 
-        response = requests.post(url, headers=headers, files=files, data=params)
-        return response.json()
+    def submit(self, audio_data, filename='audio.wav', content_type='audio/wav', pcm_digest=None):
+        return self.client.submit(audio_data, filename=filename, content_type=content_type, language=self.language, model=self.model, translate=self.translate, pcm_digest=pcm_digest)
+
+    async def atranscribe(self, audio_data, filename='audio.wav', content_type='audio/wav', pcm_digest=None):
+        return await self.client.atranscribe(audio_data, filename=filename, content_type=content_type, language=self.language, model=self.model, translate=self.translate, pcm_digest=pcm_digest)
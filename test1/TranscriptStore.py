@@ -0,0 +1,216 @@
+import argparse
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+import time
+from array import array
+
+# Every log record is a length prefix followed by that many bytes of UTF-8 JSON.
+RECORD = struct.Struct('<I')
+# One index entry per segment: start, end (epoch seconds) and the record's offset in the log.
+INDEX = struct.Struct('<ddQ')
+WORD = re.compile(r"[\w']+")
+
+
+def terms(text):
+    """Lower-cased search terms of `text`."""
+    return [word.lower() for word in WORD.findall(text)]
+
+
+def spread_words(text, start, end):
+    """Word timestamps spread evenly over [start, end], for results that come without them."""
+    words = text.split()
+    if not words:
+        return []
+    step = (end - start) / len(words)
+    return [[word, round(start + i * step, 3), round(start + (i + 1) * step, 3)] for i, word in enumerate(words)]
+
+
+class TranscriptStore:
+    """Durable, append-only transcript with word timestamps.
+
+    A directory holds three append-only files:
+    - segments.log: one JSON record per finished segment, with its text and
+      absolute (epoch) start/end for every word;
+    - segments.idx: fixed-size (start, end, offset) entries, memory-mapped;
+      at open their start times are sorted into an in-memory permutation,
+      kept sorted on every append, so a time range is found with a bisect
+      in O(log n), widened back by the longest segment so long ones that
+      began earlier are not missed;
+    - keywords.log: the search terms of every segment, loaded at open into an
+      in-memory inverted index (term -> segment ids).
+    Segments may be appended out of time order, e.g. as the uploads of
+    several devices finish; ids follow append order, queries time order.
+    A record that was only partly written when the process died is cut off
+    the next time the store opens.
+    """
+
+    def __init__(self, directory='transcripts'):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._log = open(os.path.join(directory, 'segments.log'), 'ab+')
+        self._index = open(os.path.join(directory, 'segments.idx'), 'ab+')
+        self._keywords = open(os.path.join(directory, 'keywords.log'), 'ab+')
+        self._log_map = None
+        self._index_map = None
+        self.postings = {}
+        self._recover()
+
+    def _size(self, f):
+        f.flush()
+        return os.fstat(f.fileno()).st_size
+
+    def _recover(self):
+        # The index is written after the log, so it is the source of truth.
+        count = self._size(self._index) // INDEX.size
+        self._index.truncate(count * INDEX.size)
+        self.count = count
+        entries = [self._entry(i)[:2] for i in range(count)]
+        # Segment ids by start time, and those start times, for bisecting
+        self._order = array('I', sorted(range(count), key=lambda i: entries[i][0]))
+        self._starts = array('d', (entries[i][0] for i in self._order))
+        # Longest segment: how far before a window a segment overlapping it can start
+        self.longest = max((end - start for start, end in entries), default=0.0)
+        end = 0
+        if count:
+            offset = self._entry(count - 1)[2]
+            end = offset + RECORD.size + RECORD.unpack_from(self._map_log(), offset)[0]
+        if self._log_map is not None:
+            self._log_map.close()
+            self._log_map = None
+        self._log.truncate(end)
+
+        self._keywords.seek(0)
+        indexed = kept = 0
+        for line in self._keywords:
+            segment, *words = line.decode('utf-8', 'replace').split()
+            if not line.endswith(b'\n') or int(segment) != indexed or indexed >= count:
+                break
+            for term in words:
+                self.postings.setdefault(term, array('I')).append(indexed)
+            indexed += 1
+            kept += len(line)
+        self._keywords.truncate(kept)
+        for segment in range(indexed, count):  # Died between the index and the keyword write
+            self._add_terms(segment, self.segment(segment)['text'])
+        self._keywords.flush()
+
+    def _map_log(self):
+        size = self._size(self._log)
+        if self._log_map is None or len(self._log_map) < size:
+            if self._log_map is not None:
+                self._log_map.close()
+            self._log_map = mmap.mmap(self._log.fileno(), size, access=mmap.ACCESS_READ)
+        return self._log_map
+
+    def _map_index(self):
+        size = self.count * INDEX.size
+        if self._index_map is None or len(self._index_map) < size:
+            if self._index_map is not None:
+                self._index_map.close()
+            self._index.flush()
+            self._index_map = mmap.mmap(self._index.fileno(), size, access=mmap.ACCESS_READ)
+        return self._index_map
+
+    def _entry(self, i):
+        return INDEX.unpack_from(self._map_index(), i * INDEX.size)
+
+    def _add_terms(self, segment, text):
+        unique = sorted(set(terms(text)))
+        for term in unique:
+            self.postings.setdefault(term, array('I')).append(segment)
+        self._keywords.write(f"{segment} {' '.join(unique)}\n".encode())
+
+    def __len__(self):
+        return self.count
+
+    def append(self, text, start, end, words=None):
+        """Store a finished segment; `words` is [(word, start, end)] in epoch seconds. Returns its id."""
+        segment = self.count
+        if words is None:
+            words = spread_words(text, start, end)
+        record = json.dumps({'id': segment, 'start': start, 'end': end, 'text': text,
+                             'words': [list(word) for word in words]}).encode()
+        offset = self._size(self._log)
+        self._log.write(RECORD.pack(len(record)) + record)
+        self._log.flush()
+        self._index.write(INDEX.pack(start, end, offset))
+        self._index.flush()
+        self.count += 1
+        position = bisect.bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._order.insert(position, segment)
+        self.longest = max(self.longest, end - start)
+        self._add_terms(segment, text)
+        self._keywords.flush()
+        return segment
+
+    def segment(self, i):
+        """The stored record of segment `i` as a dict."""
+        offset = self._entry(i)[2]
+        log = self._map_log()
+        length = RECORD.unpack_from(log, offset)[0]
+        return json.loads(log[offset + RECORD.size:offset + RECORD.size + length])
+
+    def between(self, start, end):
+        """Segments overlapping [start, end] (epoch seconds), oldest first."""
+        first = bisect.bisect_left(self._starts, start - self.longest)
+        last = bisect.bisect_right(self._starts, end)
+        return [self.segment(i) for i in self._order[first:last] if self._entry(i)[1] >= start]
+
+    def search(self, query):
+        """Segments containing every term of `query`, with the matching words and their timestamps."""
+        wanted = terms(query)
+        if not wanted:
+            return []
+        postings = sorted((self.postings.get(term, array('I')) for term in set(wanted)), key=len)
+        ids = set(postings[0])
+        for other in postings[1:]:
+            ids.intersection_update(other)
+        results = []
+        for i in sorted(ids, key=lambda i: self._entry(i)[0]):
+            segment = self.segment(i)
+            segment['matches'] = [word for word in segment['words'] if terms(word[0]) and terms(word[0])[0] in wanted]
+            results.append(segment)
+        return results
+
+    def close(self):
+        for mapped in (self._log_map, self._index_map):
+            if mapped is not None:
+                mapped.close()
+        self._log_map = self._index_map = None
+        for f in (self._log, self._index, self._keywords):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _format(segment):
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(segment['start']))
+    return f"[{stamp}] {segment['text']}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query a transcript store")
+    parser.add_argument('directory', nargs='?', default='transcripts')
+    parser.add_argument('-s', '--search', type=str, help="Segments containing all of these words")
+    parser.add_argument('-l', '--last', type=float, help="Segments from the last N minutes")
+    args = parser.parse_args()
+
+    with TranscriptStore(args.directory) as store:
+        if args.search:
+            for segment in store.search(args.search):
+                times = ', '.join(time.strftime('%H:%M:%S', time.localtime(word[1])) for word in segment['matches'])
+                print(f"{_format(segment)}  ({times})")
+        else:
+            now = time.time()
+            since = now - args.last * 60 if args.last else 0.0
+            for segment in store.between(since, now):
+                print(_format(segment))
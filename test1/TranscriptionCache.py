@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TranscriptionCache:
+    """Content-addressed store of transcription results.
+
+    Entries are keyed by a SHA-256 of the audio plus the settings that change
+    the output (model, language, translate, ...). The audio is the PCM, or
+    its AudioEncoder.pcm_digest, not an encoded container, so the same
+    speech hits whatever format it was uploaded in. Results live in one
+    JSON file per key under `directory`, with an in-memory LRU of `max_entries`
+    in front. Files older than `max_age` seconds are dropped, and once the
+    directory grows past `max_bytes` the least recently used files go first.
+    """
+
+    def __init__(self, directory='cache', max_entries=256, max_bytes=64 * 1024 * 1024, max_age=30 * 24 * 3600, sweep_every=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_every = sweep_every
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(audio, **settings):
+        """Hash PCM or a PCM digest (bytes, memoryview or ndarray) together with the settings."""
+        digest = hashlib.sha256(memoryview(audio).cast('B'))
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the stored result for `key`, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and time.time() - entry['created'] <= self.max_age:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry['result']
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if time.time() - entry['created'] > self.max_age:
+            self._remove(path)
+            with self._lock:
+                self._memory.pop(key, None)
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Recency for the on-disk LRU
+        except FileNotFoundError:
+            # A concurrent sweep removed it after we read it: treat it as gone
+            with self._lock:
+                self._memory.pop(key, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self._remember(key, entry)
+            self.hits += 1
+        return entry['result']
+
+    def put(self, key, result):
+        """Store `result` under `key` in memory and on disk."""
+        entry = {'created': time.time(), 'result': result}
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+        with self._lock:
+            self._remember(key, entry)
+            self._puts += 1
+            sweep = self._puts % self.sweep_every == 0
+        if sweep:
+            self.sweep()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached result for `key`, calling `compute()` and storing it on a miss."""
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def sweep(self):
+        """Apply the age and size limits to the files on disk."""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Replaced or removed by a concurrent get/put
+            # get() rejects entries by creation time; here a file untouched for max_age is certainly stale.
+            if now - stat.st_mtime > self.max_age:
+                self._remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,140 @@
+import asyncio
+import functools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from Tracer import tracer
+
+API_URL = "https://api.openai.com/v1"
+
+
+class TranscriptionClient:
+    """Keep-alive HTTP client for the Whisper transcription endpoints.
+
+    One requests.Session with a connection pool sized to `max_in_flight` is
+    shared by every call, so consecutive uploads reuse warm TLS connections.
+    At most `max_in_flight` requests are on the wire at once, whether they come
+    from `transcribe`, `submit` or `atranscribe`. Connection errors and
+    retryable statuses are retried with full-jitter exponential backoff.
+    Point `base_url` at a local server to run against a stub. With a
+    TranscriptionCache, audio that was already transcribed with the same
+    settings is answered from the cache without a request.
+    """
+
+    RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(self, token, base_url=API_URL, max_in_flight=4, timeout=(5.0, 60.0), retries=3, backoff=0.5, max_backoff=8.0, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Authorization'] = f'Bearer {token}'
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='transcribe')
+
+    @staticmethod
+    def _decode(response):
+        """The JSON body of `response`, or an {'error': ...} dict for one that is not JSON (e.g. a proxy's error page)."""
+        if response.ok or 'json' in response.headers.get('Content-Type', ''):
+            try:
+                return response.json()
+            except ValueError:
+                pass
+        return {'error': {'message': response.text.strip() or response.reason, 'status': response.status_code}}
+
+    def transcribe(self, audio, filename='audio.wav', content_type='audio/wav', language='en', model='whisper-1', translate=False,
+                   prompt=None, word_timestamps=False, pcm_digest=None):
+        """Upload one segment and return the decoded JSON response.
+
+        `audio` is bytes, a memoryview or an open binary file; it is read once so
+        that retries resend the same payload. With `word_timestamps` the
+        response is verbose JSON with a 'words' list of {word, start, end}.
+        A failed request returns the API's error object, {'error': {...}}.
+        `pcm_digest` (from EncodedAudio) keys the cache on the audio itself
+        rather than on the container bytes.
+        """
+        if hasattr(audio, 'read'):
+            audio = audio.read()
+        params = {'model': model, 'language': language}
+        if prompt:
+            params['prompt'] = prompt
+        if word_timestamps:
+            params['response_format'] = 'verbose_json'
+            params['timestamp_granularities[]'] = 'word'
+        if self.cache is not None:
+            key = self.cache.key(audio if pcm_digest is None else pcm_digest, translate=translate, **params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        url = f"{self.base_url}/audio/translations" if translate else f"{self.base_url}/audio/transcriptions"
+        attempt = 0
+        while True:
+            try:
+                queued = time.monotonic()
+                with self._slots:
+                    tracer.record('upload_wait', time.monotonic() - queued)
+                    with tracer.span('upload', attempt=attempt):
+                        response = self.session.post(url, files={'file': (filename, audio, content_type)}, data=params, timeout=self.timeout)
+                if response.ok:
+                    result = self._decode(response)
+                    if self.cache is not None and 'error' not in result:
+                        self.cache.put(key, result)
+                    return result
+                if response.status_code not in self.RETRY_STATUSES or attempt >= self.retries:
+                    return self._decode(response)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+            attempt += 1
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def submit(self, audio, **kwargs):
+        """Start `transcribe` in the background and return a concurrent.futures.Future."""
+        return self._executor.submit(self.transcribe, audio, **kwargs)
+
+    async def atranscribe(self, audio, **kwargs):
+        """asyncio version of `transcribe`; runs on the client's worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self.transcribe, audio, **kwargs))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_client(token, **kwargs):
+    """Return one process-wide client per token and base URL.
+
+    The first call's keyword arguments configure it; later calls may pass
+    none, or the same ones, but different settings raise ValueError rather
+    than being ignored.
+    """
+    key = (token, kwargs.get('base_url', API_URL))
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = (TranscriptionClient(token, **kwargs), kwargs)
+        client, settings = _shared[key]
+        if kwargs and kwargs != settings:
+            raise ValueError(f"shared client already configured with {settings}, not {kwargs}")
+        return client
@@ -0,0 +1,124 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class VoiceActivityDetector:
+    """Energy / zero-crossing voice activity detector.
+
+    Audio is cut into fixed frames and every frame of a block is scored in one
+    NumPy pass. The noise floor is the minimum frame energy over the last
+    `floor_seconds` (minimum statistics), so it follows the room without a
+    calibration step. A frame is speech when it is `threshold_db` above that
+    floor and its zero-crossing rate is below `zcr_max` (broadband hiss crosses
+    zero on about every other sample, voiced speech far less often).
+
+    `process` is the streaming API: feed blocks of any size and get back the
+    (start, stop) sample ranges of segments that finished in that block.
+    Positions count samples since the last `reset`, so they line up with a
+    RingBuffer fed the same blocks. `segments` runs a whole array in one call.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=20, threshold_db=9.0, min_energy_db=-60.0,
+                 zcr_max=0.4, floor_seconds=3.0, hangover=0.5, preroll=0.3):
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, int(sample_rate * frame_ms / 1000))
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.zcr_max = zcr_max
+        self.floor_frames = max(1, int(floor_seconds * sample_rate / self.frame_length))
+        self.hangover_frames = int(hangover * sample_rate / self.frame_length)
+        self.preroll_frames = int(preroll * sample_rate / self.frame_length)
+        self.reset()
+
+    def reset(self):
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._energy_history = np.zeros(0, dtype=np.float32)
+        self._frame_index = 0
+        self._last_speech = -(self.hangover_frames + 1)
+        self._last_stop = 0
+        self.active = False
+        self.active_frames = 0
+        self.segment_start = None
+        self.noise_floor_db = None
+
+    @property
+    def speech_end(self):
+        """Sample position just after the last speech frame (before the hangover)."""
+        return max(0, (self._last_speech + 1) * self.frame_length)
+
+    def features(self, samples):
+        """Return per-frame energy (dBFS) and zero-crossing rate for whole frames of `samples`."""
+        samples = np.asarray(samples).reshape(-1)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        n = samples.size // self.frame_length
+        frames = samples[:n * self.frame_length].reshape(n, self.frame_length)
+        energy = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_length
+        return energy.astype(np.float32), zcr
+
+    def process(self, block):
+        """Feed a block of int16 or float samples and return the segments that ended in it."""
+        block = np.asarray(block).reshape(-1)
+        if block.dtype == np.int16:
+            block = block.astype(np.float32) / 32768.0
+        samples = np.concatenate((self._pending, block)) if self._pending.size else block
+        n = samples.size // self.frame_length
+        self._pending = samples[n * self.frame_length:].astype(np.float32)
+        if n == 0:
+            self.active_frames = 0
+            return []
+
+        energy, zcr = self.features(samples[:n * self.frame_length])
+
+        # Noise floor: trailing minimum over the history plus this block.
+        history = np.concatenate((self._energy_history, energy))
+        pad = self.floor_frames - 1 - self._energy_history.size
+        if pad > 0:
+            history = np.concatenate((np.full(pad, np.inf, dtype=np.float32), history))
+        floor = sliding_window_view(history, self.floor_frames).min(axis=1)[-n:]
+        self._energy_history = history[-(self.floor_frames - 1):] if self.floor_frames > 1 else history[:0]
+        self.noise_floor_db = float(floor[-1])
+
+        speech = (energy > floor + self.threshold_db) & (energy > self.min_energy_db) & (zcr <= self.zcr_max)
+
+        # Hangover: a frame stays active until `hangover_frames` after the last speech frame.
+        index = self._frame_index + np.arange(n)
+        last_speech = np.maximum.accumulate(np.where(speech, index, self._last_speech))
+        active = index - last_speech <= self.hangover_frames
+        self._last_speech = int(last_speech[-1])
+        self.active_frames = int(np.count_nonzero(active))
+
+        previous = np.concatenate(([self.active], active[:-1]))
+        edges = index[active != previous]
+        self._frame_index += n
+        self.active = bool(active[-1])
+
+        finished = []
+        for frame in edges:
+            if self.segment_start is None:
+                start = (frame - self.preroll_frames) * self.frame_length
+                self.segment_start = int(max(start, self._last_stop))
+            else:
+                stop = int(frame * self.frame_length)
+                finished.append((self.segment_start, stop))
+                self._last_stop = stop
+                self.segment_start = None
+        return finished
+
+    def flush(self):
+        """Close a segment that is still open at the end of the input."""
+        if self.segment_start is None:
+            return []
+        stop = self._frame_index * self.frame_length + self._pending.size
+        segment = (self.segment_start, stop)
+        self._last_stop = stop
+        self.segment_start = None
+        self.active = False
+        return [segment]
+
+    def segments(self, samples):
+        """Bulk API: reset, run a whole array through the detector and return all speech ranges."""
+        self.reset()
+        return self.process(samples) + self.flush()
@@ -1,17 +1,31 @@
 import argparse
-import datetime
+import contextlib
 import json
 import os
 import sys
-import wave
 import time
 import threading
 import queue
 
 import numpy as np
-import requests
 import sounddevice as sd
 
+from AudioEncoder import AudioEncoder, DEFAULT_FORMAT
+from ChunkedTranscriber import ChunkedTranscriber
+from MultiStream import AudioStream, MultiStreamTranscriber
+from PcmArchive import ArchiveWriter, PcmArchive, parse_time
+from Pipeline import Pipeline, Stage
+from RingBuffer import RingBuffer
+from SegmentQueue import SegmentInbox, SegmentQueue
+from Segmenter import Segmenter
+from Speculator import Speculator, combine
+from TranscriptionCache import TranscriptionCache
+from TerminalView import TerminalView
+from TranscriptionClient import shared_client
+from Tracer import tracer
+from TranscriptStore import TranscriptStore
+from VoiceActivityDetector import VoiceActivityDetector
+
 
 def int_or_str(text):
     """Helper function for argument parsing."""
@@ -21,97 +35,213 @@ def int_or_str(text):
         return text
 
 
-def audio_callback(indata, frames, time, status):
-    """This function will be called for each audio block."""
-    if status:
-        print(status, file=sys.stderr)
-    # Put the incoming audio data into a queue
-    audio_queue.put(indata.copy())
+def build_pipeline(ring, fs, threshold_db, silence_threshold, max_duration, client, encoder, language, model, translate, preroll=0.3, render=None, store=None, archive=None,
+                   speculator=None, segments=None):
+    """Capture -> VAD -> segment -> encode -> transcribe -> render, as queue-connected stages.
 
-def record_audio(volume_threshold, silence_threshold, fs, max_duration, record_queue):
-    """Record audio from the microphone and store segments in a queue."""
-    last_sound_time = datetime.datetime.now()
-    recording = False
-    myrecording = np.array([], dtype='int16')
+    The capture stage is the audio callback itself: it writes into `ring` and
+    offers the new head position to the first stage. Segments longer than
+    `max_duration` seconds are split. Finished segments wait for the encoder
+    in `segments`, a SegmentQueue (one with its default policy unless given):
+    putting into it never blocks, so a slow backend backs up there, where
+    segments are merged or dropped, instead of in front of the detector.
+    `render(future, count)` replaces the default printing of each finished
+    transcription of `count` merged segments. With a TranscriptStore as
+    `store`, every transcription is appended to it in order. With a
+    PcmArchive, or better an ArchiveWriter of one, as `archive`, which the
+    caller fills with the same blocks as `ring`, every detected utterance is
+    logged in its index. With a
+    Speculator on the same ring, uploads start once trailing silence begins
+    instead of after the whole `silence_threshold`.
+    """
+    vad = VoiceActivityDetector(fs, threshold_db=threshold_db, hangover=silence_threshold, preroll=preroll)
+    segmenter = Segmenter(ring, vad, min(int(max_duration * fs), ring.capacity // 2))
+    segments = segments if segments is not None else SegmentQueue(fs)
+    if speculator is not None:
+        segments.on_drop = lambda span: speculator.discard(*span)
+    # Both receive every block from here on, so their positions differ by a constant.
+    archive_offset = archive.head - ring.head if archive is not None else 0
 
-    try:
-        with sd.InputStream(callback=audio_callback, channels=1, samplerate=fs, dtype='int16'):
-            while True:
-                if not audio_queue.empty():
-                    data = audio_queue.get()
-                    volume_norm = np.linalg.norm(data) * 10
-                    current_time = datetime.datetime.now()
-
-                    if volume_norm > volume_threshold:
-                        last_sound_time = current_time
-                        if not recording:
-                            recording = True
-                            print("\nRecording started")
-
-                    if recording:
-                        myrecording = np.append(myrecording, data.flatten())
-                        sys.stdout.write('▒')
-                        sys.stdout.flush()
-
-                    if (current_time - last_sound_time).total_seconds() > silence_threshold and recording:
-                        record_queue.put(myrecording)
-                        myrecording = np.array([], dtype='int16')  # Reset recording
-                        recording = False
-                        print("\nRecording stopped due to silence.")
-
-                    if (current_time - last_sound_time).total_seconds() >= max_duration:
-                        break
+    def detect(block_stop):
+        event = segmenter.detect(block_stop)
+        if archive is not None:
+            for start, stop in event[1]:
+                archive.mark(start + archive_offset, stop + archive_offset)
+        if speculator is not None:
+            speculator.observe(*event, segmenter.speech_end, vad.hangover_frames * vad.frame_length)
+        return event
+
+    # Epoch (start, end) of the audio behind each upload and how many segments it holds, for the store.
+    heard = {}
+
+    def epoch(position):
+        return time.time() - (ring.head - position) / fs
+
+    def encode(batch):
+        if not batch.segments:
+            return None
+        # A speculator encodes for itself, and only what it has not sent already.
+        # The queue may have downsampled it under pressure: encode it at the rate it has now.
+        payload = None if speculator is not None else encoder.encode(batch.data, batch.sample_rate)
+        return batch, payload, epoch(batch.spans[0][0]), epoch(batch.spans[-1][1])
+
+    def transcribe(item):
+        batch, payload, start, end = item
+        print("Transcribing recorded audio...")
+        if speculator is None:
+            future = client.submit(payload.data, filename=payload.filename, content_type=payload.content_type,
+                                   language=language, model=model, translate=translate, pcm_digest=payload.pcm_digest)
+        elif batch.segments == 1:
+            future = speculator.take(*batch.spans[0])
+        else:
+            # Merged in the queue: one result stitched from each segment's own
+            pieces, offset = [], 0
+            for span_start, span_stop in batch.spans:
+                pieces.append((offset, speculator.take(span_start, span_stop)))
+                offset += span_stop - span_start
+            future = combine(pieces, fs)
+        heard[future] = (start, end, batch.segments)
+        return future
+
+    def finish(future):
+        start, end, count = heard.pop(future)
+        if render is not None:
+            render(future, count)
+        else:
+            print_transcription(future)
+        if store is not None and not future.exception():
+            store_result(store, future.result(), start, end)
+
+    return Pipeline([
+        Stage('vad', detect, capacity=256),
+        Stage('segment', segmenter.cut_ranges, flatten=True, on_stop=segmenter.flush_ranges),
+        Stage('encode', encode, inbox=SegmentInbox(segments, ring)),
+        # Uploads run concurrently inside the client; this bound caps how many are outstanding.
+        Stage('transcribe', transcribe, capacity=4),
+        Stage('render', finish, capacity=4),
+    ])
 
+
+def transcribe_devices(devices, fs, client, encoder, threshold_db, silence_threshold, max_duration, language, model, translate, seconds, store=None):
+    """Capture several input devices at once and share one fairly scheduled transcription backend.
+
+    Each device gets its own ring buffer, detector and segmenter; all of them
+    run on a single scheduler thread whatever their number.
+    """
+    streams = [AudioStream(str(device), fs, threshold_db, silence_threshold, max_duration, device=int_or_str(device)) for device in devices]
+    lock = threading.Lock()
+
+    def on_result(stream, result, start, end):
+        with lock:
+            print(f"[{stream.name}] {result.get('text', '').strip()}")
+            if store is not None:
+                store_result(store, result, start, end)
+
+    transcriber = MultiStreamTranscriber(streams, client, encoder, on_result, language=language, model=model, translate=translate).start()
+    try:
+        with contextlib.ExitStack() as inputs:
+            for stream in streams:
+                inputs.enter_context(sd.InputStream(device=stream.device, callback=transcriber.callback(stream), channels=1, samplerate=fs, dtype='int16'))
+            print(f"Listening on {len(streams)} devices...")
+            time.sleep(seconds)
     except KeyboardInterrupt:
         print("\nRecording stopped: KeyboardInterrupt")
-    except Exception as e:
-        print(f"\nAn error occurred: {e}")
-
-    if myrecording.size > 0:
-        record_queue.put(myrecording)  # Ensure last recording is added to the queue
+    transcriber.stop()  # Flush every open segment and wait for the last uploads
+    print(json.dumps(transcriber.stats(), indent=4))
 
 
-def save_and_transcribe(record_queue, token, language, model, translate, fs):
-    """Save and transcribe recordings from a queue."""
+def wait_for_positions(positions):
+    """Block until a position is queued, then take every one already there."""
+    items = [positions.get()]
     while True:
-        data = record_queue.get()
-        if data is None:
-            break  # Stop the thread if None is received
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"output_{timestamp}.wav"
-        save_wave_file(filename, data, fs)
-        print("Transcribing recorded audio...")
-        transcribe_audio(filename, token, language, model, translate)
+        try:
+            items.append(positions.get_nowait())
+        except queue.Empty:
+            return items
+
 
+def transcribe_chunks(fs, client, encoder, chunk_seconds, overlap, threshold_db, silence_threshold, language, model, translate, seconds, store=None):
+    """Stream fixed, overlapping chunks while capture continues, showing text about one chunk after it is spoken.
 
-def save_wave_file(filename, data, fs):
-    """Save a numpy array to a WAV file."""
-    if data.size > 0:
-        wavfile = wave.open(filename, 'wb')
-        wavfile.setnchannels(1)
-        wavfile.setsampwidth(2)  # 2 bytes per sample
-        wavfile.setframerate(fs)
-        wavfile.writeframes(data.tobytes())
-        wavfile.close()
-        print(f"File saved: {filename}")
+    Lines break where the speaker paused for `silence_threshold`; each finished
+    line is appended to `store` with its word timestamps.
+    """
+    ring = RingBuffer(int(600 * fs))
+    positions = queue.Queue()
+    view = TerminalView()
+    lines = [[]]
+
+    def store_line(line):
+        if store is not None and line:
+            store.append(''.join(w['word'] for w in line).strip(), line[0]['start'], line[-1]['end'],
+                         [(w['word'].strip(), w['start'], w['end']) for w in line])
+
+    def on_words(words, provisional):
+        for word in words:
+            if lines[-1] and word['start'] - lines[-1][-1]['end'] >= silence_threshold:
+                store_line(lines[-1])
+                lines.append([])
+            lines[-1].append(word)
+        with tracer.span('render'):
+            text = [''.join(w['word'] for w in line).strip() for line in lines]
+            text[-1] = (text[-1] + ' ' + ''.join(w['word'] for w in provisional).strip()).strip()
+            view.update(text)
+
+    chunker = ChunkedTranscriber(ring, fs, client, encoder, on_words, chunk_seconds=chunk_seconds, overlap=overlap,
+                                 threshold_db=threshold_db, language=language, model=model, translate=translate)
+
+    def audio_callback(indata, frames, time, status):
+        if status:
+            print(status, file=sys.stderr)
+        with tracer.span('capture'):
+            positions.put(ring.write(indata))
+
+    def feed():
+        # Blocks queued while a chunk was being encoded are taken in one go: only the newest position matters.
+        while True:
+            heads = wait_for_positions(positions)
+            live = [head for head in heads if head is not None]
+            if live:
+                chunker.feed(live[-1])
+            if None in heads:
+                return
+
+    worker = threading.Thread(target=feed, daemon=True)
+    worker.start()
+    try:
+        with sd.InputStream(callback=audio_callback, channels=1, samplerate=fs, dtype='int16'):
+            time.sleep(seconds)
+    except KeyboardInterrupt:
+        print("\nRecording stopped: KeyboardInterrupt")
+    positions.put(None)
+    worker.join()
+    chunker.flush()
+    store_line(lines[-1])
+    print(json.dumps(chunker.stats(), indent=4))
+
+
+def store_result(store, result, start, end):
+    """Append an API result to a TranscriptStore, using its word timestamps when it has them."""
+    text = result.get('text', '').strip()
+    if text:
+        words = [(w['word'], start + w['start'], start + w['end']) for w in result.get('words', [])]
+        store.append(text, start, end, words or None)
+
+
+def print_transcription(future):
+    """Print the result of a finished upload."""
+    try:
+        result = future.result()
+        with tracer.span('render'):
+            print(json.dumps(result, indent=4))
+    except Exception as e:
+        print(f"\nTranscription failed: {e}")
 
 
 def transcribe_audio(file_path, token, language='en', model='whisper-1', translate=False):
     """Transcribe audio using OpenAI's Whisper API."""
-    headers = {
-        'Authorization': f'Bearer {token}'
-    }
-    params = {
-        'model': model,
-        'language': language
-    }
-    files = {
-        'file': open(file_path, 'rb')
-    }
-    url = "https://api.openai.com/v1/audio/translations" if translate else "https://api.openai.com/v1/audio/transcriptions"
-
-    response = requests.post(url, headers=headers, files=files, data=params)
-    transcription = response.json()
+    with open(file_path, 'rb') as audio_file:
+        transcription = shared_client(token).transcribe(audio_file, filename=os.path.basename(file_path), language=language, model=model, translate=translate)
     print(json.dumps(transcription, indent=4))
     return transcription
 
@@ -119,24 +249,101 @@ def transcribe_audio(file_path, token, language='en', model='whisper-1', transla
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Whisper API Audio Recorder and Transcriber")
     parser.add_argument('-d', '--duration', type=float, default=45.0, help="Maximum duration of the recording in seconds")
-    parser.add_argument('-v', '--volume', type=float, default=1.0, help="Volume threshold percentage")
+    parser.add_argument('-td', '--threshold-db', type=float, default=9.0, help="Speech threshold in dB above the adaptive noise floor")
+    # The old linear threshold has no dB equivalent: refuse it rather than reinterpret it
+    parser.add_argument('-v', '--volume', type=float, default=None, help=argparse.SUPPRESS)
     parser.add_argument('-s', '--silence', type=float, default=1.5, help="Silence length to trigger recording stop")
     parser.add_argument('-t', '--token', type=str, required=False, default=os.getenv('OPENAI_API_KEY'), help="OpenAI API token")
     parser.add_argument('-l', '--language', type=str, default='en', help="Language for transcription")
     parser.add_argument('-m', '--model', type=str, default='whisper-1', help="Model type for Whisper API")
     parser.add_argument('-tr', '--translate', action='store_true', help="Translate transcription to English")
+    parser.add_argument('-fmt', '--format', type=str, default=DEFAULT_FORMAT, choices=sorted(AudioEncoder.FORMATS), help="Container used for uploads")
+    parser.add_argument('-ur', '--upload-rate', type=int, default=16000, help="Sample rate segments are resampled to before upload")
+    parser.add_argument('-a', '--archive', type=str, default=None, help="Directory to keep a copy of every uploaded segment in")
+    parser.add_argument('-pa', '--pcm-archive', type=str, default=None, help="Directory of an always-on, rotating archive of everything captured")
+    parser.add_argument('-rp', '--replay', type=parse_time, nargs=2, default=None, metavar=('FROM', 'TO'),
+                        help="Run the archived audio between two times (ISO, or -N for N seconds ago) through the pipeline instead of the microphone")
+    parser.add_argument('-rs', '--replay-speed', type=float, default=1.0, help="Replay pace relative to real time")
+    parser.add_argument('-c', '--cache', type=str, default='cache', help="Directory for cached transcriptions (empty to disable)")
+    parser.add_argument('-ts', '--transcript', type=str, default='transcripts', help="Directory of the searchable transcript store (empty to disable)")
+    parser.add_argument('-tf', '--trace', type=str, default=None, help="Append one JSON line per timed stage to this file")
+    parser.add_argument('-mf', '--metrics', type=str, default=None, help="Keep per-stage latency histograms in this file (Prometheus text format)")
+    parser.add_argument('-tl', '--target-lag', type=float, default=5.0, help="Once a segment has waited this long for the API, merge it with the ones queued after it")
+    parser.add_argument('-mb', '--max-backlog', type=float, default=120.0, help="Seconds of audio waiting for the API before the oldest segments are dropped")
+    parser.add_argument('-sp', '--speculate', type=float, default=0, help="Start uploading after this much trailing silence instead of the full --silence (0 disables)")
+    parser.add_argument('-sm', '--speculate-merge', action='store_true', help="When speech resumes after a speculative upload, keep its text and upload only the rest")
+    parser.add_argument('-cs', '--chunk-seconds', type=float, default=0, help="Stream fixed chunks of this length instead of waiting for the end of each utterance")
+    parser.add_argument('-ov', '--overlap', type=float, default=1.0, help="Seconds each streamed chunk overlaps the previous one")
+    parser.add_argument('-D', '--devices', type=str, default=None, help="Comma-separated input devices (numbers or name substrings) to capture concurrently")
+    parser.add_argument('-L', '--list-devices', action='store_true', help="Show the available audio devices and exit")
     parser.add_argument('-to', '--timeout', type=float, required=False, default=2, help="Timeout in minutes after which the script ends")
     args = parser.parse_args()
+    if args.volume is not None:
+        parser.error("--volume (a linear volume threshold) has been replaced by --threshold-db, the speech threshold in dB above the adaptive noise floor")
+
+    if args.list_devices:
+        print(sd.query_devices())
+        sys.exit(0)
 
     fs = 44100  # Sample rate
-    record_queue = queue.Queue()
+    if args.trace or args.metrics:
+        tracer.enable(args.trace, args.metrics)
+    client = shared_client(args.token, cache=TranscriptionCache(args.cache) if args.cache else None)
+    encoder = AudioEncoder(fs, format=args.format, archive_dir=args.archive, target_rate=args.upload_rate)
+    store = TranscriptStore(args.transcript) if args.transcript else None
+    try:
+        archive = PcmArchive(args.pcm_archive or 'pcm_archive', sample_rate=fs) if args.pcm_archive or args.replay else None
+    except ValueError as e:
+        parser.error(str(e))
 
-    record_thread = threading.Thread(target=record_audio, args=(args.volume, args.silence, fs, args.duration, record_queue), daemon=True)
-    transcribe_thread = threading.Thread(target=save_and_transcribe, args=(record_queue, args.token, args.language, args.model, args.translate, fs), daemon=True)
+    if args.chunk_seconds:
+        transcribe_chunks(fs, client, encoder, args.chunk_seconds, args.overlap, args.threshold_db, args.silence,
+                          args.language, args.model, args.translate, args.timeout * 60, store=store)
+    elif args.devices:
+        transcribe_devices(args.devices.split(','), fs, client, encoder, args.threshold_db, args.silence, args.duration,
+                           args.language, args.model, args.translate, args.timeout * 60, store=store)
+    else:
+        ring = RingBuffer(int(600 * fs))
+        # A replayed window is already archived, and its transcript already stored.
+        # Written from a thread of its own: the capture callback only copies the block.
+        recording = ArchiveWriter(archive) if not args.replay else None
+        speculator = None
+        if args.speculate:
+            speculator = Speculator(ring, fs, client, encoder, min_silence=args.speculate, merge=args.speculate_merge,
+                                    language=args.language, model=args.model, translate=args.translate)
+        segments = SegmentQueue(fs, target_lag=args.target_lag, max_seconds=args.max_backlog)
+        pipeline = build_pipeline(ring, fs, args.threshold_db, args.silence, args.duration, client, encoder, args.language, args.model, args.translate,
+                                  store=store if not args.replay else None, archive=recording, speculator=speculator, segments=segments).start()
 
-    record_thread.start()
-    transcribe_thread.start()
+        def audio_callback(indata, frames, time, status):
+            """Capture stage: store the block and wake the VAD stage."""
+            if status:
+                print(status, file=sys.stderr)
+            # Positions are cumulative, so if this one is dropped the next one still covers its samples.
+            with tracer.span('capture'):
+                if recording is not None:
+                    recording.write(indata)
+                pipeline.offer(ring.write(indata))
 
-    time.sleep(args.timeout * 60)  # Run the script for the timeout duration
-    record_queue.put(None)  # Signal the transcription thread to stop
-    transcribe_thread.join()  # Ensure transcription thread has completed
+        try:
+            if args.replay:
+                # Paced, so segments are uploaded before the ring wraps over them.
+                archive.replay(*args.replay, audio_callback, blocksize=1024, speed=args.replay_speed)
+            else:
+                with sd.InputStream(callback=audio_callback, channels=1, samplerate=fs, dtype='int16'):
+                    time.sleep(args.timeout * 60)  # Run the script for the timeout duration
+        except KeyboardInterrupt:
+            print("\nRecording stopped: KeyboardInterrupt")
+        pipeline.stop()  # Flush the open segment and wait for the last uploads
+        if recording is not None:
+            recording.close()
+        print(json.dumps(dict(segments.stats(), dropped_blocks=pipeline.dropped), indent=4))
+        if speculator is not None:
+            print(json.dumps(speculator.stats(), indent=4))
+    if archive is not None:
+        archive.close()
+    if store is not None:
+        store.close()
+    if tracer.enabled:
+        print(json.dumps(tracer.summary(), indent=4))
+        tracer.close()
@@ -0,0 +1,67 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from RingBuffer import RingBuffer
+
+
+def bench_ring(seconds, fs, blocksize, checkpoints):
+    """Time RingBuffer.write for every block of a long utterance."""
+    ring = RingBuffer(int(seconds * fs) + blocksize)
+    block = (np.random.randn(blocksize) * 3000).astype('int16')
+    nblocks = int(seconds * fs / blocksize)
+    costs = np.empty(nblocks)
+    for i in range(nblocks):
+        t0 = time.perf_counter()
+        ring.write(block)
+        costs[i] = time.perf_counter() - t0
+    segment = ring.segment(0)
+    assert segment.nbytes == nblocks * blocksize * 2
+    return summarize(costs, fs, blocksize, checkpoints)
+
+
+def bench_append(seconds, fs, blocksize, checkpoints):
+    """Time the old np.append growth for comparison."""
+    data = np.array([], dtype='int16')
+    block = (np.random.randn(blocksize) * 3000).astype('int16')
+    nblocks = int(seconds * fs / blocksize)
+    costs = np.empty(nblocks)
+    for i in range(nblocks):
+        t0 = time.perf_counter()
+        data = np.append(data, block)
+        costs[i] = time.perf_counter() - t0
+    return summarize(costs, fs, blocksize, checkpoints)
+
+
+def summarize(costs, fs, blocksize, checkpoints):
+    """Mean per-block cost (microseconds) over a window around each checkpoint."""
+    result = {}
+    window = max(1, int(fs / blocksize))  # about one second of blocks
+    for seconds in checkpoints:
+        i = int(seconds * fs / blocksize)
+        if i > costs.size:
+            continue
+        chunk = costs[max(0, i - window):i]
+        result[f"{seconds:g}s"] = round(float(chunk.mean()) * 1e6, 2)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-block cost of the capture buffer over a long utterance")
+    parser.add_argument('-d', '--duration', type=float, default=600.0, help="Utterance length in seconds")
+    parser.add_argument('-r', '--rate', type=int, default=44100, help="Sample rate")
+    parser.add_argument('-b', '--blocksize', type=int, default=1024, help="Frames per callback block")
+    parser.add_argument('-a', '--append-duration', type=float, default=60.0, help="Utterance length for the np.append baseline (0 to skip)")
+    args = parser.parse_args()
+
+    checkpoints = [1, 10, 30, 60, 120, 300, 600]
+    report = {
+        'blocksize': args.blocksize,
+        'rate': args.rate,
+        'ring_us_per_block': bench_ring(args.duration, args.rate, args.blocksize, [c for c in checkpoints if c <= args.duration]),
+    }
+    if args.append_duration > 0:
+        report['append_us_per_block'] = bench_append(args.append_duration, args.rate, args.blocksize, [c for c in checkpoints if c <= args.append_duration])
+    print(json.dumps(report, indent=4))
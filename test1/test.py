@@ -3,11 +3,12 @@ import os
 from AudioRecorder import AudioRecorder
 from Transcriber import Transcriber
 from Application import Application
+from TranscriptionCache import TranscriptionCache
 
 def main():
     token = os.getenv('OPENAI_API_KEY', 'your_default_token_here')
     recorder = AudioRecorder()
-    transcriber = Transcriber(token=token)
+    transcriber = Transcriber(token=token, cache=TranscriptionCache('cache'))
 
     app = Application(recorder, transcriber)
     app.start()
@@ -1,26 +1,104 @@
 #! python3.7
 
 import argparse
+import json
 import os
+import time
 import numpy as np
 import speech_recognition as sr
-import requests
 from datetime import datetime, timedelta
-from queue import Queue
-from time import sleep
+import sys
 from sys import platform
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test1'))
+from AudioEncoder import encode_wav, pcm_digest
+from SegmentQueue import SegmentQueue
+from TranscriptionCache import TranscriptionCache
+from TranscriptionClient import shared_client
+from TerminalView import TerminalView
+from Tracer import tracer
+from TranscriptStore import TranscriptStore
+from VoiceActivityDetector import VoiceActivityDetector
+
+
+def transcription_loop(data_queue, client, phrase_timeout, transcription, render=None, store=None):
+    """Transcribe 16 kHz PCM chunks from a SegmentQueue into `transcription` until it is closed.
+
+    `render(transcription)` is called after every update (by default a
+    TerminalView redraws the changed lines). Finished lines are appended to
+    `store`, a TranscriptStore, with the epoch times of their audio.
+    """
+    render = render or TerminalView().update
+    phrase_time = None
+    line_span = None
+    try:
+        while True:
+            # Block until the recorder hands over audio; whatever queued up meanwhile comes merged.
+            batch = data_queue.get()
+            if batch is None:
+                return transcription
+            if batch.segments:
+                now = datetime.utcnow()
+                phrase_time = phrase_time or now
+                phrase_complete = now - phrase_time > timedelta(seconds=phrase_timeout)
+                phrase_time = now
+
+                audio_data = batch.data
+                # int16 mono: 2 bytes per sample of audio that ended just now.
+                heard = time.time()
+                heard_from = heard - len(audio_data) / (2 * batch.sample_rate)
+
+                # The callback hands us headerless PCM; wrap it in a real WAV container.
+                pcm = np.frombuffer(audio_data, dtype=np.int16)
+                with tracer.span('encode', format='wav'):
+                    wav = encode_wav(pcm, batch.sample_rate)
+                try:
+                    result = client.transcribe(wav, language=None, pcm_digest=pcm_digest(pcm, batch.sample_rate))
+                except Exception as e:
+                    # One failed request costs this chunk, not the session
+                    print(f"\nTranscription failed: {e}", file=sys.stderr)
+                    continue
+                text = result.get('text', '').strip()
+
+                if phrase_complete:
+                    if store is not None and transcription[-1] and line_span:
+                        store.append(transcription[-1], *line_span)
+                    transcription.append(text)
+                    line_span = [heard_from, heard]
+                else:
+                    transcription[-1] = text
+                    line_span = [line_span[0] if line_span else heard_from, heard]
+
+                with tracer.span('render'):
+                    render(transcription)
+    finally:
+        # Whatever was said last is kept even when the loop is interrupted.
+        if store is not None and transcription[-1] and line_span:
+            store.append(transcription[-1], *line_span)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--api_key", required=False, default=os.getenv('OPENAI_API_KEY'), help="OpenAI API Key for accessing the API")
     parser.add_argument("--energy_threshold", default=1000, type=int, help="Energy level for mic to detect.")
+    parser.add_argument("--vad_threshold", default=9.0, type=float, help="dB above the adaptive noise floor for a chunk to be transcribed.")
+    parser.add_argument("--cache", default='cache', type=str, help="Directory for cached transcriptions (empty to disable).")
     parser.add_argument("--record_timeout", default=2, type=float, help="Real-time recording update interval in seconds.")
     parser.add_argument("--phrase_timeout", default=3, type=float, help="Pause duration to consider before stopping recording.")
+    parser.add_argument("--max_backlog", default=60, type=float, help="Seconds of untranscribed audio kept queued before the oldest is dropped.")
+    parser.add_argument("--downsample", action='store_true', help="Queue chunks at 8 kHz once half the backlog is used, to shrink uploads.")
+    parser.add_argument("--transcript", default='transcripts', type=str, help="Directory of the searchable transcript store finished lines are appended to (empty to disable).")
+    parser.add_argument("--trace", default=None, type=str, help="Append one JSON line per timed stage to this file.")
+    parser.add_argument("--metrics", default=None, type=str, help="Keep per-stage latency histograms in this file (Prometheus text format).")
     if 'linux' in platform:
         parser.add_argument("--default_microphone", default='pulse', type=str, help="Default microphone name for SpeechRecognition.")
     args = parser.parse_args()
+    if args.trace or args.metrics:
+        tracer.enable(args.trace, args.metrics)
 
-    data_queue = Queue()
+    # Bounded: a slow API merges, then drops, the oldest chunks instead of letting the transcript fall behind.
+    data_queue = SegmentQueue(16000, target_lag=0, max_seconds=args.max_backlog, pressure_rate=8000 if args.downsample else None,
+                              pressure_seconds=args.max_backlog / 2)
     recorder = sr.Recognizer()
     recorder.energy_threshold = args.energy_threshold
     recorder.dynamic_energy_threshold = False
@@ -41,58 +119,38 @@ def main():
     with source:
         recorder.adjust_for_ambient_noise(source)
 
+    vad = VoiceActivityDetector(16000, threshold_db=args.vad_threshold)
+
     def record_callback(_, audio: sr.AudioData):
-        data_queue.put(audio.get_raw_data())
+        data = audio.get_raw_data()
+        with tracer.span('vad'):
+            vad.process(np.frombuffer(data, dtype=np.int16))
+        if vad.active_frames:
+            data_queue.put(data)
 
     recorder.listen_in_background(source, record_callback, phrase_time_limit=args.record_timeout)
     print("Model loaded.\n")
 
+    client = shared_client(args.api_key, cache=TranscriptionCache(args.cache) if args.cache else None)
     transcription = ['']
 
-    while True:
-        try:
-            if not data_queue.empty():
-                now = datetime.utcnow()
-                phrase_time = now if 'phrase_time' not in locals() else phrase_time
-                phrase_complete = now - phrase_time > timedelta(seconds=args.phrase_timeout)
-                phrase_time = now
-
-                audio_data = b''.join(list(data_queue.queue))
-                data_queue.queue.clear()
-
-                headers = {
-                    'Authorization': f'Bearer {args.api_key}',
-                    'Content-Type': 'application/json',
-                }
-
-                response = requests.post(
-                    'https://api.openai.com/v1/audio/transcriptions',
-                    headers=headers,
-                    files={'file': ('audio.wav', audio_data, 'audio/wav')}
-                )
-
-                result = response.json()
-                text = result.get('text', '').strip()
-
-                if phrase_complete:
-                    transcription.append(text)
-                else:
-                    transcription[-1] = text
-
-                os.system('cls' if os.name == 'nt' else 'clear')
-                for line in transcription:
-                    print(line)
-                print('', end='', flush=True)
-
-            else:
-                sleep(0.25)
+    store = TranscriptStore(args.transcript) if args.transcript else None
 
-        except KeyboardInterrupt:
-            break
+    try:
+        transcription_loop(data_queue, client, args.phrase_timeout, transcription, store=store)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
 
+    print(json.dumps(data_queue.stats(), indent=4))
     print("\n\nTranscription:")
     for line in transcription:
         print(line)
+    if tracer.enabled:
+        print(json.dumps(tracer.summary(), indent=4))
+        tracer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+import string
+
+import numpy as np
+
+
+def _normalize(word):
+    return word.strip().lower().strip(string.punctuation)
+
+
+class IncrementalTranscriber:
+    """Sliding-window wrapper around a Whisper model for one phrase at a time.
+
+    Only the audio after the last committed word (plus `overlap` seconds of
+    context) is sent to the model on each tick. A word is committed once two
+    consecutive hypotheses agree on it, and the committed text is passed back
+    as the prompt so the model keeps its context without re-decoding it.
+    """
+
+    def __init__(self, model, sample_rate=16000, window=15.0, overlap=0.5, prompt_words=40, **decode_options):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.window = window
+        self.overlap = overlap
+        self.prompt_words = prompt_words
+        self.decode_options = decode_options
+        self.reset()
+
+    def reset(self):
+        # Absolute time (seconds since phrase start) of the first sample in `audio`.
+        self.offset = 0.0
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.committed = []
+        self.committed_end = 0.0
+        self.hypothesis = []
+
+    @property
+    def text(self):
+        return ''.join(word['word'] for word in self.committed + self.hypothesis).strip()
+
+    def feed(self, audio_np):
+        """Add new float32 samples, re-decode the uncommitted tail and return the phrase so far."""
+        self.audio = np.concatenate((self.audio, audio_np))
+        prompt = ''.join(word['word'] for word in self.committed[-self.prompt_words:]).strip()
+        result = self.model.transcribe(self.audio, word_timestamps=True, initial_prompt=prompt or None,
+                                       condition_on_previous_text=False, **self.decode_options)
+
+        words = []
+        for segment in result['segments']:
+            for word in segment.get('words', []):
+                start = self.offset + word['start']
+                end = self.offset + word['end']
+                # Words inside the overlap were already committed on a previous tick.
+                if end <= self.committed_end + 0.05:
+                    continue
+                words.append({'word': word['word'], 'start': start, 'end': end})
+
+        agreed = 0
+        for new, old in zip(words, self.hypothesis):
+            if _normalize(new['word']) != _normalize(old['word']):
+                break
+            agreed += 1
+
+        duration = self.audio.size / self.sample_rate
+        if duration > self.window:
+            # The tail is about to be cut back to the window: commit whatever starts before the cut.
+            horizon = self.offset + duration - self.window + self.overlap
+            while agreed < len(words) and words[agreed]['start'] < horizon:
+                agreed += 1
+
+        if agreed:
+            self.committed.extend(words[:agreed])
+            self.committed_end = words[agreed - 1]['end']
+            words = words[agreed:]
+        self.hypothesis = words
+        self._trim()
+        return self.text
+
+    def finish(self):
+        """Commit the current hypothesis and return the full phrase, then start a new one."""
+        text = self.text
+        self.reset()
+        return text
+
+    def _trim(self):
+        keep_from = max(self.offset, self.committed_end - self.overlap)
+        duration = self.audio.size / self.sample_rate
+        # Never let the tail grow past the window, even if the model never agrees.
+        keep_from = max(keep_from, self.offset + duration - self.window)
+        drop = int((keep_from - self.offset) * self.sample_rate)
+        if drop > 0:
+            self.audio = self.audio[drop:]
+            self.offset += drop / self.sample_rate
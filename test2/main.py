@@ -4,14 +4,25 @@ import argparse
 import os
 import numpy as np
 import speech_recognition as sr
-import whisper
-import torch
 
+import json
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from queue import Queue
-from time import sleep
+import sys
 from sys import platform
 
+from incremental import IncrementalTranscriber
+from scheduler import BatchScheduler, print_batch
+from whisper_daemon import WhisperClient
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test1'))
+from SegmentQueue import SegmentQueue
+from TranscriptionCache import TranscriptionCache
+from TerminalView import TerminalView
+from Tracer import tracer
+from TranscriptStore import TranscriptStore
+from VoiceActivityDetector import VoiceActivityDetector
 
 def main():
     parser = argparse.ArgumentParser()
@@ -21,21 +32,53 @@ def main():
                         help="Don't use the english model.")
     parser.add_argument("--energy_threshold", default=1000,
                         help="Energy level for mic to detect.", type=int)
+    parser.add_argument("--vad_threshold", default=9.0,
+                        help="dB above the adaptive noise floor for a chunk to be transcribed.", type=float)
     parser.add_argument("--record_timeout", default=2,
                         help="How real time the recording is in seconds.", type=float)
     parser.add_argument("--phrase_timeout", default=3,
                         help="How much empty space between recordings before we "
                              "consider it a new line in the transcription.", type=float)
+    parser.add_argument("--cache", default='cache', type=str,
+                        help="Directory for cached transcriptions (empty to disable).")
+    parser.add_argument("--daemon", default=None,
+                        help="Unix socket of a running whisper_daemon.py to use instead of loading the model here. "
+                             "Pass the same --model the daemon was started with so cache keys match.")
+    parser.add_argument("--workers", default=0, type=int,
+                        help="Decode batched segments in this many CPU worker processes (0 to decode inline).")
+    parser.add_argument("--threads_per_worker", default=None, type=int,
+                        help="Torch threads pinned per worker process (default: cores / workers).")
+    parser.add_argument("--batch_size", default=8, type=int,
+                        help="Most segments decoded together in one worker batch.")
+    parser.add_argument("--incremental", action='store_true',
+                        help="Only re-decode the uncommitted tail of the phrase on each update.")
+    parser.add_argument("--window", default=15, type=float,
+                        help="Longest uncommitted tail, in seconds, decoded in incremental mode.")
+    parser.add_argument("--overlap", default=0.5, type=float,
+                        help="Seconds of already committed audio kept as context in incremental mode.")
+    parser.add_argument("--max_backlog", default=60, type=float,
+                        help="Seconds of undecoded audio kept queued before the oldest is dropped.")
+    parser.add_argument("--transcript", default='transcripts', type=str,
+                        help="Directory of the searchable transcript store finished lines are appended to (empty to disable).")
+    parser.add_argument("--trace", default=None, type=str,
+                        help="Append one JSON line per timed stage to this file.")
+    parser.add_argument("--metrics", default=None, type=str,
+                        help="Keep per-stage latency histograms in this file (Prometheus text format).")
     if 'linux' in platform:
         parser.add_argument("--default_microphone", default='pulse',
                             help="Default microphone name for SpeechRecognition. "
                                  "Run this with 'list' to view available Microphones.", type=str)
     args = parser.parse_args()
+    if args.trace or args.metrics:
+        tracer.enable(args.trace, args.metrics)
+    if args.workers and (args.incremental or args.daemon):
+        parser.error("--workers cannot be combined with --incremental or --daemon")
 
     # The last time a recording was retrieved from the queue.
     phrase_time = None
-    # Thread safe Queue for passing data from the threaded recording callback.
-    data_queue = Queue()
+    # Bounded, thread safe queue for passing data from the threaded recording callback.
+    # Everything queued while the model was busy comes out merged; past the backlog the oldest audio is dropped.
+    data_queue = SegmentQueue(16000, target_lag=0, max_seconds=args.max_backlog)
     # We use SpeechRecognizer to record our audio because it has a nice feature where it can detect when speech ends.
     recorder = sr.Recognizer()
     recorder.energy_threshold = args.energy_threshold
@@ -63,16 +106,45 @@ def main():
     model = args.model
     if args.model != "large" and not args.non_english:
         model = model + ".en"
-    audio_model = whisper.load_model(model)
+    scheduler = None
+    if args.workers:
+        # Each worker process loads its own CPU copy of the model.
+        scheduler = BatchScheduler(model, workers=args.workers, threads_per_worker=args.threads_per_worker,
+                                   batch_size=args.batch_size, on_batch=print_batch)
+        audio_model = None
+        decode_options = {}
+    elif args.daemon:
+        # The daemon owns the model and picks fp16 itself.
+        audio_model = WhisperClient(args.daemon)
+        decode_options = {}
+    else:
+        import torch
+        import whisper
+        audio_model = whisper.load_model(model)
+        decode_options = {'fp16': torch.cuda.is_available()}
+    cache = TranscriptionCache(args.cache) if args.cache else None
+    incremental = None
+    if args.incremental:
+        incremental = IncrementalTranscriber(audio_model, window=args.window, overlap=args.overlap,
+                                             **decode_options)
 
     record_timeout = args.record_timeout
     phrase_timeout = args.phrase_timeout
 
     transcription = ['']
+    # (line index, future) for segments still being decoded by the scheduler, oldest first.
+    pending = deque()
+    # Epoch [start, end] of the audio behind each line, and how many lines are already stored.
+    line_times = {}
+    store = TranscriptStore(args.transcript) if args.transcript else None
+    stored = 0
 
     with source:
         recorder.adjust_for_ambient_noise(source)
 
+    # Chunks with no speech in them never reach the model.
+    vad = VoiceActivityDetector(16000, threshold_db=args.vad_threshold)
+
     def record_callback(_, audio:sr.AudioData) -> None:
         """
         Threaded callback function to receive audio data when recordings finish.
@@ -80,7 +152,10 @@ def main():
         """
         # Grab the raw bytes and push it into the thread safe queue.
         data = audio.get_raw_data()
-        data_queue.put(data)
+        with tracer.span('vad'):
+            vad.process(np.frombuffer(data, dtype=np.int16))
+        if vad.active_frames:
+            data_queue.put(data)
 
     # Create a background thread that will pass us raw audio bytes.
     # We could do this manually but SpeechRecognizer provides a nice helper.
@@ -89,30 +164,98 @@ def main():
     # Cue the user that we're ready to go.
     print("Model loaded.\n")
 
+    view = TerminalView()
+
+    def redraw():
+        with tracer.span('render'):
+            # Only the lines that changed are rewritten.
+            view.update(transcription)
+
+    def collect(index, future):
+        # A failed decode leaves its line as it was instead of ending the session.
+        try:
+            transcription[index] = future.result()
+        except Exception as e:
+            print(f"\nTranscription failed: {e}", file=sys.stderr)
+
+    def store_finished(final=False):
+        # A line is finished once a newer phrase has started and its text is no longer pending.
+        nonlocal stored
+        if store is None:
+            return
+        busy = {index for index, _ in pending}
+        last = len(transcription) if final else len(transcription) - 1
+        while stored < last and stored not in busy:
+            text = transcription[stored].strip()
+            if text and stored in line_times:
+                store.append(text, *line_times.pop(stored))
+            stored += 1
+
     while True:
         try:
+            # Block until the recorder or the scheduler has something for us.
+            batch = data_queue.get()
+
+            if pending and pending[0][1].done():
+                while pending and pending[0][1].done():
+                    collect(*pending.popleft())
+                redraw()
+                store_finished()
+
+            if not batch.segments:
+                continue
+
             now = datetime.utcnow()
-            # Pull raw recorded audio from the queue.
-            if not data_queue.empty():
-                phrase_complete = False
-                # If enough time has passed between recordings, consider the phrase complete.
-                # Clear the current working audio buffer to start over with the new data.
-                if phrase_time and now - phrase_time > timedelta(seconds=phrase_timeout):
-                    phrase_complete = True
-                # This is the last time we received new audio data from the queue.
-                phrase_time = now
-                
-                # Combine audio data from queue
-                audio_data = b''.join(data_queue.queue)
-                data_queue.queue.clear()
-                
-                # Convert in-ram buffer to something the model can use directly without needing a temp file.
-                # Convert data from 16 bit wide integers to floating point with a width of 32 bits.
-                # Clamp the audio stream frequency to a PCM wavelength compatible default of 32768hz max.
-                audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-
-                # Read the transcription.
-                result = audio_model.transcribe(audio_np, fp16=torch.cuda.is_available())
+            phrase_complete = False
+            # If enough time has passed between recordings, consider the phrase complete.
+            # Clear the current working audio buffer to start over with the new data.
+            if phrase_time and now - phrase_time > timedelta(seconds=phrase_timeout):
+                phrase_complete = True
+            # This is the last time we received new audio data from the queue.
+            phrase_time = now
+
+            # Combine audio data from queue
+            audio_data = batch.data
+            # 16 kHz int16 mono: 32000 bytes per second of audio that ended just now.
+            heard = time.time()
+            heard_from = heard - len(audio_data) / 32000
+
+            # Convert in-ram buffer to something the model can use directly without needing a temp file.
+            # Convert data from 16 bit wide integers to floating point with a width of 32 bits.
+            # Clamp the audio stream frequency to a PCM wavelength compatible default of 32768hz max.
+            audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+
+            if incremental:
+                # Close the previous phrase with what was already decoded, then feed only the new audio.
+                if phrase_complete:
+                    transcription[-1] = incremental.finish()
+                    transcription.append('')
+                with tracer.span('inference', mode='incremental'):
+                    transcription[-1] = incremental.feed(audio_np)
+            elif scheduler:
+                # Decoding happens in the worker pool; the text lands on this line when its batch is done.
+                if phrase_complete:
+                    transcription.append('')
+                future = scheduler.submit(audio_np)
+                if tracer.enabled:
+                    # Queueing plus batched decoding, as seen from here.
+                    submitted = time.monotonic()
+                    future.add_done_callback(lambda _: tracer.record('inference', time.monotonic() - submitted, submitted, mode='batch'))
+                future.add_done_callback(lambda _: data_queue.wake())
+                pending.append((len(transcription) - 1, future))
+            else:
+                # Read the transcription, skipping the model for audio it has already seen.
+                try:
+                    with tracer.span('inference', mode='daemon' if args.daemon else 'local'):
+                        if cache:
+                            key = cache.key(audio_data, model=model, engine='local')
+                            result = cache.get_or_compute(key, lambda: audio_model.transcribe(audio_np, **decode_options))
+                        else:
+                            result = audio_model.transcribe(audio_np, **decode_options)
+                except Exception as e:
+                    # e.g. the daemon went away: lose this chunk, not the session
+                    print(f"\nTranscription failed: {e}", file=sys.stderr)
+                    continue
                 text = result['text'].strip()
 
                 # If we detected a pause between recordings, add a new item to our transcription.
@@ -122,21 +265,32 @@ def main():
                 else:
                     transcription[-1] = text
 
-                # Clear the console to reprint the updated transcription.
-                os.system('cls' if os.name=='nt' else 'clear')
-                for line in transcription:
-                    print(line)
-                # Flush stdout.
-                print('', end='', flush=True)
-            else:
-                # Infinite loops are bad for processors, must sleep.
-                sleep(0.25)
+            line_times.setdefault(len(transcription) - 1, [heard_from, heard])[1] = heard
+            redraw()
+            store_finished()
         except KeyboardInterrupt:
             break
 
+    if scheduler:
+        scheduler.close()
+        while pending:
+            collect(*pending.popleft())
+        print("\n\nThroughput:")
+        print(json.dumps(scheduler.summary(), indent=4))
+
+    if store is not None:
+        store_finished(final=True)
+        store.close()
+
+    print("\n\nQueue:")
+    print(json.dumps(data_queue.stats(), indent=4))
     print("\n\nTranscription:")
     for line in transcription:
         print(line)
+    if tracer.enabled:
+        print("\n\nStage latency:")
+        print(json.dumps(tracer.summary(), indent=4))
+        tracer.close()
 
 
 if __name__ == "__main__":
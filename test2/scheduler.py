@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Per-worker model, loaded once by _init_worker.
+_model = None
+
+
+def _init_worker(model_name, threads):
+    """Pin the worker's BLAS/torch thread count and load the model once."""
+    global _model
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['MKL_NUM_THREADS'] = str(threads)
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    _model = whisper.load_model(model_name, device='cpu')
+
+
+def _decode_batch(segments, options):
+    """Decode a list of int16 segments in one padded mel batch. Runs in a worker process."""
+    import torch
+    import whisper
+
+    started = time.perf_counter()
+    texts = [None] * len(segments)
+    mels, positions = [], []
+    for i, pcm in enumerate(segments):
+        audio = pcm.astype(np.float32) / 32768.0
+        if audio.size > whisper.audio.N_SAMPLES:
+            # Longer than one 30 s window: let transcribe() do its own windowing.
+            texts[i] = _model.transcribe(audio, fp16=False, **options)['text'].strip()
+            continue
+        mels.append(whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), _model.dims.n_mels))
+        positions.append(i)
+    if mels:
+        results = whisper.decode(_model, torch.stack(mels).to(_model.device), whisper.DecodingOptions(fp16=False, **options))
+        for i, result in zip(positions, results):
+            texts[i] = result.text.strip()
+    return texts, time.perf_counter() - started, os.getpid()
+
+
+class BatchScheduler:
+    """Gathers pending segments into batches and spreads them over CPU worker processes.
+
+    `submit` returns a Future per segment. A dispatcher thread takes whatever is
+    queued (up to `batch_size`, waiting at most `max_wait` for more) and hands
+    it to the pool as one batch. At most `workers` batches are in flight, so
+    segments that arrive while every worker is busy naturally pile into the
+    next, larger batch. Every finished batch is recorded in `history` and
+    passed to `on_batch` if given.
+    """
+
+    def __init__(self, model_name, workers=None, threads_per_worker=None, batch_size=8, max_wait=0.1, on_batch=None, **options):
+        cpus = os.cpu_count() or 1
+        self.workers = workers or max(1, cpus // 4)
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+        self.options = options
+        self.history = deque(maxlen=1000)
+        self._pending = queue.Queue()
+        self._slots = threading.Semaphore(self.workers)
+        # spawn: forking a process that already imported torch is not safe.
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_worker, initargs=(model_name, self.threads_per_worker))
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, audio):
+        """Queue one 16 kHz segment (int16 or float32) and return a Future for its text."""
+        audio = np.asarray(audio)
+        if audio.dtype != np.int16:
+            audio = np.clip(np.rint(audio * 32767.0), -32768, 32767).astype(np.int16)
+        future = Future()
+        self._pending.put((audio, future))
+        return future
+
+    def _dispatch(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            batch = [item]
+            self._slots.acquire()
+            # While we waited for a free worker more segments may have queued up; take them too.
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pending.put(None)
+                    break
+                batch.append(item)
+            segments = [audio for audio, _ in batch]
+            futures = [future for _, future in batch]
+            submitted = time.perf_counter()
+            job = self._pool.submit(_decode_batch, segments, self.options)
+            job.add_done_callback(lambda job, segments=segments, futures=futures, submitted=submitted:
+                                  self._finish(job, segments, futures, submitted))
+
+    def _finish(self, job, segments, futures, submitted):
+        self._slots.release()
+        try:
+            texts, elapsed, pid = job.result()
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, text in zip(futures, texts):
+            future.set_result(text)
+        audio_seconds = sum(segment.size for segment in segments) / SAMPLE_RATE
+        stats = {
+            'worker': pid,
+            'segments': len(segments),
+            'audio_seconds': round(audio_seconds, 3),
+            'decode_seconds': round(elapsed, 3),
+            'wall_seconds': round(time.perf_counter() - submitted, 3),
+            'segments_per_second': round(len(segments) / elapsed, 3) if elapsed else None,
+            'realtime_factor': round(audio_seconds / elapsed, 3) if elapsed else None,
+        }
+        self.history.append(stats)
+        if self.on_batch:
+            self.on_batch(stats)
+
+    def summary(self):
+        """Aggregate throughput over the recorded batches."""
+        batches = list(self.history)
+        decode = sum(b['decode_seconds'] for b in batches)
+        audio = sum(b['audio_seconds'] for b in batches)
+        segments = sum(b['segments'] for b in batches)
+        return {
+            'workers': self.workers,
+            'threads_per_worker': self.threads_per_worker,
+            'batches': len(batches),
+            'segments': segments,
+            'mean_batch_size': round(segments / len(batches), 2) if batches else 0,
+            'audio_seconds': round(audio, 3),
+            'decode_seconds': round(decode, 3),
+            'realtime_factor_per_worker': round(audio / decode, 3) if decode else None,
+        }
+
+    def close(self):
+        self._pending.put(None)
+        self._dispatcher.join()
+        self._pool.shutdown(wait=True)
+
+
+def print_batch(stats):
+    """on_batch helper that logs one line per batch to stderr."""
+    print(' '.join(f"{k}={v}" for k, v in stats.items()), file=sys.stderr)
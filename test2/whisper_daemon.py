@@ -0,0 +1,179 @@
+#! python3.7
+
+"""Long-lived Whisper inference service on a Unix domain socket.
+
+Start it once:
+
+    python whisper_daemon.py --model medium --socket /tmp/whisper.sock
+
+and point any number of recorders at it (`main.py --daemon /tmp/whisper.sock`).
+The model is loaded a single time and requests are served one after another.
+
+Wire format (little endian), one request/response pair at a time per connection:
+
+    request:  b'WSP1' | u8 type | u32 options_len | u32 pcm_len | options JSON | int16 PCM (16 kHz mono)
+    response: b'WSP1' | u8 status | u32 body_len | JSON body (result, or {'error': ...})
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b'WSP1'
+REQUEST = struct.Struct('<4sBII')
+RESPONSE = struct.Struct('<4sBI')
+TRANSCRIBE = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("connection closed")
+        received += n
+    return buffer
+
+
+def _to_json(obj):
+    # Whisper results can carry numpy scalars.
+    return obj.item() if hasattr(obj, 'item') else str(obj)
+
+
+class WhisperClient:
+    """Drop-in for a Whisper model object that forwards `transcribe` to the daemon."""
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        return sock
+
+    def transcribe(self, audio, **options):
+        """Send float32 or int16 16 kHz samples and return the Whisper result dict."""
+        audio = np.asarray(audio)
+        if audio.dtype != np.int16:
+            audio = np.clip(np.rint(audio * 32767.0), -32768, 32767).astype(np.int16)
+        pcm = memoryview(np.ascontiguousarray(audio, dtype='<i2')).cast('B')
+        opts = json.dumps(options).encode()
+        header = REQUEST.pack(MAGIC, TRANSCRIBE, len(opts), pcm.nbytes)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._sock = self._connect()
+                    self._sock.sendall(header + opts)
+                    self._sock.sendall(pcm)
+                    magic, status, length = RESPONSE.unpack(_recv_exactly(self._sock, RESPONSE.size))
+                    if magic != MAGIC:
+                        raise ValueError("bad response from whisper daemon")
+                    body = json.loads(_recv_exactly(self._sock, length))
+                    break
+                except ConnectionError:
+                    # The daemon may have restarted; reconnect once.
+                    self.close()
+                    if attempt:
+                        raise
+                except (OSError, ValueError):
+                    # A timeout or a garbled reply leaves the stream mid-message: the next call starts on a new connection
+                    self.close()
+                    raise
+        if status != STATUS_OK:
+            raise RuntimeError(body.get('error', 'whisper daemon error'))
+        return body
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class WhisperRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                header = _recv_exactly(self.request, REQUEST.size)
+            except ConnectionError:
+                return
+            magic, kind, options_len, pcm_len = REQUEST.unpack(header)
+            if magic != MAGIC or kind != TRANSCRIBE:
+                return
+            options = json.loads(_recv_exactly(self.request, options_len)) if options_len else {}
+            pcm = _recv_exactly(self.request, pcm_len)
+            audio = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+            try:
+                result = self.server.transcribe(audio, options)
+                status, body = STATUS_OK, json.dumps(result, default=_to_json).encode()
+            except Exception as e:
+                status, body = STATUS_ERROR, json.dumps({'error': str(e)}).encode()
+            self.request.sendall(RESPONSE.pack(MAGIC, status, len(body)) + body)
+
+
+class WhisperServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, model, default_options=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, WhisperRequestHandler)
+        self.model = model
+        self.default_options = default_options or {}
+        # One model, one inference at a time; connections just queue up here.
+        self._model_lock = threading.Lock()
+
+    def transcribe(self, audio, options):
+        with self._model_lock:
+            return self.model.transcribe(audio, **{**self.default_options, **options})
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="medium", help="Model to use",
+                        choices=["tiny", "base", "small", "medium", "large"])
+    parser.add_argument("--non_english", action='store_true',
+                        help="Don't use the english model.")
+    parser.add_argument("--socket", default="/tmp/whisper.sock",
+                        help="Path of the Unix domain socket to listen on.")
+    args = parser.parse_args()
+
+    import torch
+    import whisper
+
+    model = args.model
+    if args.model != "large" and not args.non_english:
+        model = model + ".en"
+    audio_model = whisper.load_model(model)
+
+    server = WhisperServer(args.socket, audio_model, {'fp16': torch.cuda.is_available()})
+    print(f"Model {model} loaded, listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
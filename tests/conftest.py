@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import their neighbours by bare module name, as when run from their own directory.
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for directory in ('test1', 'test0', 'test2', 'bench'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
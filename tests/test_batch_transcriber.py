@@ -0,0 +1,36 @@
+from AudioEncoder import encode_wav
+from BatchTranscriber import BatchTranscriber, format_chunk, join_chunks
+from stub_server import StubWhisperServer
+from synthetic import speech_and_silence
+from TranscriptionClient import TranscriptionClient
+
+
+def test_a_failed_chunk_does_not_end_the_batch(tmp_path):
+    samples, _ = speech_and_silence(20.0, 16000, gap=(1.5, 2.5), seed=0)
+    with open(tmp_path / 'talk.wav', 'wb') as f:
+        f.write(encode_wav(samples, 16000))
+    # One upload at a time, so the stub's second request is the second chunk
+    with StubWhisperServer(latency=0.0, fail={2}) as stub, \
+            TranscriptionClient('test', base_url=stub.url, max_in_flight=1, retries=0) as client:
+        batch = BatchTranscriber(client, max_seconds=4.0, format='wav', window=1)
+        chunks = list(batch.transcribe([str(tmp_path)]))
+    assert len(chunks) == len(stub.requests) > 2
+    assert [chunk['chunk'] for chunk in chunks] == list(range(len(chunks)))
+    failed = [chunk for chunk in chunks if 'error' in chunk]
+    assert [chunk['chunk'] for chunk in failed] == [1]
+    assert failed[0]['text'] == '' and 'Internal Server Error' in failed[0]['error']
+    assert 'failed' in format_chunk(failed[0])
+    assert batch.stats()['failed'] == 1
+    assert join_chunks(chunks) == ' '.join(f"segment {i}" for i in range(1, len(chunks) + 1) if i != 2)
+
+
+def test_uploads_that_raise_come_back_as_errors(tmp_path):
+    samples, _ = speech_and_silence(10.0, 16000, gap=(1.5, 2.5), seed=1)
+    with open(tmp_path / 'talk.wav', 'wb') as f:
+        f.write(encode_wav(samples, 16000))
+    with StubWhisperServer() as stub:
+        url = stub.url  # Nothing listens there once the stub is gone
+    with TranscriptionClient('test', base_url=url, retries=0) as client:
+        chunks = list(BatchTranscriber(client, max_seconds=4.0, format='wav').transcribe([str(tmp_path)]))
+    assert chunks and all('error' in chunk for chunk in chunks)
+    assert join_chunks(chunks) == ''
@@ -0,0 +1,25 @@
+import numpy as np
+
+from PcmArchive import ArchiveWriter, PcmArchive
+
+
+def test_writer_copies_blocks_and_keeps_marks_in_order(tmp_path):
+    with PcmArchive(str(tmp_path), sample_rate=16000, file_seconds=1, files=2) as archive:
+        writer = ArchiveWriter(archive)
+        block = np.arange(4000, dtype=np.int16)
+        expected = []
+        for i in range(5):
+            block[:] = i
+            expected.append(block.copy())
+            writer.write(block.reshape(-1, 1))  # The caller reuses its buffer, as PortAudio does
+        writer.mark(4000, 12000)
+        assert writer.head == 20000
+        writer.close()
+        assert archive.head == 20000
+        np.testing.assert_array_equal(archive.samples(0, 20000), np.concatenate(expected))
+        assert [(start, stop) for _, _, start, stop in archive.utterances()] == [(4000, 12000)]
+
+
+def test_time_of_an_empty_archive(tmp_path):
+    with PcmArchive(str(tmp_path)) as archive:
+        assert archive.time_of(0) is None
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import struct
+import sys
+import types
+
+import numpy as np
+
+from AudioEncoder import AudioEncoder
+from RingBuffer import RingBuffer
+from SegmentQueue import SegmentQueue
+
+
+def load_audio(monkeypatch):
+    # Every script directory has an audio.py, so load test1's by path; capture is never opened
+    monkeypatch.setitem(sys.modules, 'sounddevice', types.SimpleNamespace())
+    path = os.path.join(os.path.dirname(__file__), '..', 'test1', 'audio.py')
+    spec = importlib.util.spec_from_file_location('test1_audio', path)
+    audio = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(audio)
+    return audio
+
+
+def wav_format(data):
+    rate = struct.unpack_from('<I', data, 24)[0]
+    samples = struct.unpack_from('<I', data, 40)[0] // 2
+    return rate, samples
+
+
+def test_a_downsampled_batch_is_encoded_at_its_own_rate(monkeypatch):
+    audio = load_audio(monkeypatch)
+    fs = 44100
+    ring = RingBuffer(fs * 10)
+    ring.write(np.zeros(fs * 2, np.int16))
+    segments = SegmentQueue(fs, target_lag=0, pressure_rate=8000, pressure_seconds=0.5)
+    encoder = AudioEncoder(fs, format='wav', target_rate=16000)
+    pipeline = audio.build_pipeline(ring, fs, 9.0, 0.5, 10.0, None, encoder, 'en', 'whisper-1', False, segments=segments)
+    encode = next(stage.func for stage in pipeline.stages if stage.name == 'encode')
+
+    segments.put(ring.samples(0, fs), span=(0, fs))  # One second at full rate fills the queue past its pressure point
+    segments.put(ring.samples(fs, 2 * fs), span=(fs, 2 * fs))  # so the next second is queued at 8 kHz
+    batches = [segments.get(), segments.get()]
+    assert [batch.sample_rate for batch in batches] == [fs, 8000]
+
+    for batch, rate in zip(batches, (16000, 8000)):
+        _, payload, start, end = encode(batch)
+        # Labelled with the rate of its samples: one second plays back as one second
+        assert wav_format(payload.data) == (rate, rate)
+        assert abs(end - start - 1.0) < 1e-3
@@ -0,0 +1,60 @@
+import importlib.util
+import os
+import sys
+import threading
+import types
+
+import numpy as np
+
+
+class CallbackStop(Exception):
+    pass
+
+
+class FakeInputStream:
+    """Feeds `blocksize`-sample blocks, quiet noise and then a loud tone, to the callback until it raises CallbackStop."""
+
+    blocksize = 1000
+
+    def __init__(self, callback, channels, samplerate, dtype, finished_callback):
+        self.callback = callback
+        self.samplerate = samplerate
+        self.finished_callback = finished_callback
+
+    def _run(self):
+        rng = np.random.default_rng(0)
+        position = 0
+        try:
+            while True:
+                t = np.arange(position, position + self.blocksize) / self.samplerate
+                if position < 4 * self.blocksize:
+                    block = rng.standard_normal(self.blocksize) * 30
+                else:
+                    block = np.sin(2 * np.pi * 200 * t) * 8000
+                block = block.astype(np.int16).reshape(-1, 1)
+                position += self.blocksize
+                self.callback(block, len(block), None, None)
+        except CallbackStop:
+            pass
+        self.finished_callback()
+
+    def __enter__(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def test_recording_for_exactly_the_maximum_duration(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'sounddevice', types.SimpleNamespace(InputStream=FakeInputStream, CallbackStop=CallbackStop))
+    # Every script directory has an audio.py, so load test0's by path
+    path = os.path.join(os.path.dirname(__file__), '..', 'test0', 'audio.py')
+    spec = importlib.util.spec_from_file_location('test0_audio', path)
+    audio = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(audio)
+    fs = 16000
+    duration = 1.05  # 16800 samples: the 17th 1000-sample block only partly fits
+    samples = audio.record_audio(duration, threshold_db=9.0, silence_threshold=1.5, fs=fs)
+    assert samples is not None
+    assert 0 < samples.size <= int(duration * fs)
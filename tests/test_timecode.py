@@ -0,0 +1,30 @@
+import time
+
+import numpy as np
+
+import timecode
+
+
+def test_stamp_round_trips():
+    frame = np.zeros((72, 1280, 3), np.uint8)
+    now = time.time()
+    timecode.stamp(frame, now)
+    assert abs(timecode.read(frame) - now) < 0.001
+
+
+def test_times_far_from_now_are_rejected():
+    frame = np.zeros((72, 1280, 3), np.uint8)
+    timecode.stamp(frame, time.time() - 3600)
+    assert timecode.read(frame) is None
+    assert timecode.read(frame, max_skew=None) is not None
+
+
+def test_random_cells_do_not_read_as_a_timecode():
+    rng = np.random.default_rng(0)
+    frame = np.zeros((8, timecode.CELLS * 8, 3), np.uint8)
+    hits = 0
+    for _ in range(5000):
+        frame[...] = (rng.integers(0, 2, timecode.CELLS) * 255).astype(np.uint8).repeat(8)[None, :, None]
+        frame[:, :8], frame[:, 8:16] = 255, 0
+        hits += timecode.read(frame, max_skew=None) is not None
+    assert hits == 0
@@ -0,0 +1,37 @@
+from TranscriptStore import TranscriptStore
+
+
+def texts(segments):
+    return [segment['text'] for segment in segments]
+
+
+def test_between_finds_a_long_segment_that_started_several_entries_earlier(tmp_path):
+    with TranscriptStore(str(tmp_path)) as store:
+        store.append('long', 100.0, 160.0)
+        for i in range(5):
+            store.append(f'short {i}', 101.0 + i * 10, 105.0 + i * 10)
+        assert texts(store.between(145.0, 146.0)) == ['long', 'short 4']
+        assert texts(store.between(106.0, 110.0)) == ['long']
+
+
+def test_between_after_reopening(tmp_path):
+    with TranscriptStore(str(tmp_path)) as store:
+        store.append('long', 100.0, 160.0)
+        store.append('short', 120.0, 121.0)
+        store.append('later', 130.0, 131.0)
+    with TranscriptStore(str(tmp_path)) as store:
+        assert texts(store.between(150.0, 170.0)) == ['long']
+
+
+def test_interleaved_devices_are_queried_in_time_order(tmp_path):
+    # Two devices' uploads finish out of order: each one's segments arrive after some of the other's later ones
+    arrivals = [('mic b 2', 120.0, 125.0), ('mic a 1', 100.0, 104.0), ('mic a 2', 110.0, 114.0),
+                ('mic b 1', 102.0, 108.0), ('mic a 3', 126.0, 129.0), ('mic b 3', 111.0, 113.0)]
+    with TranscriptStore(str(tmp_path)) as store:
+        for text, start, end in arrivals:
+            store.append(text, start, end)
+        assert texts(store.between(105.0, 115.0)) == ['mic b 1', 'mic a 2', 'mic b 3']
+        assert texts(store.search('mic')) == ['mic a 1', 'mic b 1', 'mic a 2', 'mic b 3', 'mic b 2', 'mic a 3']
+    with TranscriptStore(str(tmp_path)) as store:
+        assert texts(store.between(0.0, 1e10)) == ['mic a 1', 'mic b 1', 'mic a 2', 'mic b 3', 'mic b 2', 'mic a 3']
+        assert store.segment(0)['text'] == 'mic b 2'
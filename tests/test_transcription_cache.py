@@ -0,0 +1,36 @@
+import os
+
+import TranscriptionCache as cache_module
+from TranscriptionCache import TranscriptionCache
+
+
+def test_sweep_skips_files_removed_under_it(tmp_path, monkeypatch):
+    cache = TranscriptionCache(str(tmp_path), max_bytes=0)
+    for i in range(3):
+        cache.put(cache.key(bytes([i])), {'text': str(i)})
+    scandir = os.scandir
+
+    def racing_scandir(path):
+        entries = list(scandir(path))
+        os.remove(entries[0].path)  # A concurrent put/sweep got there between the listing and the stat
+        return iter(entries)
+
+    monkeypatch.setattr(cache_module.os, 'scandir', racing_scandir)
+    cache.sweep()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.json')]
+
+
+def test_get_counts_a_file_swept_during_the_read_as_a_miss(tmp_path, monkeypatch):
+    cache = TranscriptionCache(str(tmp_path))
+    key = cache.key(b'pcm', model='m')
+    cache.put(key, {'text': 'x'})
+    cache._memory.clear()
+    utime = os.utime
+
+    def racing_utime(path, *args, **kwargs):
+        os.remove(path)
+        return utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(cache_module.os, 'utime', racing_utime)
+    assert cache.get(key) is None
+    assert cache.misses == 1
@@ -0,0 +1,38 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from whisper_daemon import WhisperClient, WhisperServer
+
+
+class SlowModel:
+    """Answers with the call number; the first call takes longer than the client waits."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, **options):
+        self.calls += 1
+        if self.calls == 1:
+            time.sleep(0.5)
+        return {'text': f"call {self.calls}"}
+
+
+def test_a_timed_out_reply_is_not_read_by_the_next_request(tmp_path):
+    path = str(tmp_path / 'whisper.sock')
+    server = WhisperServer(path, SlowModel())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = WhisperClient(path, timeout=0.2)
+        audio = np.zeros(1600, np.float32)
+        with pytest.raises(socket.timeout):
+            client.transcribe(audio)
+        client.timeout = 2.0
+        assert client.transcribe(audio)['text'] == 'call 2'
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()